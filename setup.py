@@ -49,6 +49,7 @@ setup(
         "prettytable>=2.2,<2.3",
         "shortcodes>=5.1,<6.0",
         "cached-property>=1.5.1,<2.0",
+        "urllib3>=1.26",
     ],
     extras_require={
         "testing": [
@@ -6,6 +6,7 @@ from wagtail_wordpress_import.block_builder_defaults import (
     conf_fallback_block,
     conf_html_tags_to_blocks,
 )
+from wagtail_wordpress_import.dom import to_html
 from wagtail_wordpress_import.prefilters.handle_shortcodes import SHORTCODE_HANDLERS
 
 
@@ -27,14 +28,47 @@ def conf_promote_child_tags():
     )
 
 
+def get_builder_functions():
+    """
+    returns:
+        a dict of the builder function for each HTML tag, from configuration
+        and the custom HTML tags of the registered shortcode handlers
+    """
+    builder_functions = {}
+    for handler in SHORTCODE_HANDLERS:
+        cls = handler()
+        # Use the method, so we can call it later like a function that takes a
+        # single argument. Handlers that only pre-filter don't build a block.
+        if hasattr(cls, "construct_block"):
+            builder_functions[cls.element_name] = cls.construct_block
+
+    # standard blocks to tags take precedence over the shortcode handlers
+    for tag, builder in conf_html_tags_to_blocks().items():
+        builder_functions[tag] = import_string(builder)
+
+    return builder_functions
+
+
 class BlockBuilder:
-    def __init__(self, value, node, logger):
-        self.soup = BeautifulSoup(value, "lxml")
+    def __init__(self, value, node, logger, pipeline=None):
+        # a tree from the DOM prefilters is parsed again with lxml, as
+        # html.parser nests malformed html differently
+        self.soup = BeautifulSoup(to_html(value), "lxml")
         self.blocks = []  # for each page this holds the sequence of StreamBlocks
         self.logged_items = {"processed": 0, "imported": 0, "skipped": 0, "items": []}
         self.node = node
         self.logger = logger
 
+        # the configuration is resolved once per import in the ImportPipeline
+        if pipeline:
+            self.builder_functions = pipeline.builder_functions
+            self.fallback_function = pipeline.fallback_function
+            self.config_promote_child_tags = pipeline.promote_child_tags
+        else:
+            self.builder_functions = get_builder_functions()
+            self.fallback_function = import_string(conf_fallback_block())
+            self.config_promote_child_tags = conf_promote_child_tags()
+
     def promote_child_tags(self):
         """
         Some HTML tags that can be at the top level, e.g. the parent is the
@@ -43,9 +77,8 @@ class BlockBuilder:
         returns: None
             but modifies the page soup
         """
-        config_promote_child_tags = conf_promote_child_tags()
-        promotee_tags = config_promote_child_tags["TAGS_TO_PROMOTE"]
-        removee_tags = config_promote_child_tags["PARENTS_TO_REMOVE"]
+        promotee_tags = self.config_promote_child_tags["TAGS_TO_PROMOTE"]
+        removee_tags = self.config_promote_child_tags["PARENTS_TO_REMOVE"]
 
         for promotee in promotee_tags:
             promotees = self.soup.findAll(promotee)
@@ -61,24 +94,7 @@ class BlockBuilder:
             a function to parse the block from configuration
         """
 
-        # Detecting standard blocks to tags
-        try:
-            builder = conf_html_tags_to_blocks()[element.name]
-            return import_string(builder)
-        except KeyError:
-            pass
-
-        # registered shortcode handlers custom HTML tags
-        conf_custom_tags = {}
-        for handler in SHORTCODE_HANDLERS:
-            cls = handler()
-            conf_custom_tags[cls.element_name] = handler
-
-        if element.name in conf_custom_tags:
-            handler = conf_custom_tags[element.name]
-            # Return the method, so we can call it later like a function that takes a
-            # single argument.
-            return handler().construct_block
+        return self.builder_functions.get(element.name)
 
     def build(self):
         """
@@ -92,13 +108,12 @@ class BlockBuilder:
         If a HTML tag does have child blocks we should parse then inside the
         build_block_* method
         """
-        soup = self.soup.find("body").findChildren(recursive=False)
+        # an empty document has no body
+        soup = (self.soup.find("body") or self.soup).findChildren(recursive=False)
         cached_fallback_value = (
             ""  # append fall back content here, by default it's a Rich Text block
         )
-        cached_fallback_function = import_string(
-            conf_fallback_block()
-        )  # Rich Text block
+        cached_fallback_function = self.fallback_function  # Rich Text block
         counter = 0
         for element in soup:  # each single top level tag
             counter += 1
@@ -1,15 +1,27 @@
+from contextlib import contextmanager
+from functools import lru_cache
+
 import requests
-from bs4 import BeautifulSoup
 from django.conf import settings
 from django.core.files import File
 from django.core.files.temp import NamedTemporaryFile
 from django.utils.module_loading import import_string
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+from urllib3.util.retry import Retry
 from wagtail.documents import get_document_model
 from wagtail.images import get_image_model
 
+from wagtail_wordpress_import.dom import dom_filter, to_dom
+from wagtail_wordpress_import.media_cache import get_media_cache
+
 ImportedImage = get_image_model()
 ImportedDocument = get_document_model()
 
+# Images and documents by title while an import is running, see media_title_index()
+media_title_indexes = {}
+# The media saved in each open media_savepoint(), innermost last
+media_savepoints = []
+
 
 def conf_html_tags_to_blocks():
     return getattr(
@@ -26,23 +38,124 @@ def conf_html_tags_to_blocks():
     )
 
 
-def fetch_url(src, allow_redirects=True):
-    """general purpose url fetcher with ability to pass in own config"""
-    try:
-        response = requests.get(
-            src,
-            **getattr(
-                settings,
-                "WAGTAIL_WORDPRESS_IMPORTER_REQUESTS_SETTINGS",
-                {
-                    "headers": {"User-Agent": "WagtailWordpressImporter"},
-                    "timeout": 5,
-                    "stream": True,
-                    "allow_redirects": allow_redirects,
-                },
-            ),
+def conf_valid_image_content_types():
+    return getattr(
+        settings,
+        "WAGTAIL_WORDPRESS_IMPORTER_VALID_IMAGE_CONTENT_TYPES",
+        [
+            "image/gif",
+            "image/jpeg",
+            "image/png",
+            "image/webp",
+        ],
+    )
+
+
+def conf_valid_document_file_types():
+    return getattr(
+        settings,
+        "WAGTAIL_WORDPRESS_IMPORTER_VALID_DOCUMENT_FILE_TYPES",
+        [
+            "pdf",
+            "ppt",
+            "pptx",
+            "doc",
+            "docx",
+            "xls",
+            "xlsm",
+            "xlsx",
+            "csv",
+            "txt",
+            "rtf",
+            "odt",  # Open Office format for word processing (text) documents
+            "fodt",  # Open Office format for word processing (text) documents
+            "ods",  # Open Office format for spreadsheets
+            "fods",  # Open Office format for spreadsheets
+            "odp",  # Open Office format for presentations
+            "fodp",  # Open Office format for presentations
+        ],
+    )
+
+
+def conf_requests_retries():
+    return getattr(settings, "WAGTAIL_WORDPRESS_IMPORTER_REQUESTS_RETRIES", 3)
+
+
+def conf_requests_backoff_factor():
+    return getattr(settings, "WAGTAIL_WORDPRESS_IMPORTER_REQUESTS_BACKOFF_FACTOR", 0.5)
+
+
+def get_requests_session(pool_maxsize=DEFAULT_POOLSIZE):
+    """
+    A requests session shared by all the media downloads, so the connections
+    to the source site are pooled and kept alive between requests.
+    Connection errors and busy or failing servers are retried with a backoff.
+    pool_maxsize is the number of connections kept open to each host, which
+    should be at least the number of threads downloading at the same time.
+    """
+    return build_requests_session(
+        conf_requests_retries(), conf_requests_backoff_factor(), pool_maxsize
+    )
+
+
+@lru_cache(maxsize=None)
+def build_requests_session(retries, backoff_factor, pool_maxsize):
+    """One session for each of the retry settings and pool sizes in use"""
+    adapter = HTTPAdapter(
+        max_retries=Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET", "HEAD"],
+            raise_on_status=False,
+        ),
+        pool_connections=pool_maxsize,
+        pool_maxsize=pool_maxsize,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_url(src, allow_redirects=True, session=None):
+    """
+    general purpose url fetcher with ability to pass in own config
+    responses are served from the media cache when it's enabled, cached
+    responses with an ETag or Last-Modified header are revalidated first
+    the shared requests session is used unless another session is passed in
+    """
+    request_settings = dict(
+        getattr(
+            settings,
+            "WAGTAIL_WORDPRESS_IMPORTER_REQUESTS_SETTINGS",
+            {
+                "headers": {"User-Agent": "WagtailWordpressImporter"},
+                "timeout": 5,
+                "stream": True,
+                "allow_redirects": allow_redirects,
+            },
         )
+    )
+
+    media_cache = get_media_cache()
+    cached = media_cache.get(src) if media_cache else None
+    if cached:
+        conditional_headers = media_cache.conditional_headers(cached)
+        if not conditional_headers:
+            return media_cache.response(cached), True, cached["content_type"]
+        request_settings["headers"] = {
+            **request_settings.get("headers", {}),
+            **conditional_headers,
+        }
+
+    try:
+        response = (session or get_requests_session()).get(src, **request_settings)
+        if cached and response.status_code == 304:
+            return media_cache.response(cached), True, cached["content_type"]
         status = True if response.status_code == 200 else False
+        if media_cache and status:
+            media_cache.set(src, response)
         return response, status, response.headers.get("content-type")
     except requests.ConnectionError:
         print(f"ConnectionError: {src}")
@@ -67,21 +180,21 @@ def fetch_url(src, allow_redirects=True):
 # FUNCTIONS FOR IMAGES
 
 
-def image_linker(html):
+@dom_filter
+def image_linker(soup):
     """
     params
     ======
-        html: html from a single rich_text block
+        soup: the parsed html, or the html, from a single rich_text block
 
     returns
     =======
-        string: the html with img tags modified
+        the soup, or a string when called with html, with img tags modified
 
     BS4 performs a find and replace on all img tags found in the HTML.
     If the image can be retrieved from the remote site and saved into a Wagtail ImageModel
     the soup is modified.
     """
-    soup = BeautifulSoup(html, "html.parser")
     images = soup.find_all("img")
     for image in images:
         if image.attrs and image.attrs.get("src"):
@@ -100,7 +213,7 @@ def image_linker(html):
         else:
             print(f"IMAGE HAS NO SRC: {image}")
 
-    return str(soup)
+    return soup
 
 
 def get_or_save_image(src):
@@ -108,52 +221,46 @@ def get_or_save_image(src):
     existing_image = image_exists(image_file_name)
     if not existing_image:
         response, valid, type = fetch_url(src)
-        if valid and (
-            type
-            in getattr(
-                settings,
-                "WAGTAIL_WORDPRESS_IMPORTER_VALID_IMAGE_CONTENT_TYPES",
-                [
-                    "image/gif",
-                    "image/jpeg",
-                    "image/png",
-                    "image/webp",
-                ],
-            )
-        ):
-            temp_image = NamedTemporaryFile(delete=True)
-            temp_image.name = image_file_name
-            temp_image.write(response.content)
-            temp_image.flush()
-            retrieved_image = ImportedImage(
-                file=File(file=temp_image), title=image_file_name
-            )
-            retrieved_image.save()
-            temp_image.close()
-            return retrieved_image
-        else:
-            print(f"RECEIVED INVALID IMAGE RESPONSE: {src}")
+        return save_image(src, response, valid, type)
     return existing_image
 
 
+def save_image(src, response, valid, type):
+    if valid and type in conf_valid_image_content_types():
+        image_file_name = get_image_file_name(src)
+        temp_image = NamedTemporaryFile(delete=True)
+        temp_image.name = image_file_name
+        temp_image.write(response.content)
+        temp_image.flush()
+        retrieved_image = ImportedImage(
+            file=File(file=temp_image), title=image_file_name
+        )
+        retrieved_image.save()
+        add_to_media_title_index(retrieved_image)
+        temp_image.close()
+        return retrieved_image
+    else:
+        print(f"RECEIVED INVALID IMAGE RESPONSE: {src}")
+
+
 # FUNCTIONS FOR DOCUMENTS
 
 
-def document_linker(html):
+@dom_filter
+def document_linker(soup):
     """
     params
     ======
-        html: html from a single rich_text block
+        soup: the parsed html, or the html, from a single rich_text block
 
     returns
     =======
-        string: the html with anchor links modified
+        the soup, or a string when called with html, with anchor links modified
 
     BS4 performs a find and replace on all img tags found in the HTML.
     If the image can be retrived from the remote site and saved into a Wagtail ImageModel
     the soup is modified.
     """
-    soup = BeautifulSoup(html, "html.parser")
     anchors = soup.find_all("a")
     for anchor in anchors:
         if anchor.attrs and anchor.attrs.get("href"):
@@ -172,54 +279,41 @@ def document_linker(html):
         else:
             print(f"DOCUMENT HAS NO HREF: {anchor}")
 
-    return str(soup)
+    return soup
 
 
 def get_or_save_document(href):
-    file_type = href.split(".")[-1]
-    if file_type in getattr(
-        settings,
-        "",
-        [
-            "pdf",
-            "ppt",
-            "pptx",
-            "doc",
-            "docx",
-            "xls",
-            "xlsm",
-            "xlsx",
-            "csv",
-            "txt",
-            "rtf",
-            "odt",  # Open Office format for word processing (text) documents
-            "fodt",  # Open Office format for word processing (text) documents
-            "ods",  # Open Office format for spreadsheets
-            "fods",  # Open Office format for spreadsheets
-            "odp",  # Open Office format for presentations
-            "fodp", # Open Office format for presentations
-        ],
-    ):
+    if is_document_href(href):
         document_file_name = get_document_file_name(href)
         existing_document = document_exists(document_file_name)
         if not existing_document:
             response, valid, type = fetch_url(href)
-            if valid:
-                temp_document = NamedTemporaryFile(delete=True)
-                temp_document.name = document_file_name
-                temp_document.write(response.content)
-                temp_document.flush()
-                retrieved_document = ImportedDocument(
-                    file=File(file=temp_document), title=document_file_name
-                )
-                retrieved_document.save()
-                temp_document.close()
-                return retrieved_document
-            else:
-                print(f"RECEIVED INVALID DOCUMENT RESPONSE: {href}")
+            return save_document(href, response, valid, type)
         return existing_document
 
 
+def save_document(href, response, valid, type):
+    if valid:
+        document_file_name = get_document_file_name(href)
+        temp_document = NamedTemporaryFile(delete=True)
+        temp_document.name = document_file_name
+        temp_document.write(response.content)
+        temp_document.flush()
+        retrieved_document = ImportedDocument(
+            file=File(file=temp_document), title=document_file_name
+        )
+        retrieved_document.save()
+        add_to_media_title_index(retrieved_document)
+        temp_document.close()
+        return retrieved_document
+    else:
+        print(f"RECEIVED INVALID DOCUMENT RESPONSE: {href}")
+
+
+def is_document_href(href):
+    return href.split(".")[-1] in conf_valid_document_file_types()
+
+
 # STREAMFIELD BLOCKS
 
 
@@ -283,9 +377,10 @@ def build_richtext_block_content(html, blocks):
     image_linker is called to link up and retrive the remote image
     document_linker is called to link up and retrive the remote documents
     filters are called to replace inline shortcodes
+    The linkers share one parsed tree, which is serialised for the block.
     """
-    html = image_linker(html)
-    html = document_linker(html)
+    soup = image_linker(to_dom(html))
+    html = str(document_linker(soup))
     for inline_shortcode_handler in getattr(
         settings, "WAGTAIL_WORDPRESS_IMPORTER_INLINE_SHORTCODE_HANDLERS", []
     ):
@@ -312,17 +407,74 @@ def get_document_file_name(src):
 
 
 def image_exists(name):
-    try:
-        return ImportedImage.objects.get(title=name)
-    except ImportedImage.DoesNotExist:
-        pass
+    return get_by_title(ImportedImage, name)
 
 
 def document_exists(name):
+    return get_by_title(ImportedDocument, name)
+
+
+@contextmanager
+def media_title_index():
+    """
+    Look up the images and documents by title in memory while an import is
+    running. Each index is loaded with a single query and is kept up to date as
+    media is saved, so a title that isn't in the index doesn't exist.
+    """
+    media_title_indexes[ImportedImage] = load_media_title_index(ImportedImage)
+    media_title_indexes[ImportedDocument] = load_media_title_index(ImportedDocument)
+    try:
+        yield
+    finally:
+        media_title_indexes.clear()
+
+
+def load_media_title_index(model):
+    index = {}
+    for instance in model.objects.only("id", "title").order_by("pk"):
+        # when titles are duplicated the first one saved is used
+        index.setdefault(instance.title, instance)
+    return index
+
+
+def add_to_media_title_index(instance):
+    index = media_title_indexes.get(type(instance))
+    if index is not None:
+        index.setdefault(instance.title, instance)
+    if media_savepoints:
+        media_savepoints[-1].append(instance)
+
+
+@contextmanager
+def media_savepoint():
+    """
+    Forget the images and documents saved in the block if it raises an error,
+    e.g. when it's a transaction savepoint and their rows are rolled back.
+    They're removed from the title indexes and their files are deleted.
+    """
+    saved = []
+    media_savepoints.append(saved)
     try:
-        return ImportedDocument.objects.get(title=name)
-    except ImportedDocument.DoesNotExist:
-        pass
+        yield
+    except Exception:
+        for instance in saved:
+            index = media_title_indexes.get(type(instance))
+            if index is not None and index.get(instance.title) is instance:
+                del index[instance.title]
+            instance.file.delete(save=False)
+        raise
+    else:
+        if len(media_savepoints) > 1:
+            media_savepoints[-2].extend(saved)
+    finally:
+        media_savepoints.pop()
+
+
+def get_by_title(model, title):
+    index = media_title_indexes.get(model)
+    if index is not None:
+        return index.get(title)
+    return model.objects.filter(title=title).order_by("pk").first()
 
 
 # GENERAL FUNCTIONS
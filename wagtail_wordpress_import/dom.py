@@ -0,0 +1,41 @@
+from functools import wraps
+
+from bs4 import BeautifulSoup
+
+
+def parse_html(html):
+    """Parse an HTML fragment to the tree passed between the DOM filters"""
+    return BeautifulSoup(html, "html.parser")
+
+
+def dom_filter(function):
+    """
+    Mark a filter that works on a parsed tree rather than a string.
+
+    The wrapped function receives a BeautifulSoup tree and returns the tree,
+    e.g. filter(soup, options). Consecutive DOM filters share the same tree, it's
+    only serialised when the next step needs a string. When the filter is
+    called with a string it's parsed and the result is serialised, so the
+    filter can still be used on its own.
+    """
+
+    @wraps(function)
+    def wrapper(html, *args, **kwargs):
+        if isinstance(html, BeautifulSoup):
+            return function(html, *args, **kwargs)
+        return str(function(parse_html(html), *args, **kwargs))
+
+    wrapper.accepts_dom = True
+    return wrapper
+
+
+def accepts_dom(function):
+    return getattr(function, "accepts_dom", False)
+
+
+def to_dom(content):
+    return content if isinstance(content, BeautifulSoup) else parse_html(content)
+
+
+def to_html(content):
+    return str(content) if isinstance(content, BeautifulSoup) else content
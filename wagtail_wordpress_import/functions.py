@@ -1,4 +1,9 @@
+import hashlib
+import json
 from collections import defaultdict
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit
+
+from lxml import etree
 
 
 def clean_node_name(node_name):
@@ -50,6 +55,45 @@ def node_to_dict(node):
     return obj
 
 
+def get_element_name(element):
+    """
+    Return the tag name of an lxml element using the namespace prefix,
+    e.g. wp:post_id, which matches the node name used by xml.dom.
+    """
+    localname = etree.QName(element).localname
+    return f"{element.prefix}:{localname}" if element.prefix else localname
+
+
+def get_element_value(element):
+    if any(isinstance(child.tag, str) for child in element):
+        return element_to_dict(element)
+    # the text either side of any comments and processing instructions
+    text = (element.text or "") + "".join(child.tail or "" for child in element)
+    # elements without text, including an empty CDATA section, have no value
+    if not text:
+        return None
+    return coerce_node_value(text)
+
+
+def element_to_dict(element):
+    """
+    The lxml version of node_to_dict. It returns a dict of the same shape
+    for an lxml element.
+    """
+    obj = defaultdict(list)
+    for child in element:
+        if isinstance(child.tag, str):  # skip comments and processing instructions
+            obj[clean_node_name(get_element_name(child))].append(
+                get_element_value(child)
+            )
+    # If an element appears more than once, use an array.
+    # Otherwise just use the element value.
+    obj = {key: value[0] if len(value) == 1 else value for key, value in obj.items()}
+    if obj == {"nil": True}:
+        return None
+    return obj
+
+
 def snakecase_key(key):
     """
     Convert the key to snake_case by replacing ':' with '_'
@@ -75,3 +119,86 @@ def get_attr_as_list(node, key):
         return []
     except TypeError:
         return []
+
+
+# The query parameters of WordPress links without pretty permalinks, which
+# identify the page, e.g. https://www.example.com/?p=12
+WP_LINK_QUERY_PARAMETERS = {
+    "p",
+    "page_id",
+    "attachment_id",
+    "post_type",
+    "name",
+    "pagename",
+    "cat",
+    "tag",
+    "author",
+}
+
+
+def normalize_wp_link(link, domain=None, base=None):
+    """
+    Return a key for a link so the different ways of writing a link to the
+    same WordPress page match each other.
+    The scheme, fragment, trailing slash, a leading www. and the query
+    parameters other than those in WP_LINK_QUERY_PARAMETERS are ignored.
+    Relative links are resolved against base, the link of the page they're
+    on, and links without a domain are treated as links on the source domain.
+
+    e.g. https://www.example.com/foo/?bar=1 and /foo both become example.com/foo
+    and https://www.example.com/?p=12&utm_source=bar becomes example.com/?p=12
+    """
+    if not link:
+        return None
+
+    link = str(link).strip()
+    parts = urlsplit(link)
+    if parts.scheme not in ("", "http", "https"):
+        return None  # mailto:, tel: etc. can't link to a page
+
+    if not parts.scheme and not parts.netloc and not link.startswith("/") and base:
+        if not parts.path and not parts.query:
+            return None  # a link to an anchor on the same page
+        parts = urlsplit(urljoin(base, link))
+
+    netloc = parts.netloc
+    if not netloc:
+        if not parts.path and not parts.query:
+            return None  # a link to an anchor on the same page
+        netloc = urlsplit(domain).netloc if domain else ""
+
+    netloc = netloc.lower()
+    if netloc.startswith("www."):
+        netloc = netloc[4:]
+
+    key = netloc + "/" + parts.path.strip("/")
+    query = sorted(
+        (name, value)
+        for name, value in parse_qsl(parts.query)
+        if name in WP_LINK_QUERY_PARAMETERS
+    )
+    if query:
+        key += "?" + urlencode(query)
+    return key
+
+
+# The key an item's content digest is kept under, it isn't an XML tag name
+CONTENT_DIGEST_KEY = "_content_digest"
+
+
+def item_content_digest(item):
+    """
+    Return a digest of the parts of an XML item that change when a post is
+    edited in WordPress: the content, the modified date and the postmeta.
+    The digest is kept on the item, so it's only computed once for each item.
+    """
+    if CONTENT_DIGEST_KEY not in item:
+        data = [
+            item.get("content:encoded"),
+            item.get("wp:post_modified_gmt"),
+            get_attr_as_list(item, "wp:postmeta"),
+        ]
+        item[CONTENT_DIGEST_KEY] = hashlib.sha256(
+            json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+    return item[CONTENT_DIGEST_KEY]
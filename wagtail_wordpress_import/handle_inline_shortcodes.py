@@ -1,4 +1,17 @@
 import re
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def inline_shortcode_pattern(shortcode_name):
+    """The regex of InlineShortcodeHandler._pattern, compiled once for each name"""
+    return re.compile(
+        r"\["  # matches the opening [
+        + shortcode_name
+        + r"(?:\s)"  # matches a single space
+        + r"(?P<attrs>[^\]]*)"  # capture 'attrs', matching anything but ]
+        + r"\]"  # matches the closing ] of the opening tag
+    )
 
 
 class InlineShortcodeHandler:
@@ -37,13 +50,7 @@ class InlineShortcodeHandler:
         \[(\S+)(?:\s)(\w\S.+)\]
         """  # noqa: W605
 
-        return re.compile(
-            r"\["  # matches the opening [
-            + self.shortcode_name
-            + r"(?:\s)"  # matches a single space
-            + r"(?P<attrs>[^\]]*)"  # capture 'attrs', matching anything but ]
-            + r"\]"  # matches the closing ] of the opening tag
-        )
+        return inline_shortcode_pattern(self.shortcode_name)
 
     @staticmethod
     def get_shortcode_attrs(string):
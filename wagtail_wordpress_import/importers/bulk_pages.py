@@ -0,0 +1,165 @@
+from django.db import connections, router
+from django.db.models import F
+from modelcluster.models import get_all_child_m2m_relations, get_all_child_relations
+from treebeard.exceptions import PathOverflow
+from wagtail import VERSION as WAGTAIL_VERSION
+
+if WAGTAIL_VERSION >= (3, 0):
+    from wagtail.models import Page
+else:
+    from wagtail.core.models import Page
+
+
+class BulkPageCreator:
+    """
+    Create new child pages of a parent page in bulk, rather than one at a time
+    with add_child().
+
+    The materialised paths for the new pages are worked out here from the last
+    child of the parent, the Page rows and the rows of the page model are each
+    inserted with a single query and the numchild of the parent is updated once.
+
+    The pages are inserted without calling Page.save(), so no signals are sent,
+    and only the fields are validated. Pages with a slug that's already used by
+    a sibling are left to add_child(), which raises the usual ValidationError.
+    """
+
+    def __init__(self, parent_page, page_model):
+        self.parent_page = parent_page
+        self.page_model = page_model
+        self.pending = []
+        self.sibling_slugs = set(
+            parent_page.get_children().values_list("slug", flat=True)
+        )
+
+    @classmethod
+    def is_supported(cls, page_model):
+        """
+        Pages can be created in bulk when the page model inherits directly from
+        Page, and the database returns the primary keys of the inserted rows.
+        """
+        connection = connections[router.db_for_write(page_model)]
+        return (
+            page_model._meta.get_parent_list() == [Page]
+            and connection.features.can_return_rows_from_bulk_insert
+        )
+
+    def can_add(self, page):
+        return bool(page.slug) and page.slug not in self.sibling_slugs
+
+    def is_pending(self, page):
+        return any(pending_page is page for pending_page, _ in self.pending)
+
+    def add(self, page, callback):
+        """
+        Add a new page to create with the next bulk insert.
+        callback(page) is called once the page has been saved.
+        """
+        self.pending.append((page, callback))
+        self.sibling_slugs.add(page.slug)
+
+    def discard(self, count):
+        """Forget the pages added after the first count pending pages"""
+        for page, callback in self.pending[count:]:
+            self.sibling_slugs.discard(page.slug)
+        del self.pending[count:]
+
+    def add_slug(self, slug):
+        """Record the slug of a page saved by other means"""
+        self.sibling_slugs.add(slug)
+
+    def create(self):
+        """Create all the pending pages"""
+        if not self.pending:
+            return
+
+        pending, self.pending = self.pending, []
+        pages = [page for page, _ in pending]
+        using = router.db_for_write(self.page_model)
+
+        for page, path in zip(pages, self.get_new_paths(len(pages), using)):
+            page.path = path
+            page.depth = self.parent_page.depth + 1
+            page.numchild = 0
+            page.set_url_path(self.parent_page)
+            if not page.draft_title:
+                page.draft_title = page.title
+            if page.locale_id is None:
+                page.locale_id = self.parent_page.locale_id
+            page.clean_fields(
+                exclude=[
+                    field.name
+                    for field in self.page_model._meta.fields
+                    if field.is_relation
+                ]
+            )
+
+        base_pages = Page.objects.using(using).bulk_create(
+            [
+                Page(
+                    **{
+                        field.attname: getattr(page, field.attname)
+                        for field in Page._meta.concrete_fields
+                    }
+                )
+                for page in pages
+            ]
+        )
+        for page, base_page in zip(pages, base_pages):
+            page.id = base_page.id
+            setattr(page, self.page_model._meta.pk.attname, base_page.id)
+            page._state.adding = False
+            page._state.db = using
+
+        self.insert_specific_rows(pages, using)
+
+        for page in pages:
+            # what ClusterableModel.save() does for the child relations
+            for relation in get_all_child_relations(page):
+                getattr(page, relation.get_accessor_name()).commit()
+            for field in get_all_child_m2m_relations(page):
+                getattr(page, field.name).commit()
+
+        Page.objects.using(using).filter(pk=self.parent_page.pk).update(
+            numchild=F("numchild") + len(pages)
+        )
+        self.parent_page.numchild += len(pages)
+
+        for page, callback in pending:
+            callback(page)
+
+    def get_new_paths(self, count, using):
+        depth = self.parent_page.depth + 1
+        last_child_path = (
+            Page.objects.using(using)
+            .filter(path__startswith=self.parent_page.path, depth=depth)
+            .order_by("-path")
+            .values_list("path", flat=True)
+            .first()
+        )
+        first_step = (
+            Page._str2int(last_child_path[-Page.steplen :]) + 1
+            if last_child_path
+            else 1
+        )
+        if len(Page._int2str(first_step + count - 1)) > Page.steplen:
+            raise PathOverflow(f"Path Overflow from: '{last_child_path}'")
+        return [
+            Page._get_path(self.parent_page.path, depth, step)
+            for step in range(first_step, first_step + count)
+        ]
+
+    def insert_specific_rows(self, pages, using):
+        """
+        Insert the rows of the page model table. QuerySet.bulk_create() doesn't
+        support multi-table inheritance, so the rows are inserted the same way
+        it inserts them, for the fields of the page model table only.
+        """
+        fields = self.page_model._meta.local_concrete_fields
+        connection = connections[using]
+        batch_size = connection.ops.bulk_batch_size(fields, pages) or len(pages)
+        queryset = self.page_model._base_manager.using(using)
+        for start in range(0, len(pages), batch_size):
+            queryset._insert(
+                pages[start : start + batch_size], fields=fields, using=using
+            )
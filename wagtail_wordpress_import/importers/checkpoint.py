@@ -0,0 +1,227 @@
+import io
+import json
+import mmap
+import os
+import re
+
+# The <item> start and end tags, CDATA sections and comments are matched so an
+# <item in the content of another tag isn't mistaken for the start of an item
+ITEM_TAG_PATTERN = re.compile(
+    rb"<!\[CDATA\[.*?\]\]>|<!--.*?-->|<item[\s>]|</item\s*>", re.DOTALL
+)
+
+
+def find_item_offsets(xml_file_path, *indexes):
+    """
+    Scan the raw bytes of the XML file for the byte offsets of the <item>
+    tags at the given indexes, without parsing the XML.
+    An index past the last item is given the offset of the end of the last
+    item. Returns a dict of index: offset.
+    """
+    wanted = set(indexes)
+    offsets = {}
+    if not wanted or not os.path.getsize(xml_file_path):
+        return offsets
+
+    with open(xml_file_path, "rb") as xml_file:
+        with mmap.mmap(xml_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            index = 0
+            for match in ITEM_TAG_PATTERN.finditer(data):
+                if match.group().startswith(b"</item"):
+                    items_end = match.end()
+                    continue
+                if not match.group().startswith(b"<item"):
+                    continue
+                if index in wanted:
+                    offsets[index] = match.start()
+                    if len(offsets) == len(wanted):
+                        break
+                index += 1
+            else:
+                for wanted_index in wanted:
+                    if wanted_index >= index and index:
+                        offsets[wanted_index] = items_end
+
+    return offsets
+
+
+class ResumedXmlStream(io.RawIOBase):
+    """
+    Read the start of the XML file up to the first <item>, followed by the
+    rest of the file from a byte offset, so the reader sees a well formed
+    document that skips the items before the offset.
+    """
+
+    def __init__(self, xml_file_path, prefix_end, offset):
+        self.xml_file = open(xml_file_path, "rb")
+        self.prefix_remaining = prefix_end
+        self.offset = offset
+        if not prefix_end:
+            self.xml_file.seek(offset)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.prefix_remaining:
+            data = self.xml_file.read(min(len(buffer), self.prefix_remaining))
+            self.prefix_remaining -= len(data)
+            if not self.prefix_remaining:
+                self.xml_file.seek(self.offset)
+        else:
+            data = self.xml_file.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def close(self):
+        self.xml_file.close()
+        super().close()
+
+
+def resumed_xml_stream(xml_file_path, items_done):
+    """A stream of the XML file without the first items_done items"""
+    offsets = find_item_offsets(xml_file_path, 0, items_done)
+    if 0 not in offsets:
+        return open(xml_file_path, "rb")
+    return io.BufferedReader(
+        ResumedXmlStream(
+            xml_file_path,
+            offsets[0],
+            offsets[items_done],
+        )
+    )
+
+
+def selected_items_xml_stream(xml_file_path, indexes):
+    """
+    A stream of the XML file with only the items at the given indexes, along
+    with the tags before the first item and after the last one.
+    """
+    wanted = set(indexes)
+    if not os.path.getsize(xml_file_path):
+        return open(xml_file_path, "rb")
+
+    parts = []
+    with open(xml_file_path, "rb") as xml_file:
+        with mmap.mmap(xml_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            index = 0
+            first_item_start = item_start = items_end = None
+            for match in ITEM_TAG_PATTERN.finditer(data):
+                if match.group().startswith(b"</item"):
+                    if index - 1 in wanted and item_start is not None:
+                        parts.append(data[item_start : match.end()])
+                    items_end = match.end()
+                    item_start = None
+                elif match.group().startswith(b"<item"):
+                    item_start = match.start()
+                    if first_item_start is None:
+                        first_item_start = item_start
+                    index += 1
+
+            if first_item_start is None or items_end is None:
+                return open(xml_file_path, "rb")
+            parts.insert(0, data[:first_item_start])
+            parts.append(data[items_end:])
+
+    return io.BytesIO(b"".join(parts))
+
+
+class Checkpoint:
+    """
+    Record the progress of an import so it can be resumed after a failure.
+
+    The checkpoint file is a small JSON file saved after each chunk of items
+    is imported. It holds the number of items done and the logger totals.
+    The page ids and cached hook tags from each chunk are appended to a
+    journal file alongside it, and the checkpoint records the size of the
+    journal so anything written after the last checkpoint is ignored.
+    The cached hook items are journaled by their index in the XML file, and
+    read from the file again when the import is resumed.
+    """
+
+    def __init__(self, path, xml_file_path):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.xml_file_path = xml_file_path
+        self.cached_tags = []
+        self.cached_item_indexes = []
+
+    def get_xml_file_stat(self):
+        stat = os.stat(self.xml_file_path)
+        return {
+            "path": os.path.abspath(self.xml_file_path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+        }
+
+    def load(self):
+        """
+        Return the saved state, or None if there is no checkpoint for the
+        current XML file.
+        """
+        try:
+            with open(self.path, encoding="utf-8") as checkpoint_file:
+                state = json.load(checkpoint_file)
+        except (OSError, ValueError):
+            return None
+
+        if state.get("xml_file") != self.get_xml_file_stat():
+            print(f"The checkpoint at {self.path} is for a different XML file")
+            return None
+
+        return state
+
+    def read_journal(self, state):
+        """
+        Yield the journal records written up to the saved checkpoint, anything
+        written after it is removed as those items will be imported again.
+        """
+        with open(self.journal_path, "r+b") as journal_file:
+            journal = journal_file.read(state["journal_size"])
+            journal_file.truncate(state["journal_size"])
+        for line in journal.splitlines():
+            yield json.loads(line)
+
+    def record_cached_tag(self, key, item):
+        self.cached_tags.append([key, item])
+
+    def record_cached_item(self, index):
+        self.cached_item_indexes.append(index)
+
+    def save(self, importer, items_done, imported_page_ids, deferred_link_page_ids):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.journal_path, "ab") as journal_file:
+            record = {
+                "imported_page_ids": imported_page_ids,
+                "deferred_link_page_ids": deferred_link_page_ids,
+                "cached_tags": self.cached_tags,
+                "cached_item_indexes": self.cached_item_indexes,
+            }
+            journal_file.write(json.dumps(record).encode("utf-8") + b"\n")
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+            journal_size = journal_file.tell()
+        self.cached_tags = []
+        self.cached_item_indexes = []
+
+        state = {
+            "xml_file": self.get_xml_file_stat(),
+            "items_done": items_done,
+            "journal_size": journal_size,
+            "processed": importer.logger.processed,
+            "imported": importer.logger.imported,
+            "skipped": importer.logger.skipped,
+        }
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as checkpoint_file:
+            json.dump(state, checkpoint_file)
+        os.replace(temp_path, self.path)
+
+    def start(self):
+        """Remove any previous checkpoint when an import starts from the beginning"""
+        self.remove()
+
+    def remove(self):
+        for path in [self.path, self.journal_path]:
+            if os.path.exists(path):
+                os.remove(path)
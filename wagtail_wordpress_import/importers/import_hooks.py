@@ -1,6 +1,228 @@
-import copy
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
 
 from django.conf import settings
+from django.utils.module_loading import import_string
+
+from wagtail_wordpress_import.functions import CONTENT_DIGEST_KEY
+
+
+def conf_cache_backend():
+    return getattr(
+        settings,
+        "WORDPRESS_IMPORT_HOOKS_CACHE_BACKEND",
+        "wagtail_wordpress_import.importers.import_hooks.CacheStore",
+    )
+
+
+def conf_cache_dir():
+    """The directory for the SqliteCacheStore files, the system default if None"""
+    return getattr(settings, "WORDPRESS_IMPORT_HOOKS_CACHE_DIR", None)
+
+
+def get_cache_store(config):
+    """Create the cache store for a hook config"""
+    return import_string(config.get("CACHE_BACKEND") or conf_cache_backend())(
+        key=config.get("CACHE_KEY"),
+        indexes=config.get("CACHE_INDEXES"),
+        meta_keys=config.get("CACHE_META_KEYS"),
+    )
+
+
+def item_fingerprint(item, key=None):
+    """A digest of the canonical JSON form of an item dict, or the value of
+    the `key` field of the item when there is one.
+    """
+    if key and item.get(key) is not None:
+        return f"{key}={item[key]}"
+    return hashlib.sha1(
+        json.dumps(item, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def cacheable_item(item):
+    # wp:postmeta and the content digest are not needed in the cache, the rest
+    # of the item is only read by the hooks so it's not copied
+    return {
+        key: value
+        for key, value in item.items()
+        if key not in ("wp:postmeta", CONTENT_DIGEST_KEY)
+    }
+
+
+class CacheStore(list):
+    """A list of cached item dicts without duplicates.
+
+    Each item has a fingerprint, a digest of its canonical JSON form or the
+    value of the `key` field when one is configured with "CACHE_KEY" in the
+    hook config. The fingerprints seen so far are kept in a set, so checking
+    for a duplicate doesn't depend on the number of cached items.
+    """
+
+    def __init__(self, key=None, indexes=None, meta_keys=None):
+        super().__init__()
+        self.key = key
+        self.fingerprints = set()
+
+    def add(self, item):
+        cached_item = cacheable_item(item)
+        fingerprint = item_fingerprint(cached_item, self.key)
+        if fingerprint not in self.fingerprints:
+            self.fingerprints.add(fingerprint)
+            self.append(cached_item)
+            return cached_item
+
+    def close(self):
+        pass
+
+
+class IndexedCacheStore(CacheStore):
+    """A CacheStore with dict indexes of the cached items, so hooks don't
+    have to loop over all the items to find the ones they need.
+
+    by_post_id:
+        the item for each wp:post_id
+    by_post_parent:
+        a list of the items for each wp:post_parent
+    by_meta:
+        for each postmeta key in `meta_keys` ("CACHE_META_KEYS" in the hook
+        config), a list of the items for each meta value. The postmeta is
+        indexed before it's removed from the cached item.
+
+    The fields in `indexes` ("CACHE_INDEXES" in the hook config), wp:post_id
+    and wp:post_parent can also be used with get() and filter().
+    All the index keys are strings, so 100 and "100" are the same.
+    """
+
+    def __init__(self, key=None, indexes=None, meta_keys=None):
+        super().__init__(key)
+        self.by_post_id = {}
+        self.by_field = {
+            field: {} for field in ["wp:post_id", "wp:post_parent", *(indexes or [])]
+        }
+        self.by_post_parent = self.by_field["wp:post_parent"]
+        self.by_meta = {meta_key: {} for meta_key in meta_keys or []}
+
+    @staticmethod
+    def index_value(value):
+        return None if value is None else str(value)
+
+    def add(self, item):
+        cached_item = super().add(item)
+        if cached_item is None:
+            return None
+
+        for field, index in self.by_field.items():
+            value = cached_item.get(field)
+            if value is not None:
+                index.setdefault(self.index_value(value), []).append(cached_item)
+
+        post_id = cached_item.get("wp:post_id")
+        if post_id is not None:
+            self.by_post_id.setdefault(self.index_value(post_id), cached_item)
+
+        if self.by_meta:
+            postmeta = item.get("wp:postmeta") or []
+            for meta in postmeta if isinstance(postmeta, list) else [postmeta]:
+                index = self.by_meta.get(meta.get("wp:meta_key"))
+                value = meta.get("wp:meta_value")
+                if index is not None and value is not None:
+                    index.setdefault(self.index_value(value), []).append(cached_item)
+
+        return cached_item
+
+    def filter(self, field, value):
+        """All the items with a value for an indexed field"""
+        return list(self.by_field[field].get(self.index_value(value), []))
+
+    def get(self, field, value):
+        """The first item with a value for an indexed field, or None"""
+        items = self.by_field[field].get(self.index_value(value))
+        return items[0] if items else None
+
+
+class SqliteCacheStore:
+    """Cached item dicts without duplicates, stored in a temporary SQLite file
+    rather than in memory.
+
+    The items are iterated in the order they were added. Items can be looked
+    up by the fields listed in `indexes` ("CACHE_INDEXES" in the hook config)
+    without scanning all of them, e.g.
+
+        attachment = items_cache.get("wp:post_id", thumbnail_id)
+        attachments = items_cache.filter("wp:post_parent", page.wp_post_id)
+
+    Field values are compared as strings, so 100 and "100" are the same.
+    """
+
+    def __init__(self, key=None, indexes=None, meta_keys=None):
+        self.key = key
+        self.columns = {field: f"index_{i}" for i, field in enumerate(indexes or [])}
+        fd, self.path = tempfile.mkstemp(
+            suffix=".sqlite3", prefix="wagtail-wordpress-import-", dir=conf_cache_dir()
+        )
+        os.close(fd)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(
+            "CREATE TABLE items (id INTEGER PRIMARY KEY, fingerprint TEXT UNIQUE, data TEXT"
+            + "".join(f", {column} TEXT" for column in self.columns.values())
+            + ")"
+        )
+        for column in self.columns.values():
+            self.connection.execute(f"CREATE INDEX {column} ON items ({column})")
+
+    def add(self, item):
+        item = cacheable_item(item)
+        values = [
+            item_fingerprint(item, self.key),
+            json.dumps(item, default=str),
+            *(self.index_value(item.get(field)) for field in self.columns),
+        ]
+        self.connection.execute(
+            "INSERT OR IGNORE INTO items (fingerprint, data"
+            + "".join(f", {column}" for column in self.columns.values())
+            + ") VALUES ("
+            + ", ".join("?" * len(values))
+            + ")",
+            values,
+        )
+
+    @staticmethod
+    def index_value(value):
+        return None if value is None else str(value)
+
+    def __iter__(self):
+        for (data,) in self.connection.execute("SELECT data FROM items ORDER BY id"):
+            yield json.loads(data)
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def filter(self, field, value):
+        """All the items with a value for an indexed field"""
+        return [
+            json.loads(data)
+            for (data,) in self.connection.execute(
+                f"SELECT data FROM items WHERE {self.columns[field]} = ? ORDER BY id",
+                [self.index_value(value)],
+            )
+        ]
+
+    def get(self, field, value):
+        """The first item with a value for an indexed field, or None"""
+        row = self.connection.execute(
+            f"SELECT data FROM items WHERE {self.columns[field]} = ? ORDER BY id LIMIT 1",
+            [self.index_value(value)],
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        self.connection.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
 
 
 class ItemsCache:
@@ -14,10 +236,10 @@ class ItemsCache:
         create the class attribute.
         """
 
-        for hook in getattr(
+        for hook, config in getattr(
             settings, "WORDPRESS_IMPORT_HOOKS_ITEMS_TO_CACHE", {}
-        ).keys():
-            setattr(self, hook, [])
+        ).items():
+            setattr(self, hook, get_cache_store(config))
 
     def add_item_to_cache(self, key, item):
         """Add an item dict to the list of cached items if not already added.
@@ -28,12 +250,12 @@ class ItemsCache:
             The complete item tag in the XML file as a dict.
         """
 
-        cache = getattr(self, key)
-        item = copy.deepcopy(item)
-        if "wp:postmeta" in item:  # wp:postmeta is not needed in the cache
-            del item["wp:postmeta"]
-        if item not in cache:
-            cache.append(item)
+        getattr(self, key).add(item)
+
+    def close(self):
+        """Release the storage of the cached items once the hooks have run"""
+        for cache in vars(self).values():
+            cache.close()
 
 
 class TagsCache:
@@ -47,8 +269,10 @@ class TagsCache:
         create the class attribute.
         """
 
-        for hook in getattr(settings, "WORDPRESS_IMPORT_HOOKS_TAGS_TO_CACHE", {}):
-            setattr(self, hook, [])
+        for hook, config in getattr(
+            settings, "WORDPRESS_IMPORT_HOOKS_TAGS_TO_CACHE", {}
+        ).items():
+            setattr(self, hook, get_cache_store(config))
 
     def add_item_to_cache(self, key, item):
         """Add an item dict to the list of cached items if not already added
@@ -59,9 +283,9 @@ class TagsCache:
             The complete tag in the XML file as a dict.
         """
 
-        cache = getattr(self, key)
-        item = copy.deepcopy(item)
-        if "wp:postmeta" in item:  # wp:postmeta is not needed in the cache
-            del item["wp:postmeta"]
-        if item not in cache:
-            cache.append(item)
+        getattr(self, key).add(item)
+
+    def close(self):
+        """Release the storage of the cached items once the hooks have run"""
+        for cache in vars(self).values():
+            cache.close()
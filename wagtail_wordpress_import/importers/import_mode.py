@@ -0,0 +1,99 @@
+from contextlib import contextmanager, nullcontext
+
+from django.db.models.signals import post_save
+from wagtail import VERSION as WAGTAIL_VERSION
+from wagtail.search import index
+from wagtail.search.backends import get_search_backends
+from wagtail.search.signal_handlers import post_save_signal_handler
+
+if WAGTAIL_VERSION >= (3, 0):
+    from wagtail.models import Page
+else:
+    from wagtail.core.models import Page
+
+try:
+    from wagtail.models import ReferenceIndex
+    from wagtail.signal_handlers import disable_reference_index_auto_update
+except ImportError:  # the reference index was added in Wagtail 4.1
+    ReferenceIndex = None
+    disable_reference_index_auto_update = nullcontext
+
+
+# The number of pages added to the search backends with each bulk update
+SEARCH_INDEX_CHUNK_SIZE = 500
+
+
+@contextmanager
+def import_mode(page_model):
+    """
+    Stop the pages of page_model being added to the search index and the
+    reference index each time one is saved. The indexes are updated for all
+    the imported pages at the end of the import instead, see
+    update_search_index() and update_reference_index().
+    """
+    with deferred_search_index(page_model):
+        with disable_reference_index_auto_update():
+            yield
+
+
+@contextmanager
+def deferred_search_index(page_model):
+    """Stop the pages of page_model being added to the search index when saved"""
+    disconnected = post_save.disconnect(post_save_signal_handler, sender=page_model)
+    try:
+        yield
+    finally:
+        if disconnected:
+            post_save.connect(post_save_signal_handler, sender=page_model)
+
+
+def update_search_index(
+    page_model, page_ids, logger=None, chunk_size=SEARCH_INDEX_CHUNK_SIZE
+):
+    """
+    Add the pages to the search backends with a bulk update for each chunk of
+    pages. The progress is reported to the logger.
+    """
+    if not page_ids or not index.class_is_indexed(page_model):
+        return
+    backends = list(get_search_backends(with_auto_update=True))
+    page_ids = list(dict.fromkeys(page_ids))
+    for start in range(0, len(page_ids), chunk_size):
+        pages = list(
+            page_model.get_indexed_objects().filter(
+                id__in=page_ids[start : start + chunk_size]
+            )
+        )
+        for backend in backends:
+            backend.add_bulk(page_model, pages)
+        if logger:
+            logger.log_search_index_progress(
+                min(start + chunk_size, len(page_ids)), len(page_ids)
+            )
+
+
+def update_reference_index(page_model, page_ids):
+    """Record the objects the pages refer to, e.g. images and snippets"""
+    if ReferenceIndex is None or not ReferenceIndex.model_is_indexable(page_model):
+        return
+    for page in page_model.objects.filter(id__in=page_ids).iterator():
+        ReferenceIndex.create_or_update_for_object(page)
+
+
+def find_duplicate_slugs(page_ids):
+    """
+    Return the (id, slug) of the pages that have the same slug as a sibling
+    page, the check Page.full_clean() makes with a query for each page.
+    """
+    pages = list(Page.objects.filter(id__in=page_ids).values_list("id", "path", "slug"))
+    siblings = {}
+    for sibling_id, path, slug in Page.objects.filter(
+        slug__in={slug for _, _, slug in pages},
+        depth__in={len(path) // Page.steplen for _, path, _ in pages},
+    ).values_list("id", "path", "slug"):
+        siblings.setdefault((path[: -Page.steplen], slug), []).append(sibling_id)
+    return [
+        (page_id, slug)
+        for page_id, path, slug in pages
+        if len(siblings.get((path[: -Page.steplen], slug), [])) > 1
+    ]
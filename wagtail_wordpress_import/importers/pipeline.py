@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+try:
+    from functools import cached_property
+except ImportError:
+    from cached_property import cached_property
+
+from wagtail_wordpress_import.block_builder import (
+    conf_promote_child_tags,
+    get_builder_functions,
+)
+from wagtail_wordpress_import.block_builder_defaults import conf_fallback_block
+from wagtail_wordpress_import.prefilters.triggers import with_trigger
+
+DEFAULT_PREFILTERS = [
+    {
+        "FUNCTION": "wagtail_wordpress_import.prefilters.linebreaks_wp",
+    },
+    {
+        "FUNCTION": "wagtail_wordpress_import.prefilters.transform_shortcodes",
+    },
+    {
+        "FUNCTION": "wagtail_wordpress_import.prefilters.transform_inline_styles",
+    },
+    {
+        "FUNCTION": "wagtail_wordpress_import.prefilters.bleach_clean",
+    },
+]
+
+
+def prefilter_function(prefilter):
+    """The function of a configured prefilter, with the TRIGGER if there is one"""
+    function = import_string(prefilter["FUNCTION"])
+    if "TRIGGER" in prefilter:
+        function = with_trigger(function, prefilter["TRIGGER"])
+    return function
+
+
+class ImportPipeline:
+    """
+    The prefilters and block builders from the settings, resolved once for an
+    import run and reused for every item.
+
+    Each part is resolved the first time it's used, so e.g. a worker process
+    that only runs the prefilters never resolves the block builders.
+    """
+
+    @cached_property
+    def prefilters(self):
+        """A list of (function, options) for each configured prefilter"""
+        return [
+            (prefilter_function(prefilter), prefilter.get("OPTIONS"))
+            for prefilter in getattr(
+                settings, "WAGTAIL_WORDPRESS_IMPORT_PREFILTERS", DEFAULT_PREFILTERS
+            )
+        ]
+
+    @cached_property
+    def builder_functions(self):
+        return get_builder_functions()
+
+    @cached_property
+    def fallback_function(self):
+        return import_string(conf_fallback_block())
+
+    @cached_property
+    def promote_child_tags(self):
+        return conf_promote_child_tags()
@@ -0,0 +1,83 @@
+from io import BytesIO
+from xml.dom import pulldom
+
+from lxml import etree
+
+from wagtail_wordpress_import.functions import (
+    element_to_dict,
+    get_element_name,
+    node_to_dict,
+)
+
+
+class LxmlReader:
+    """
+    Stream the XML file with lxml.etree.iterparse.
+
+    Only the tags that are asked for are converted to a dict. Every element is
+    cleared, along with its preceding siblings, once it has been processed so
+    the memory used stays flat no matter how big the XML file is.
+    """
+
+    def __init__(self, source):
+        self.source = source
+
+    def get_source(self):
+        """lxml can only read bytes, so text streams are encoded first."""
+        if hasattr(self.source, "read") and isinstance(self.source.read(0), str):
+            return BytesIO(self.source.read().encode("utf-8"))
+        return self.source
+
+    def iter_tags(self, tag_names):
+        """
+        Yield a (tag_name, item) tuple for each tag in tag_names, where item is
+        the tag converted to a dict.
+        A (None, None) tuple is yielded for all other elements.
+        """
+        captured = None
+
+        for event, element in etree.iterparse(
+            self.get_source(), events=("start", "end"), huge_tree=True
+        ):
+            if event == "start":
+                if captured is None and get_element_name(element) in tag_names:
+                    captured = element
+                continue
+
+            if element is captured:
+                captured = None
+                yield get_element_name(element), element_to_dict(element)
+            elif captured is not None:
+                continue  # the element is part of a tag that's still being read
+            else:
+                yield None, None
+
+            element.clear(keep_tail=True)
+            parent = element.getparent()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+
+
+class PulldomReader:
+    """
+    Read the XML file with xml.dom.pulldom, expanding each of the tags that
+    are asked for to a minidom node.
+    """
+
+    def __init__(self, source):
+        self.source = source
+
+    def iter_tags(self, tag_names):
+        xml_doc = pulldom.parse(self.source)
+
+        for event, node in xml_doc:
+            """
+            Each node represents a tag in the xml.
+            `event` is true for a start element.
+            """
+            if event == pulldom.START_ELEMENT and node.tagName in tag_names:
+                xml_doc.expandNode(node)
+                yield node.tagName, node_to_dict(node)
+            else:
+                yield None, None
@@ -1,5 +1,9 @@
 import copy
 import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
 
 from wagtail import VERSION as WAGTAIL_VERSION
@@ -9,11 +13,11 @@ try:
 except ImportError:
     from cached_property import cached_property
 
-from xml.dom import pulldom
-
+import django
 from bs4 import BeautifulSoup
 from django.apps import apps
 from django.conf import settings
+from django.db import transaction
 from django.utils.module_loading import import_string
 from django.utils.text import slugify
 from django.utils.timezone import make_aware
@@ -24,51 +28,114 @@ else:
     from wagtail.core.models import Page
 
 from wagtail_wordpress_import.block_builder import BlockBuilder
+from wagtail_wordpress_import.block_builder_defaults import (
+    media_savepoint,
+    media_title_index,
+)
+from wagtail_wordpress_import.dom import accepts_dom, to_dom, to_html
 from wagtail_wordpress_import.functions import (
+    CONTENT_DIGEST_KEY,
     get_attr_as_list,
-    node_to_dict,
+    item_content_digest,
+    normalize_wp_link,
     snakecase_key,
 )
+from wagtail_wordpress_import.importers.bulk_pages import BulkPageCreator
+from wagtail_wordpress_import.importers.checkpoint import (
+    resumed_xml_stream,
+    selected_items_xml_stream,
+)
 from wagtail_wordpress_import.importers.import_hooks import ItemsCache, TagsCache
+from wagtail_wordpress_import.importers.import_mode import (
+    SEARCH_INDEX_CHUNK_SIZE,
+    deferred_search_index,
+    find_duplicate_slugs,
+    import_mode,
+    update_reference_index,
+    update_search_index,
+)
+from wagtail_wordpress_import.importers.pipeline import (  # noqa: F401
+    DEFAULT_PREFILTERS,
+    ImportPipeline,
+)
 from wagtail_wordpress_import.importers.wordpress_defaults import (
     category_name_min_length,
     category_plugin_enabled,
     debug_enabled,
     get_category_model,
+    get_xml_reader,
     yoast_plugin_config,
     yoast_plugin_enabled,
 )
+from wagtail_wordpress_import.media_fetcher import MediaFetcher
 from wagtail_wordpress_import.prefilters.linebreaks_wp_filter import (
     filter_linebreaks_wp,
 )
+from wagtail_wordpress_import.prefilters.triggers import is_triggered
+
+# The number of XML entries processed together, e.g. when looking up existing pages
+CHUNK_SIZE = 100
+
+# The number of items read ahead for each worker process when the prefilters
+# are run in a pool of worker processes
+WORKERS_READ_AHEAD = 8
+
+# The number of threads and the number of downloads per host used to prefetch media
+MEDIA_WORKERS = 8
+MEDIA_PER_HOST = 4
+
 
-DEFAULT_PREFILTERS = [
-    {
-        "FUNCTION": "wagtail_wordpress_import.prefilters.linebreaks_wp",
-    },
-    {
-        "FUNCTION": "wagtail_wordpress_import.prefilters.transform_shortcodes",
-    },
-    {
-        "FUNCTION": "wagtail_wordpress_import.prefilters.transform_inline_styles",
-    },
-    {
-        "FUNCTION": "wagtail_wordpress_import.prefilters.bleach_clean",
-    },
-]
+# The import pipeline of a worker process, created in setup_worker()
+worker_pipeline = None
+
+
+def setup_worker():
+    """Make sure Django is set up when a worker process is spawned rather than forked"""
+    global worker_pipeline
+    if not apps.ready:
+        django.setup()
+    worker_pipeline = ImportPipeline()
+
+
+def prefilter_item_content(raw_body):
+    """
+    Run the prefilters on the body of a single item in a worker process.
+    Returns the prefiltered content and the debug content collected on the way.
+    """
+    wordpress_item = WordpressItem(
+        {"content:encoded": raw_body}, None, pipeline=worker_pipeline
+    )
+    content = wordpress_item.prefilter_content(raw_body)
+    return content, wordpress_item.debug_content
 
 
 class WordpressImporter:
     def __init__(self, xml_file_path):
         self.xml_file = xml_file_path
         self.imported_page_ids = []
+        self.deferred_link_page_ids = []
         self.page_link_errors = []
         self.items_cache = ItemsCache()
         self.tags_cache = TagsCache()
+        self.existing_pages = {}
+        self.link_index = None
+        # the link index keys added by the item in the current item_savepoint()
+        self.link_index_added = None
+        # wp_post_id: (page id, content digest) of the pages already imported,
+        # loaded for an incremental import
+        self.existing_digests = None
+        self.pipeline = ImportPipeline()
+        self.checkpoint = None
+        # the number of items read from the xml so far
+        self.items_read = 0
+        # creates the new pages in bulk, when enabled
+        self.bulk_pages = None
+        # save the pages without the search and reference index updates, and
+        # only validate the page fields
+        self.lightweight_save = False
 
     def run(self, *args, **kwargs):
         self.logger = kwargs["logger"]
-        xml_doc = pulldom.parse(self.xml_file)
 
         try:
             self.page_model_class = apps.get_model(
@@ -89,154 +156,604 @@ class WordpressImporter:
             print(f"A page with id {kwargs['parent_id']} does not exist")
             exit()
 
-        for event, node in xml_doc:
-            """
-            Each node represents a tag in the xml.
-            `event` is true for a start element.
-            """
+        bulk_create = False
+        if kwargs.get("bulk_create"):
+            bulk_create = BulkPageCreator.is_supported(self.page_model_class)
+            if not bulk_create:
+                print(
+                    f"{self.page_model_class.__name__} pages can't be created in bulk, they will be created one at a time"
+                )
+
+        self.lightweight_save = kwargs.get("lightweight_save", False)
+        # pages created in bulk don't send the signals that index them, so
+        # they're added to both indexes at the end of the import
+        defer_reference_index = self.lightweight_save or bulk_create
+        defer_search_index = defer_reference_index or kwargs.get("defer_search_index")
+        if defer_reference_index:
+            save_mode = import_mode(self.page_model_class)
+        elif defer_search_index:
+            save_mode = deferred_search_index(self.page_model_class)
+        else:
+            save_mode = nullcontext()
+        with save_mode:
+            with media_title_index():
+                if kwargs.get("prefetch_media"):
+                    self.prefetch_media(
+                        kwargs["page_types"],
+                        kwargs["page_statuses"],
+                        kwargs.get("media_workers") or MEDIA_WORKERS,
+                        kwargs.get("media_per_host") or MEDIA_PER_HOST,
+                    )
+
+                if kwargs.get("incremental"):
+                    self.load_existing_digests()
 
-            if event == pulldom.START_ELEMENT and node.tagName in getattr(
+                if bulk_create:
+                    self.bulk_pages = BulkPageCreator(
+                        self.parent_page_obj, self.page_model_class
+                    )
+
+                items_done = 0
+                self.checkpoint = kwargs.get("checkpoint")
+                if self.checkpoint:
+                    if kwargs.get("resume"):
+                        items_done = self.resume_from_checkpoint()
+                    if not items_done:
+                        self.checkpoint.start()
+                self.items_read = items_done
+
+                entries = self.xml_entries(items_done)
+                workers = kwargs.get("workers") or 1
+                if workers > 1:
+                    entries = self.prefilter_in_workers(
+                        entries, workers, kwargs["page_types"], kwargs["page_statuses"]
+                    )
+
+                chunk_size = kwargs.get("chunk_size") or CHUNK_SIZE
+                batch_size = kwargs.get("batch_size")
+                if batch_size:
+                    # a batch is never larger than the chunk it's taken from
+                    chunk_size = max(chunk_size, batch_size)
+
+                for chunk in self.chunked(entries, chunk_size):
+                    self.load_existing_pages(
+                        chunk, kwargs["page_types"], kwargs["page_statuses"]
+                    )
+                    for batch in self.chunked(chunk, batch_size or chunk_size):
+                        imported_count = len(self.imported_page_ids)
+                        deferred_count = len(self.deferred_link_page_ids)
+                        if batch_size:
+                            self.process_batch(
+                                batch, kwargs["page_types"], kwargs["page_statuses"]
+                            )
+                        else:
+                            for node_name, item, prefiltered in batch:
+                                self.process_entry(
+                                    node_name,
+                                    item,
+                                    prefiltered,
+                                    kwargs["page_types"],
+                                    kwargs["page_statuses"],
+                                )
+                            self.create_pending_pages()
+
+                        if self.checkpoint:
+                            items_done += sum(
+                                1 for entry in batch if entry[0] == "item"
+                            )
+                            self.checkpoint.save(
+                                self,
+                                items_done,
+                                self.imported_page_ids[imported_count:],
+                                self.deferred_link_page_ids[deferred_count:],
+                            )
+
+            self.imported_pages = self.page_model_class.objects.filter(
+                id__in=[id for id in self.imported_page_ids]
+            ).specific()
+
+            self.connect_richtext_page_links(
+                self.page_model_class.objects.filter(
+                    id__in=self.deferred_link_page_ids
+                ).specific()
+            )
+
+            """Run all hooks in settings.WORDPRESS_IMPORT_HOOKS_ITEMS_TO_CACHE"""
+            for hook, actions in getattr(
+                settings, "WORDPRESS_IMPORT_HOOKS_ITEMS_TO_CACHE", {}
+            ).items():
+                import_string(actions["FUNCTION"])(
+                    self.imported_pages,
+                    actions["DATA_TAG"],
+                    getattr(self.items_cache, hook),
+                )
+
+            """Run all hooks in settings.WORDPRESS_IMPORT_HOOKS_TAGS_TO_CACHE"""
+            for hook, actions in getattr(
                 settings, "WORDPRESS_IMPORT_HOOKS_TAGS_TO_CACHE", {}
-            ):  # add top level XML tags to cache
-                xml_doc.expandNode(node)
-                item = node_to_dict(node)
-                self.tags_cache.add_item_to_cache(node.tagName, item)
-
-            if event == pulldom.START_ELEMENT and node.tagName == "item":
-                xml_doc.expandNode(node)
-                item = node_to_dict(node)
-                self.logger.processed += 1
-
-                post_type = item.get("wp:post_type")
-                if post_type in getattr(
-                    settings, "WORDPRESS_IMPORT_HOOKS_ITEMS_TO_CACHE", {}
-                ):  # add item level XML tags to cache
-                    self.items_cache.add_item_to_cache(post_type, item)
+            ).items():
+                import_string(actions["FUNCTION"])(
+                    self.imported_pages,
+                    actions["DATA_TAG"],
+                    getattr(self.tags_cache, hook),
+                )
 
-                if (
-                    item.get("wp:post_type") in kwargs["page_types"]
-                    and item.get("wp:status") in kwargs["page_statuses"]
-                ):
+            self.items_cache.close()
+            self.tags_cache.close()
+
+        if self.lightweight_save:
+            self.log_duplicate_slugs()
+        if defer_reference_index:
+            update_reference_index(self.page_model_class, self.imported_page_ids)
+        if defer_search_index:
+            update_search_index(
+                self.page_model_class,
+                self.imported_page_ids,
+                self.logger,
+                kwargs.get("search_index_chunk_size") or SEARCH_INDEX_CHUNK_SIZE,
+            )
 
-                    wordpress_item = WordpressItem(item, self.logger)
+        if self.checkpoint:
+            self.checkpoint.remove()
 
-                    try:
-                        page = self.page_model_class.objects.get(
-                            wp_post_id=wordpress_item.cleaned_data.get("wp_post_id")
-                        )
-                    except self.page_model_class.DoesNotExist:
-                        page = self.page_model_class()
+    def log_duplicate_slugs(self):
+        """
+        Log the imported pages that have the same slug as a sibling page, which
+        the lightweight save doesn't check when a page is updated
+        """
+        duplicates = dict(find_duplicate_slugs(self.imported_page_ids))
+        pages = self.page_model_class.objects.filter(id__in=duplicates).order_by("pk")
+        for page in pages:
+            print(
+                f"Page {page.id}: the slug {page.slug} is already in use by a sibling"
+            )
+            self.logger.log_item(
+                {
+                    "id": page.id,
+                    "title": page.title,
+                    "link": getattr(page, "wp_link", ""),
+                    "wp_guid": "",
+                    "result": "warning",
+                    "reason": f"the slug {page.slug} is already in use by a sibling",
+                    "datecheck": "",
+                    "slugcheck": "",
+                }
+            )
 
-                    # add categories for this page if categories plugin is enabled
-                    if category_plugin_enabled() and get_category_model():
-                        self.connect_page_categories(
-                            page, import_string(get_category_model()), item
+    def resume_from_checkpoint(self):
+        """
+        Restore the state saved by the checkpoint.
+        Returns the number of items that were already imported.
+        """
+        state = self.checkpoint.load()
+        if not state:
+            print("There is no checkpoint to resume from, starting from the beginning")
+            return 0
+
+        cached_item_indexes = []
+        for record in self.checkpoint.read_journal(state):
+            self.imported_page_ids.extend(record["imported_page_ids"])
+            self.deferred_link_page_ids.extend(record["deferred_link_page_ids"])
+            for key, item in record["cached_tags"]:
+                self.tags_cache.add_item_to_cache(key, item)
+            cached_item_indexes.extend(record["cached_item_indexes"])
+
+        if cached_item_indexes:
+            with selected_items_xml_stream(
+                self.xml_file, cached_item_indexes
+            ) as source:
+                for node_name, item in self.get_reader(source).iter_tags({"item"}):
+                    if node_name == "item":
+                        self.items_cache.add_item_to_cache(
+                            item.get("wp:post_type"), item
                         )
 
-                    cleaned_data = wordpress_item.cleaned_data
-
-                    body = cleaned_data.get("body")
-
-                    self.check_stream_field_block_types(
-                        page, body
-                    )  # if the body streamfield is invalid, exit with a ValueError
-
-                    page.import_wordpress_data(cleaned_data)
-
-                    if item.get("wp:status") == "draft":
-                        setattr(page, "live", False)
-                    else:
-                        setattr(page, "live", True)
-
-                    if page.id:
-                        page.save()
-                        self.logger.imported += 1
-                        self.logger.items.append(
-                            {
-                                "id": page.id,
-                                "title": page.title,
-                                "link": item.get("link"),
-                                "wp_guid": item.get("guid"),
-                                "result": "updated",
-                                "reason": "existed",
-                                "datecheck": wordpress_item.date_changed,
-                                "slugcheck": wordpress_item.slug_changed,
-                            }
-                        )
-                    else:
-                        self.parent_page_obj.add_child(instance=page)
-                        page.save()
-                        self.logger.imported += 1
-                        self.logger.items.append(
-                            {
-                                "id": page.id,
-                                "title": page.title,
-                                "link": item.get("link"),
-                                "wp_guid": item.get("guid"),
-                                "result": "created",
-                                "reason": "existed",
-                                "datecheck": wordpress_item.date_changed,
-                                "slugcheck": wordpress_item.slug_changed,
-                            }
+        self.logger.processed = state["processed"]
+        self.logger.imported = state["imported"]
+        self.logger.skipped = state["skipped"]
+
+        print(f"Resuming the import after {state['items_done']} items")
+        return state["items_done"]
+
+    def process_batch(self, batch, page_types, page_statuses):
+        """
+        Process a batch of entries in a single transaction. Each entry is
+        processed in a savepoint, so an item that fails is rolled back and
+        logged without losing the rest of the batch.
+        """
+        started = time.perf_counter()
+        with transaction.atomic():
+            for node_name, item, prefiltered in batch:
+                existing_page = (
+                    self.existing_pages.get(item.get("wp:post_id"))
+                    if node_name == "item"
+                    else None
+                )
+                if self.bulk_pages and self.bulk_pages.is_pending(existing_page):
+                    # the post appeared before in this batch, its page is
+                    # created outside the savepoint so it can't be rolled back
+                    # if this item fails
+                    self.bulk_pages.create()
+                try:
+                    with self.item_savepoint():
+                        self.process_entry(
+                            node_name, item, prefiltered, page_types, page_statuses
                         )
+                except Exception as error:
+                    self.handle_failed_item(item or {}, existing_page, error)
+            self.create_pending_pages()
+            processed = time.perf_counter()
+        self.logger.log_batch(
+            len(batch), processed - started, time.perf_counter() - processed
+        )
 
-                    self.imported_page_ids.append(page.id)
+    @contextmanager
+    def item_savepoint(self):
+        """
+        Process an item in a savepoint. If it fails its database changes are
+        rolled back, and so is the state that refers to them: the pages
+        imported, their links in the link index, the pages waiting to be
+        created in bulk and the media saved for the body.
+        """
+        imported = self.logger.imported
+        imported_count = len(self.imported_page_ids)
+        deferred_count = len(self.deferred_link_page_ids)
+        pending_count = len(self.bulk_pages.pending) if self.bulk_pages else 0
+        self.link_index_added = []
+        try:
+            with transaction.atomic(), media_savepoint():
+                yield
+        except Exception:
+            self.logger.imported = imported
+            del self.imported_page_ids[imported_count:]
+            del self.deferred_link_page_ids[deferred_count:]
+            for key in self.link_index_added:
+                self.link_index.pop(key, None)
+            if self.bulk_pages:
+                self.bulk_pages.discard(pending_count)
+            raise
+        finally:
+            self.link_index_added = None
+
+    def handle_failed_item(self, item, existing_page, error):
+        """
+        Log an item that failed, and reset the state that refers to the
+        database changes that were rolled back
+        """
+        if existing_page is None or existing_page.pk is None:
+            # the page created for the item was rolled back
+            self.existing_pages.pop(item.get("wp:post_id"), None)
+        # the tree fields of the parent page, e.g. numchild
+        self.parent_page_obj.refresh_from_db()
+        print(f"Failed to import {item.get('link')}: {error!r}")
+        self.logger.log_item(
+            {
+                "id": 0,
+                "title": item.get("title"),
+                "link": item.get("link"),
+                "wp_guid": item.get("guid"),
+                "result": "failed",
+                "reason": repr(error),
+                "datecheck": "",
+                "slugcheck": "",
+            }
+        )
 
-                else:
-                    self.logger.skipped += 1
-                    self.logger.items.append(
-                        {
-                            "id": 0,
-                            "title": "",
-                            "link": "",
-                            "wp_guid": "",
-                            "result": "excluded",
-                            "reason": "not a page type or status to import",
-                            "datecheck": "",
-                            "slugcheck": "",
-                        }
-                    )
-            else:
-                self.logger.items.append(
+    def create_pending_pages(self):
+        if self.bulk_pages:
+            self.bulk_pages.create()
+
+    def process_entry(self, node_name, item, prefiltered, page_types, page_statuses):
+        if node_name in getattr(
+            settings, "WORDPRESS_IMPORT_HOOKS_TAGS_TO_CACHE", {}
+        ):  # add top level XML tags to cache
+            self.tags_cache.add_item_to_cache(node_name, item)
+            if self.checkpoint:
+                self.checkpoint.record_cached_tag(node_name, item)
+
+        if node_name == "item":
+            self.logger.processed += 1
+            self.items_read += 1
+
+            post_type = item.get("wp:post_type")
+            if post_type in getattr(
+                settings, "WORDPRESS_IMPORT_HOOKS_ITEMS_TO_CACHE", {}
+            ):  # add item level XML tags to cache
+                self.items_cache.add_item_to_cache(post_type, item)
+                if self.checkpoint:
+                    self.checkpoint.record_cached_item(self.items_read - 1)
+
+            if not self.is_importable(item, page_types, page_statuses):
+                self.logger.skipped += 1
+                self.logger.log_item(
                     {
                         "id": 0,
                         "title": "",
                         "link": "",
                         "wp_guid": "",
                         "result": "excluded",
-                        "reason": "not a item",
+                        "reason": "not a page type or status to import",
+                        "datecheck": "",
+                        "slugcheck": "",
+                    }
+                )
+            elif self.is_unchanged(item):
+                self.logger.skipped += 1
+                self.logger.log_item(
+                    {
+                        "id": self.existing_digests[item.get("wp:post_id")][0],
+                        "title": item.get("title"),
+                        "link": item.get("link"),
+                        "wp_guid": item.get("guid"),
+                        "result": "skipped",
+                        "reason": "unchanged",
                         "datecheck": "",
                         "slugcheck": "",
                     }
                 )
-            self.logger.log_progress()
-
-        self.imported_pages = self.page_model_class.objects.filter(
-            id__in=[id for id in self.imported_page_ids]
-        ).specific()
-
-        self.connect_richtext_page_links(self.imported_pages)
-
-        """Run all hooks in settings.WORDPRESS_IMPORT_HOOKS_ITEMS_TO_CACHE"""
-        for hook, actions in getattr(
-            settings, "WORDPRESS_IMPORT_HOOKS_ITEMS_TO_CACHE", {}
-        ).items():
-            import_string(actions["FUNCTION"])(
-                self.imported_pages,
-                actions["DATA_TAG"],
-                getattr(self.items_cache, hook),
+            else:
+                self.import_item(item, prefiltered)
+        elif self.logger.verbose:
+            self.logger.log_item(
+                {
+                    "id": 0,
+                    "title": "",
+                    "link": "",
+                    "wp_guid": "",
+                    "result": "excluded",
+                    "reason": "not a item",
+                    "datecheck": "",
+                    "slugcheck": "",
+                }
             )
 
-        """Run all hooks in settings.WORDPRESS_IMPORT_HOOKS_TAGS_TO_CACHE"""
-        for hook, actions in getattr(
-            settings, "WORDPRESS_IMPORT_HOOKS_TAGS_TO_CACHE", {}
-        ).items():
-            import_string(actions["FUNCTION"])(
-                self.imported_pages,
-                actions["DATA_TAG"],
-                getattr(self.tags_cache, hook),
+    @staticmethod
+    def chunked(entries, chunk_size):
+        chunk = []
+        for entry in entries:
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def load_existing_pages(self, chunk, page_types, page_statuses):
+        """
+        Look up the existing pages for all the items to import in a chunk with
+        a single query, so creating or updating a page is a dict lookup.
+        """
+        wp_post_ids = [
+            item.get("wp:post_id")
+            for node_name, item, _ in chunk
+            if node_name == "item"
+            and self.is_importable(item, page_types, page_statuses)
+            and not self.is_unchanged(item)
+        ]
+        self.existing_pages = {}
+        for page in self.page_model_class.objects.filter(
+            wp_post_id__in=wp_post_ids
+        ).order_by("pk"):
+            self.existing_pages.setdefault(page.wp_post_id, page)
+
+    def load_existing_digests(self):
+        """
+        Load the content digest of every imported page with a single query, so
+        the items that haven't changed since they were imported can be skipped
+        before they are prefiltered.
+        """
+        self.existing_digests = {}
+        for wp_post_id, page_id, digest in (
+            self.page_model_class.objects.exclude(wp_post_id__isnull=True)
+            .order_by("pk")
+            .values_list("wp_post_id", "pk", "wp_content_digest")
+        ):
+            self.existing_digests.setdefault(wp_post_id, (page_id, digest))
+
+    def is_unchanged(self, item):
+        """Whether an item is the same as when it was last imported"""
+        if self.existing_digests is None:
+            return False
+        existing = self.existing_digests.get(item.get("wp:post_id"))
+        return existing is not None and existing[1] == item_content_digest(item)
+
+    def get_reader(self, source=None):
+        return import_string(get_xml_reader())(source or self.xml_file)
+
+    def xml_entries(self, items_done=0):
+        """
+        Yield a (node_name, item, prefiltered) tuple for each element in the xml.
+        Items and the top level tags to cache are converted to a dict, all other
+        elements are yielded with a node_name and item of None.
+        When resuming an import the first items_done items are skipped by
+        seeking past them in the file, without parsing them.
+        """
+        tag_names = {
+            "item",
+            *getattr(settings, "WORDPRESS_IMPORT_HOOKS_TAGS_TO_CACHE", {}),
+        }
+        if not items_done:
+            for node_name, item in self.get_reader().iter_tags(tag_names):
+                yield node_name, item, None
+            return
+
+        with resumed_xml_stream(self.xml_file, items_done) as source:
+            for node_name, item in self.get_reader(source).iter_tags(tag_names):
+                yield node_name, item, None
+
+    def prefetch_media(self, page_types, page_statuses, workers, per_host):
+        """
+        Download the images and documents for all the items to import before
+        any pages are built, so the block builder finds them already saved.
+        """
+        media_fetcher = MediaFetcher(max_workers=workers, max_per_host=per_host)
+        for node_name, item in self.get_reader().iter_tags({"item"}):
+            if node_name == "item" and self.is_importable(
+                item, page_types, page_statuses
+            ):
+                media_fetcher.scan(item.get("content:encoded"))
+        media_fetcher.fetch()
+
+    @staticmethod
+    def is_importable(item, page_types, page_statuses):
+        return (
+            item.get("wp:post_type") in page_types
+            and item.get("wp:status") in page_statuses
+        )
+
+    def prefilter_in_workers(self, entries, workers, page_types, page_statuses):
+        """
+        Read ahead through the xml entries and run the prefilters for the items
+        to import in a pool of worker processes.
+        The entries are yielded in their original order with the prefiltered
+        content attached, so all database writes stay in this process.
+        A sliding window of items is kept submitted to the workers, so they
+        carry on prefiltering while the yielded entries are saved.
+        """
+        read_ahead = workers * WORKERS_READ_AHEAD
+
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=setup_worker
+        ) as executor:
+            window = deque()
+            submitted = 0
+            for node_name, item, _ in entries:
+                future = None
+                if (
+                    node_name == "item"
+                    and self.is_importable(item, page_types, page_statuses)
+                    and not self.is_unchanged(item)
+                ):
+                    future = executor.submit(
+                        prefilter_item_content, item["content:encoded"]
+                    )
+                    submitted += 1
+                window.append((node_name, item, future))
+
+                while submitted > read_ahead:
+                    if window[0][2] is not None:
+                        submitted -= 1
+                    yield self.pop_prefiltered_entry(window)
+
+            while window:
+                yield self.pop_prefiltered_entry(window)
+
+    @staticmethod
+    def pop_prefiltered_entry(window):
+        """
+        The oldest entry in the window, waiting for its prefilters to run.
+        An exception raised by the prefilters is passed on in place of the
+        prefiltered content, so the item fails when it's imported.
+        """
+        node_name, item, future = window.popleft()
+        if future is None:
+            return node_name, item, None
+        return node_name, item, future.exception() or future.result()
+
+    def import_item(self, item, prefiltered=None):
+        if isinstance(prefiltered, Exception):
+            # the prefilters failed in a worker process
+            raise prefiltered
+        wordpress_item = WordpressItem(
+            item, self.logger, prefiltered, pipeline=self.pipeline
+        )
+
+        wp_post_id = wordpress_item.cleaned_data.get("wp_post_id")
+        page = self.existing_pages.get(wp_post_id)
+        if self.bulk_pages and self.bulk_pages.is_pending(page):
+            # the post appeared before in this chunk, save it first to update it
+            self.bulk_pages.create()
+        if page is None:
+            page = self.page_model_class()
+            # the same post could appear again in this chunk
+            self.existing_pages[wp_post_id] = page
+
+        # add categories for this page if categories plugin is enabled
+        if category_plugin_enabled() and get_category_model():
+            self.connect_page_categories(
+                page, import_string(get_category_model()), item
             )
 
+        cleaned_data = wordpress_item.cleaned_data
+
+        body = cleaned_data.get("body")
+
+        self.check_stream_field_block_types(
+            page, body
+        )  # if the body streamfield is invalid, exit with a ValueError
+
+        # link to the pages that are already imported before the page is saved,
+        # relative links are resolved against the link of the item as a new
+        # page has no wp_link yet
+        stream_data = json.loads(body)
+        changed, unresolved = self.link_rich_text_blocks(
+            stream_data, page, cleaned_data.get("wp_link")
+        )
+        if changed:
+            cleaned_data["body"] = json.dumps(stream_data)
+
+        page.import_wordpress_data(cleaned_data)
+        page.wp_content_digest = item_content_digest(item)
+
+        if item.get("wp:status") == "draft":
+            setattr(page, "live", False)
+        else:
+            setattr(page, "live", True)
+
+        if page.id:
+            self.save_page(page)
+            self.page_imported(page, item, wordpress_item, "updated", unresolved)
+        elif self.bulk_pages and self.bulk_pages.can_add(page):
+
+            def bulk_page_created(page):
+                self.page_imported(page, item, wordpress_item, "created", unresolved)
+
+            self.bulk_pages.add(page, bulk_page_created)
+        else:
+            self.parent_page_obj.add_child(instance=page)
+            if not self.lightweight_save:
+                page.save()
+            self.page_imported(page, item, wordpress_item, "created", unresolved)
+
+        if self.bulk_pages:
+            self.bulk_pages.add_slug(page.slug)
+
+    def save_page(self, page):
+        if self.lightweight_save:
+            # skip the queries of Page.full_clean(), e.g. to check the slug
+            page.clean_fields(
+                exclude=[
+                    field.name
+                    for field in self.page_model_class._meta.fields
+                    if field.is_relation
+                ]
+            )
+            page.save(clean=False)
+        else:
+            page.save()
+
+    def page_imported(self, page, item, wordpress_item, result, unresolved):
+        """Record a page that has been saved"""
+        self.imported_page_ids.append(page.id)
+        self.add_to_link_index(page)
+        if unresolved:
+            # the links could be to pages further on in the XML file
+            self.deferred_link_page_ids.append(page.id)
+
+        self.logger.imported += 1
+        self.logger.log_item(
+            {
+                "id": page.id,
+                "title": page.title,
+                "link": item.get("link"),
+                "wp_guid": item.get("guid"),
+                "result": result,
+                "reason": "existed",
+                "datecheck": wordpress_item.date_changed,
+                "slugcheck": wordpress_item.slug_changed,
+            }
+        )
+
     @staticmethod
     def check_stream_field_block_types(page, body):
         """Body JSON is validated to check it is using only StreamField blocks declared in the model StreamField
@@ -253,41 +770,48 @@ class WordpressImporter:
                 raise ValueError(f"Invalid page streamfield block types: {item_block}")
 
     def analyze_html(self, html_analyzer, *, page_types, page_statuses):
-        xml_doc = pulldom.parse(self.xml_file)
-
-        for event, node in xml_doc:
-            """
-            Each node represents a tag in the xml.
-            `event` is true for a start element.
-            """
-            if event == pulldom.START_ELEMENT and node.tagName == "item":
-                xml_doc.expandNode(node)
-                item = node_to_dict(node)
-                if (
-                    item.get("wp:post_type") in page_types
-                    and item.get("wp:status") in page_statuses
-                ):
-
-                    html_analyzer.analyze(
-                        filter_linebreaks_wp(item.get("content:encoded"))
-                    )
+        for node_name, item in self.get_reader().iter_tags({"item"}):
+            if node_name == "item" and self.is_importable(
+                item, page_types, page_statuses
+            ):
+                html_analyzer.analyze(filter_linebreaks_wp(item.get("content:encoded")))
 
     def connect_richtext_page_links(self, imported_pages):
         """
-        Update the StreamField content of each page by reconstructing
-        the existing blocks. Only update rich_text blocks by analysing the anchor links
-        in update_rich_text_page_links()
+        Update the StreamField content of pages that had links to pages which
+        were not imported yet when they were saved. Only rich_text blocks are
+        updated by analysing the anchor links in replace_page_links()
+        and only the body column is written for pages that have changed.
         """
         for page in imported_pages:
             stream_data = page.body._raw_data
-            reconstructed_blocks = []
-            for block in stream_data:
-                del block["id"]  # these get created on save so lose the old id
-                if block["type"] == "rich_text":
-                    block["value"] = str(self.update_rich_text_page_links(block, page))
-                reconstructed_blocks.append(block)
-            page.body = json.dumps(stream_data)
-            page.save()
+            changed, unresolved = self.link_rich_text_blocks(stream_data, page)
+            if changed:
+                page.body = json.dumps(list(stream_data))
+                self.page_model_class.objects.filter(pk=page.pk).update(body=page.body)
+
+    def link_rich_text_blocks(self, stream_data, page, base=None):
+        """
+        Replace the links to imported pages in the rich_text blocks of
+        stream_data, a list of block dicts. Relative links are resolved against
+        base, or the wp_link of the page.
+        Returns whether any block changed and whether any links to pages on the
+        source domain could not be found, which could be pages not imported yet.
+        """
+        changed = False
+        unresolved = False
+        for block in stream_data:
+            if block["type"] == "rich_text" and "<a" in block["value"]:
+                soup = BeautifulSoup(block["value"], "html.parser")
+                resolved_links, unresolved_links = self.replace_page_links(
+                    soup, page, base
+                )
+                if resolved_links:
+                    block["value"] = str(soup)
+                    changed = True
+                if unresolved_links:
+                    unresolved = True
+        return changed, unresolved
 
     def update_rich_text_page_links(self, block, page):
         """
@@ -297,25 +821,75 @@ class WordpressImporter:
         save to the log.
         """
         soup = BeautifulSoup(block["value"], "html.parser")
+        self.replace_page_links(soup, page)
+        return soup
+
+    def replace_page_links(self, soup, page, base=None):
+        """
+        Replace the anchor tags in soup that link to an imported page.
+        Returns the number of links replaced and the number of links to the
+        source domain that could not be found.
+        """
+        resolved_links = 0
+        unresolved_links = 0
         links = soup.findAll("a")
 
         for link in links:
-            page_link = self.get_page(link.attrs.get("href"), page)
-            if page_link:
+            page_id = self.get_page_id(link.attrs.get("href"), page, base)
+            if page_id:
                 new_tag = soup.new_tag("a")
-                new_tag.attrs["id"] = page_link.id
+                new_tag.attrs["id"] = page_id
                 new_tag.attrs["linktype"] = "page"
                 new_tag.string = link.text
                 link.replace_with(new_tag)
-        return soup
-
-    def get_page(self, link, page):
-        try:
-            if debug_enabled():
-                self.logger.page_link_errors.append((link, page))
-            return self.page_model_class.objects.get(wp_link=link)
-        except self.page_model_class.DoesNotExist:
-            pass
+                resolved_links += 1
+            elif self.is_source_domain_link(
+                link.attrs.get("href"), base or getattr(page, "wp_link", None)
+            ):
+                unresolved_links += 1
+        return resolved_links, unresolved_links
+
+    def is_source_domain_link(self, link, base=None):
+        domain = getattr(settings, "WAGTAIL_WORDPRESS_IMPORTER_SOURCE_DOMAIN", "")
+        key = normalize_wp_link(link, domain, base)
+        return key is not None and key.startswith(normalize_wp_link("/", domain))
+
+    def add_to_link_index(self, page):
+        """Add a page that's just been saved so later pages can link to it"""
+        domain = getattr(settings, "WAGTAIL_WORDPRESS_IMPORTER_SOURCE_DOMAIN", "")
+        key = normalize_wp_link(page.wp_link, domain)
+        link_index = self.get_link_index()
+        if key is not None and key not in link_index:
+            link_index[key] = page.id
+            if self.link_index_added is not None:
+                self.link_index_added.append(key)
+
+    def get_link_index(self):
+        """
+        Build an index of the normalized wp_link of every page to its page id
+        with a single query the first time it's needed.
+        """
+        if self.link_index is None:
+            domain = getattr(settings, "WAGTAIL_WORDPRESS_IMPORTER_SOURCE_DOMAIN", "")
+            self.link_index = {}
+            for wp_link, page_id in (
+                self.page_model_class.objects.exclude(wp_link__isnull=True)
+                .exclude(wp_link="")
+                .order_by("pk")
+                .values_list("wp_link", "pk")
+            ):
+                self.link_index.setdefault(normalize_wp_link(wp_link, domain), page_id)
+        return self.link_index
+
+    def get_page_id(self, link, page, base=None):
+        if debug_enabled():
+            self.logger.log_page_link_error(link, page)
+        key = normalize_wp_link(
+            link,
+            getattr(settings, "WAGTAIL_WORDPRESS_IMPORTER_SOURCE_DOMAIN", ""),
+            base or getattr(page, "wp_link", None),
+        )
+        return self.get_link_index().get(key)
 
     def connect_page_categories(self, page, category_model, item):
         if "category" in item.keys():
@@ -352,9 +926,13 @@ def default_prefilters():
 
 
 class WordpressItem:
-    def __init__(self, node, logger):
+    def __init__(self, node, logger, prefiltered=None, pipeline=None):
         self.node = node
         self.raw_body = self.node["content:encoded"]
+        # (content, debug_content) when the prefilters were run in a worker process
+        self.prefiltered = prefiltered
+        # the prefilters and block builders, shared by all the items of an import
+        self.pipeline = pipeline or ImportPipeline()
         self.slug_changed = ""
         self.date_changed = ""
         self.image_errors = []
@@ -368,18 +946,39 @@ class WordpressItem:
         """
         FILTERS ARE CUMULATIVE: Each filter receives the output from the previous filter.
         """
+        return to_html(self.run_prefilters(content))
+
+    def run_prefilters(self, content):
+        """
+        Filters marked with accepts_dom receive and return a parsed tree, which
+        is shared by consecutive DOM filters. The content is only parsed or
+        serialised when the next filter expects the other form, so the result
+        is a tree when the last filter is a DOM filter.
+
+        A filter with a trigger is skipped when the trigger isn't found in the
+        content, see prefilters.triggers.
+        """
         cached_result = content
 
-        for filter in getattr(
-            settings, "WAGTAIL_WORDPRESS_IMPORT_PREFILTERS", DEFAULT_PREFILTERS
-        ):
-            function = import_string(filter["FUNCTION"])
-            cached_result = function(cached_result, filter.get("OPTIONS"))
+        for function, options in self.pipeline.prefilters:
+            if is_triggered(function, cached_result, options):
+                if accepts_dom(function):
+                    cached_result = to_dom(cached_result)
+                else:
+                    cached_result = to_html(cached_result)
+                cached_result = function(cached_result, options)
             if debug_enabled():
-                self.debug_content[function.__name__] = cached_result
+                self.debug_content[function.__name__] = to_html(cached_result)
 
         return cached_result
 
+    def prefiltered_body(self):
+        if self.prefiltered is not None:
+            content, debug_content = self.prefiltered
+            self.debug_content.update(debug_content)
+            return content
+        return self.prefilter_content(self.raw_body)
+
     def cleaned_title(self):
         title = self.node.get("title", None)
         if title:
@@ -448,7 +1047,7 @@ class WordpressItem:
         return str(self.node["link"].strip())
 
     def body_stream_field(self, content):
-        builder = BlockBuilder(content, self.node, self.logger)
+        builder = BlockBuilder(content, self.node, self.logger, self.pipeline)
         builder.promote_child_tags()
         blocks_dict = builder.build()
         if debug_enabled():
@@ -506,6 +1105,8 @@ class WordpressItem:
         # the content:encoded tag is not needed in the
         # wp_post_meta field as the content is parsed elsewhere
         del node["content:encoded"]
+        # the content digest the importer keeps on the item isn't post meta
+        node.pop(CONTENT_DIGEST_KEY, None)
 
         cleaned = {}  # the final value to be returned
 
@@ -531,7 +1132,7 @@ class WordpressItem:
             "first_published_at": self.cleaned_first_published_at(),
             "last_published_at": self.cleaned_last_published_at(),
             "latest_revision_created_at": self.cleaned_latest_revision_created_at(),
-            "body": self.body_stream_field(self.prefilter_content(self.raw_body)),
+            "body": self.body_stream_field(self.prefiltered_body()),
             "search_description": self.cleaned_search_description(),
             "wp_post_id": self.cleaned_post_id(),
             "wp_post_type": self.cleaned_post_type(),
@@ -41,3 +41,11 @@ def category_name_min_length():
 
 def get_category_model():
     return getattr(settings, "WAGTAIL_WORDPRESS_IMPORT_CATEGORY_PLUGIN_MODEL", None)
+
+
+def get_xml_reader():
+    return getattr(
+        settings,
+        "WAGTAIL_WORDPRESS_IMPORT_XML_READER",
+        "wagtail_wordpress_import.importers.readers.LxmlReader",
+    )
@@ -1,26 +1,174 @@
 import csv
+import os
 import sys
+from collections import Counter
 from datetime import datetime
 
+IMPORT_REPORT_HEADER = {
+    "id": "Page ID",
+    "title": "Page Title",
+    "url": "Wordpress Link",
+    "reason": "Reason for result ->",
+    "result": "Result",
+    "dates": "Dates Changed",
+    "slug": "Slug Changed",
+}
+
+IMAGES_REPORT_HEADER = {
+    "id": "Page ID",
+    "title": "Page Title",
+    "url": "Wordpress Link",
+    "reason": "Reason",
+}
+
+PAGELINK_ERRORS_REPORT_HEADER = {
+    "id": "Page ID",
+    "title": "Page Title",
+    "link": "Wordpress Link",
+}
+
+
+def import_report_row(row):
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "url": row["link"],
+        "reason": row["reason"],
+        "result": row["result"],
+        "dates": row["datecheck"],
+        "slug": row["slugcheck"],
+    }
+
+
+def images_report_row(row):
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "url": row["link"],
+        "reason": row["reason"],
+    }
+
+
+def pagelink_errors_report_row(row):
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "link": row["link"],
+    }
+
+
+class CsvReport:
+    """
+    A CSV report the rows are written to as they are logged. The file is
+    created when the first row is written, or when the report is closed.
+    """
+
+    def __init__(self, file_name, header):
+        self.file_name = file_name
+        self.header = header
+        self.file = None
+        self.writer = None
+
+    def open(self):
+        self.file = open(self.file_name, "w", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=list(self.header))
+        self.writer.writerow(self.header)
+
+    def write(self, row):
+        if self.file is None:
+            self.open()
+        self.writer.writerow(row)
+
+    def close(self):
+        if self.file is None:
+            self.open()
+        self.file.close()
+
 
 class Logger:
-    def __init__(self, logdir):
+    def __init__(self, logdir, verbose=False):
         self.logdir = logdir
+        # log a row for every element of the XML, not only for the items
+        self.verbose = verbose
         self.processed = 0
         self.imported = 0
         self.skipped = 0
+        # the number of rows logged for each result, e.g. created or skipped
+        self.results = Counter()
+        self.last_item = None
         self.items = []
         self.images = []
         self.urls = []
         self.page_link_errors = []
+        self.batches = []
+        self.search_indexed = 0
+        # the reports the rows are written to as they are logged
+        self.reports = {}
+
+    def report_file_name(self, name):
+        return f"{self.logdir}/{name}-report-{datetime.now().strftime('%Y%m%d-%H%M%S')}.csv"
+
+    def start_reports(self):
+        """
+        Write the rows to the CSV reports as they are logged, rather than
+        keeping them in memory until the reports are saved. Without a log
+        directory the rows are kept, and the reports fail when they are saved.
+        """
+        if not os.path.isdir(self.logdir):
+            return
+        self.reports = {
+            "import": CsvReport(self.report_file_name("import"), IMPORT_REPORT_HEADER),
+            "images": CsvReport(self.report_file_name("images"), IMAGES_REPORT_HEADER),
+            "pagelink_errors": CsvReport(
+                self.report_file_name("pagelink_errors"),
+                PAGELINK_ERRORS_REPORT_HEADER,
+            ),
+        }
+
+    def log_item(self, item):
+        """Log the result of processing an element of the XML"""
+        self.results[item["result"]] += 1
+        self.last_item = item
+        if "import" in self.reports:
+            self.reports["import"].write(import_report_row(item))
+        else:
+            self.items.append(item)
+        self.log_progress()
+
+    def log_image(self, image):
+        if "images" in self.reports:
+            self.reports["images"].write(images_report_row(image))
+        else:
+            self.images.append(image)
+
+    def log_page_link_error(self, link, page):
+        row = {
+            "id": getattr(page, "id", ""),
+            "title": getattr(page, "title", ""),
+            "link": link,
+        }
+        if "pagelink_errors" in self.reports:
+            self.reports["pagelink_errors"].write(pagelink_errors_report_row(row))
+        else:
+            self.page_link_errors.append(row)
 
     def log_progress(self):
-        item = self.items[-1]
-        if not item["id"] == 0:
+        item = self.last_item
+        if item and not item["id"] == 0:
             sys.stdout.write(
                 f"Wagtail ID: {item['id']}, \"{item['title']}\", {item['result']}, {item['id']}, {item['wp_guid']}\n"
             )
 
+    def log_batch(self, items, duration, commit_duration):
+        """Record how long a batch of items took to process and to commit"""
+        self.batches.append(
+            {"items": items, "duration": duration, "commit_duration": commit_duration}
+        )
+
+    def log_search_index_progress(self, indexed, total):
+        sys.stdout.write(f"Search index: {indexed} of {total} pages\n")
+        self.search_indexed = indexed
+
     def get_items_report_data(self):
         report_data = {
             "processed": self.processed,
@@ -41,6 +189,20 @@ class Logger:
             + " Processed: "
             + str(self.processed)
         )
+        if self.results:
+            sys.stdout.write(
+                "\nResults: "
+                + " ".join(
+                    f"{result}: {count}" for result, count in self.results.items()
+                )
+            )
+        if self.batches:
+            commit_durations = [batch["commit_duration"] for batch in self.batches]
+            sys.stdout.write(
+                f"\nBatches: {len(self.batches)}"
+                f" Average commit: {sum(commit_durations) / len(commit_durations):.3f}s"
+                f" Slowest commit: {max(commit_durations):.3f}s"
+            )
         if self.processed - self.skipped == self.imported:
             sys.stdout.write("\n✅ Completed Successfully\n")
         else:
@@ -48,101 +210,31 @@ class Logger:
                 "\n⚠️ Completed but there were errors with imported amounts\n"
             )
 
+    def save_csv_report(self, name, header, rows, report_row):
+        if name in self.reports:
+            # the rows have already been written as they were logged
+            self.reports.pop(name).close()
+            return
+
+        report = CsvReport(self.report_file_name(name), header)
+        for row in rows:
+            report.write(report_row(row))
+        report.close()
+
     def save_csv_import_report(self):
-        file_name = f"{self.logdir}/import-report-{datetime.now().strftime('%Y%m%d-%H%M%S')}.csv"
-
-        with open(file_name, "w", newline="") as csvfile:
-            writer = csv.DictWriter(
-                csvfile,
-                fieldnames=[
-                    "id",
-                    "title",
-                    "url",
-                    "reason",
-                    "result",
-                    "dates",
-                    "slug",
-                ],
-            )
-            writer.writerow(
-                {
-                    "id": "Page ID",
-                    "title": "Page Title",
-                    "url": "Wordpress Link",
-                    "reason": "Reason for result ->",
-                    "result": "Result",
-                    "dates": "Dates Changed",
-                    "slug": "Slug Changed",
-                }
-            )
-            for row in self.items:
-                writer.writerow(
-                    {
-                        "id": row["id"],
-                        "title": row["title"],
-                        "url": row["link"],
-                        "reason": row["reason"],
-                        "result": row["result"],
-                        "dates": row["datecheck"],
-                        "slug": row["slugcheck"],
-                    }
-                )
+        self.save_csv_report(
+            "import", IMPORT_REPORT_HEADER, self.items, import_report_row
+        )
 
     def save_csv_images_report(self):
-        file_name = f"{self.logdir}/images-report-{datetime.now().strftime('%Y%m%d-%H%M%S')}.csv"
-
-        with open(file_name, "w", newline="") as csvfile:
-            writer = csv.DictWriter(
-                csvfile,
-                fieldnames=[
-                    "id",
-                    "title",
-                    "url",
-                    "reason",
-                ],
-            )
-            writer.writerow(
-                {
-                    "id": "Page ID",
-                    "title": "Page Title",
-                    "url": "Wordpress Link",
-                    "reason": "Reason",
-                }
-            )
-            for row in self.images:
-                writer.writerow(
-                    {
-                        "id": row["id"],
-                        "title": row["title"],
-                        "url": row["link"],
-                        "reason": row["reason"],
-                    }
-                )
+        self.save_csv_report(
+            "images", IMAGES_REPORT_HEADER, self.images, images_report_row
+        )
 
     def save_csv_pagelink_errors_report(self):
-        file_name = f"{self.logdir}/pagelink_errors-report-{datetime.now().strftime('%Y%m%d-%H%M%S')}.csv"
-
-        with open(file_name, "w", newline="") as csvfile:
-            writer = csv.DictWriter(
-                csvfile,
-                fieldnames=[
-                    "id",
-                    "title",
-                    "link",
-                ],
-            )
-            writer.writerow(
-                {
-                    "id": "Page ID",
-                    "title": "Page Title",
-                    "link": "Wordpress Link",
-                }
-            )
-            for row in self.images:
-                writer.writerow(
-                    {
-                        "id": row["id"],
-                        "title": row["title"],
-                        "link": row["link"],
-                    }
-                )
+        self.save_csv_report(
+            "pagelink_errors",
+            PAGELINK_ERRORS_REPORT_HEADER,
+            self.page_link_errors,
+            pagelink_errors_report_row,
+        )
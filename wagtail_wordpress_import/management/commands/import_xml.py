@@ -3,6 +3,7 @@ import os
 from django.conf import settings
 from django.core.management.base import BaseCommand
 
+from wagtail_wordpress_import.importers.checkpoint import Checkpoint
 from wagtail_wordpress_import.importers.wordpress import WordpressImporter
 from wagtail_wordpress_import.logger import Logger
 
@@ -56,6 +57,76 @@ class Command(BaseCommand):
             help="The wordpress post statuse/s to import. Use a comma to separate multiple types",
             default="publish,draft",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="The number of worker processes used to prefilter the page content",
+            default=1,
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="The number of XML items to process together, e.g. when looking up existing pages",
+            default=100,
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="The number of XML items to save in a single transaction",
+        )
+        parser.add_argument(
+            "--bulk-create",
+            action="store_true",
+            help="Create the new pages in bulk rather than one at a time",
+        )
+        parser.add_argument(
+            "--lightweight-save",
+            action="store_true",
+            help="Save the pages without updating the search and reference indexes, which are updated at the end of the import",
+        )
+        parser.add_argument(
+            "--defer-search-index",
+            action="store_true",
+            help="Add the imported pages to the search index in bulk at the end of the import",
+        )
+        parser.add_argument(
+            "--search-index-chunk-size",
+            type=int,
+            help="The number of pages added to the search index with each bulk update",
+            default=500,
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Skip the items that haven't changed since they were last imported",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            action="store_true",
+            help="Save a checkpoint after each chunk of items so a failed import can be resumed",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Resume an import that failed from its last checkpoint",
+        )
+        parser.add_argument(
+            "--prefetch-media",
+            action="store_true",
+            help="Download the images and documents for all the items before importing the pages",
+        )
+        parser.add_argument(
+            "--media-workers",
+            type=int,
+            help="The number of concurrent downloads used to prefetch the media",
+            default=8,
+        )
+        parser.add_argument(
+            "--media-per-host",
+            type=int,
+            help="The maximum number of concurrent downloads from a single host",
+            default=4,
+        )
 
     def handle(self, **options):
         if not getattr(settings, "WAGTAIL_WORDPRESS_IMPORTER_SOURCE_DOMAIN", ""):
@@ -66,8 +137,17 @@ class Command(BaseCommand):
             )
             exit()
         xml_file_path = self.get_xml_file(f"{options['xml_file']}")
-        logger = Logger(LOG_DIR)
+        logger = Logger(LOG_DIR, verbose=options["verbosity"] > 1)
+        logger.start_reports()
         importer = WordpressImporter(xml_file_path)
+        checkpoint = None
+        if options["checkpoint"] or options["resume"]:
+            checkpoint = Checkpoint(
+                os.path.join(
+                    LOG_DIR, f"checkpoint-{os.path.basename(xml_file_path)}.json"
+                ),
+                xml_file_path,
+            )
         importer.run(
             page_types=options["type"].split(","),
             page_statuses=options["status"].split(","),
@@ -75,6 +155,19 @@ class Command(BaseCommand):
             model_for_pages=options["model"],
             parent_id=options["parent_id"],
             logger=logger,
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            prefetch_media=options["prefetch_media"],
+            media_workers=options["media_workers"],
+            media_per_host=options["media_per_host"],
+            checkpoint=checkpoint,
+            resume=options["resume"],
+            incremental=options["incremental"],
+            batch_size=options["batch_size"],
+            bulk_create=options["bulk_create"],
+            lightweight_save=options["lightweight_save"],
+            defer_search_index=options["defer_search_index"],
+            search_index_chunk_size=options["search_index_chunk_size"],
         )
         logger.output_import_summary()
         logger.save_csv_import_report()
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from functools import lru_cache
+
+import requests
+from django.conf import settings
+
+
+def conf_media_cache_dir():
+    return getattr(settings, "WAGTAIL_WORDPRESS_IMPORTER_MEDIA_CACHE_DIR", None)
+
+
+def conf_media_cache_max_size():
+    return getattr(
+        settings, "WAGTAIL_WORDPRESS_IMPORTER_MEDIA_CACHE_MAX_SIZE", 1024**3
+    )
+
+
+def get_media_cache():
+    """The media cache for the current settings, or None if it isn't enabled"""
+    directory = conf_media_cache_dir()
+    if directory:
+        return media_cache_for(directory, conf_media_cache_max_size())
+
+
+@lru_cache(maxsize=None)
+def media_cache_for(directory, max_size):
+    return MediaCache(directory, max_size)
+
+
+class MediaCache:
+    """
+    A download cache on disk so the media doesn't have to be downloaded
+    again each time the import is run.
+
+    directory/
+        entries/<sha256 of the url>.json  the response headers and the blob name
+        blobs/<sha256 of the content>     the response body
+
+    The bodies are stored by their content, so the same file at different urls
+    is only stored once. When the blobs grow larger than max_size (bytes) the
+    least recently used ones are removed, an entry without its blob is a miss.
+    """
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.entries_dir = os.path.join(directory, "entries")
+        self.blobs_dir = os.path.join(directory, "blobs")
+        os.makedirs(self.entries_dir, exist_ok=True)
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        self.size = None
+        self.lock = threading.Lock()
+
+    def entry_path(self, url):
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.entries_dir, f"{name}.json")
+
+    def blob_path(self, blob):
+        return os.path.join(self.blobs_dir, blob)
+
+    def get(self, url):
+        """
+        Return the cached entry for a url with its content, and mark it as
+        recently used
+        """
+        try:
+            with open(self.entry_path(url), encoding="utf-8") as entry_file:
+                entry = json.load(entry_file)
+            blob_path = self.blob_path(entry["blob"])
+            with open(blob_path, "rb") as blob_file:
+                entry["content"] = blob_file.read()
+            os.utime(blob_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return entry
+
+    @staticmethod
+    def response(entry):
+        """Build a requests Response for a cached entry"""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = entry["url"]
+        response._content = entry["content"]
+        if entry["content_type"]:
+            response.headers["content-type"] = entry["content_type"]
+        return response
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def set(self, url, response):
+        content = response.content
+        blob = hashlib.sha256(content).hexdigest()
+        blob_path = self.blob_path(blob)
+
+        with self.lock:
+            if self.size is None:
+                self.size = self.get_blobs_size()
+            if not os.path.exists(blob_path):
+                self.write_file(blob_path, content)
+                self.size += len(content)
+
+        entry = {
+            "url": url,
+            "content_type": response.headers.get("content-type"),
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "blob": blob,
+        }
+        self.write_file(self.entry_path(url), json.dumps(entry).encode("utf-8"))
+
+        with self.lock:
+            if self.size > self.max_size:
+                self.evict(keep=blob)
+
+    def write_file(self, path, content):
+        """Write to a temporary file first, so a reader never sees half a file"""
+        fd, temp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(content)
+        os.replace(temp_path, path)
+
+    def get_blobs_size(self):
+        return sum(entry.stat().st_size for entry in os.scandir(self.blobs_dir))
+
+    def evict(self, keep=None):
+        """Remove the least recently used blobs until the cache fits in max_size"""
+        blobs = sorted(
+            (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+            for entry in os.scandir(self.blobs_dir)
+            if entry.name != keep
+        )
+        for _, size, path in blobs:
+            if self.size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self.size -= size
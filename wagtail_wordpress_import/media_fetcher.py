@@ -0,0 +1,136 @@
+import html
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+
+from wagtail_wordpress_import.block_builder_defaults import (
+    ImportedDocument,
+    ImportedImage,
+    fetch_url,
+    get_absolute_src,
+    get_document_file_name,
+    get_image_file_name,
+    get_requests_session,
+    is_document_href,
+    save_document,
+    save_image,
+)
+
+IMG_SRC_PATTERN = re.compile(
+    r"<img\s[^>]*?\bsrc\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE
+)
+ANCHOR_HREF_PATTERN = re.compile(
+    r"<a\s[^>]*?\bhref\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE
+)
+
+# The number of titles checked for existing media with each query
+EXISTING_TITLES_QUERY_SIZE = 500
+
+
+class MediaFetcher:
+    """
+    Download the images and documents linked in the HTML content of all the
+    items before the pages are imported.
+
+    The downloads run in a pool of threads that share a pooled requests session,
+    with at most `max_per_host` downloads running against a single host.
+    The media is saved to Wagtail as the downloads complete, so when the pages
+    are built `get_or_save_image()` and `get_or_save_document()` only have to
+    look up the saved media by its title.
+    """
+
+    def __init__(self, max_workers=8, max_per_host=4):
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        # a connection for each thread, the threads can all use the same host
+        self.session = get_requests_session(pool_maxsize=max_workers)
+        self.image_urls = {}
+        self.document_urls = {}
+        self.host_semaphores = {}
+        self.host_semaphores_lock = threading.Lock()
+
+    def scan(self, content):
+        """Collect the image and document urls in a HTML string, by file name"""
+        if not content:
+            return
+
+        domain = getattr(settings, "WAGTAIL_WORDPRESS_IMPORTER_SOURCE_DOMAIN", None)
+
+        for src in IMG_SRC_PATTERN.findall(content):
+            src = get_absolute_src(html.unescape(src), domain)
+            self.image_urls.setdefault(get_image_file_name(src), src)
+
+        for href in ANCHOR_HREF_PATTERN.findall(content):
+            href = get_absolute_src(html.unescape(href), domain)
+            if is_document_href(href):
+                self.document_urls.setdefault(get_document_file_name(href), href)
+
+    def fetch(self):
+        """Download and save all the collected media that doesn't exist yet"""
+        self.fetch_all(self.missing_urls(ImportedImage, self.image_urls), save_image)
+        self.fetch_all(
+            self.missing_urls(ImportedDocument, self.document_urls), save_document
+        )
+
+    @staticmethod
+    def missing_urls(model, urls):
+        titles = list(urls)
+        existing_titles = set()
+        for i in range(0, len(titles), EXISTING_TITLES_QUERY_SIZE):
+            existing_titles.update(
+                model.objects.filter(
+                    title__in=titles[i : i + EXISTING_TITLES_QUERY_SIZE]
+                ).values_list("title", flat=True)
+            )
+        return [url for title, url in urls.items() if title not in existing_titles]
+
+    def fetch_all(self, urls, save):
+        """
+        Download the urls in the pool of threads and save each one in this thread
+        as soon as it's downloaded. Only a few downloads are queued ahead of the
+        saves, so the downloaded content doesn't pile up in memory.
+        """
+        if not urls:
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {}
+            for url in urls:
+                pending[executor.submit(self.download, url)] = url
+                if len(pending) >= self.max_workers * 2:
+                    pending = self.save_completed(pending, save)
+
+            while pending:
+                pending = self.save_completed(pending, save)
+
+    @staticmethod
+    def save_completed(pending, save):
+        done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            save(pending[future], *future.result())
+        return {future: pending[future] for future in not_done}
+
+    def download(self, url):
+        with self.get_host_semaphore(url):
+            response, valid, content_type = fetch_url(url, session=self.session)
+            if response is not None:
+                try:
+                    # read the streamed content here rather than in the saving thread
+                    response.content
+                except requests.RequestException:
+                    print(f"RequestException: {url}")
+                    return None, False, None
+            return response, valid, content_type
+
+    def get_host_semaphore(self, url):
+        host = urlparse(url).netloc
+        with self.host_semaphores_lock:
+            if host not in self.host_semaphores:
+                self.host_semaphores[host] = threading.BoundedSemaphore(
+                    self.max_per_host
+                )
+            return self.host_semaphores[host]
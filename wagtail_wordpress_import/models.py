@@ -10,7 +10,7 @@ else:
 
 
 class WPImportedPageMixin(Page):
-    wp_post_id = models.IntegerField(blank=True, null=True)
+    wp_post_id = models.IntegerField(blank=True, null=True, db_index=True)
     wp_post_type = models.CharField(max_length=255, blank=True, null=True)
     wp_link = models.TextField(blank=True, null=True)
     wp_raw_content = models.TextField(blank=True, null=True)
@@ -18,6 +18,7 @@ class WPImportedPageMixin(Page):
     wp_block_json = models.TextField(blank=True, null=True)
     wp_normalized_styles = models.TextField(blank=True, null=True)
     wp_post_meta = models.JSONField(blank=True, null=True)
+    wp_content_digest = models.CharField(max_length=64, blank=True, null=True)
 
     class Meta:
         abstract = True
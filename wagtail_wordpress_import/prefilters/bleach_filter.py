@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from bleach.sanitizer import Cleaner
 
 from wagtail_wordpress_import.prefilters.handle_shortcodes import SHORTCODE_HANDLERS
@@ -7,34 +9,55 @@ def filter_bleach_clean(html, options=None):
     """
     We do a final clean up on the processed html to be on the safe side.
     """
+    return get_cleaner(options).clean(html)
+
 
-    CONF_ALLOWED_TAGS = ALLOWED_TAGS
-    if options and options.get("ADDITIONAL_ALLOWED_TAGS"):
-        CONF_ALLOWED_TAGS += options["ADDITIONAL_ALLOWED_TAGS"]
+def get_cleaner(options=None):
+    """
+    Return the Cleaner for the effective allowed tags, attributes and styles.
+
+    Building a Cleaner sets up a new html5lib parser and sanitizer, so one is
+    built for each combination of options and reused for every page.
+    """
+    options = options or {}
 
     # Registered shortcode handlers generate custom tags
-    # so they need to be added to ALLOWED_TAGS
+    # so they need to be added to the allowed tags
+    handler_tags = get_handler_tags(tuple(SHORTCODE_HANDLERS))
 
-    for handler in SHORTCODE_HANDLERS:
-        if handler.is_top_level_html_tag:
-            CONF_ALLOWED_TAGS.append(handler().element_name)
+    additional_attributes = options.get("ADDITIONAL_ALLOWED_ATTRIBUTES") or {}
 
-    CONF_ALLOWED_ATTRIBUTES = ALLOWED_ATTRIBUTES
-    if options and options.get("ADDITIONAL_ALLOWED_ATTRIBUTES"):
-        CONF_ALLOWED_ATTRIBUTES.update(options["ADDITIONAL_ALLOWED_ATTRIBUTES"])
+    return build_cleaner(
+        frozenset(options.get("ADDITIONAL_ALLOWED_TAGS") or []) | handler_tags,
+        tuple(
+            (tag, tuple(value) if isinstance(value, list) else value)
+            for tag, value in additional_attributes.items()
+        ),
+        frozenset(options.get("ADDITIONAL_ALLOWED_STYLES") or []),
+    )
 
-    CONF_ALLOWED_STYLES = ALLOWED_STYLES
-    if options and options.get("ADDITIONAL_ALLOWED_STYLES"):
-        CONF_ALLOWED_STYLES += options["ADDITIONAL_ALLOWED_STYLES"]
 
-    cleaned = Cleaner(
-        tags=CONF_ALLOWED_TAGS,
-        attributes=CONF_ALLOWED_ATTRIBUTES,
-        styles=CONF_ALLOWED_STYLES,
+@lru_cache(maxsize=8)
+def get_handler_tags(handlers):
+    """The custom tags of the shortcode handlers, found once for the handlers"""
+    return frozenset(
+        handler().element_name for handler in handlers if handler.is_top_level_html_tag
     )
 
-    cleaned_html = cleaned.clean(html)
-    return cleaned_html
+
+@lru_cache(maxsize=32)
+def build_cleaner(additional_tags, additional_attributes, additional_styles):
+    attributes = dict(ALLOWED_ATTRIBUTES)
+    attributes.update(
+        (tag, list(value) if isinstance(value, tuple) else value)
+        for tag, value in additional_attributes
+    )
+
+    return Cleaner(
+        tags=frozenset(ALLOWED_TAGS) | additional_tags,
+        attributes=attributes,
+        styles=frozenset(ALLOWED_STYLES) | additional_styles,
+    )
 
 
 ALLOWED_TAGS = [
@@ -1,9 +1,29 @@
 import re
+from functools import lru_cache
 
 from wagtail_wordpress_import.block_builder_defaults import get_or_save_image
+from wagtail_wordpress_import.prefilters.triggers import triggered_by
 
 SHORTCODE_HANDLERS = []
 
+WORD_BOUNDARY = re.compile(r"\b")
+REGEX_SPECIAL_CHARACTERS = set(".^$*+?{}[]\\|()")
+
+
+@lru_cache(maxsize=None)
+def block_shortcode_pattern(shortcode_name):
+    return re.compile(
+        r"\["  # matches the opening [
+        + shortcode_name
+        + r"\b"  # matches a word boundary
+        + r"(?P<attrs>[^\]]*)"  # capture 'attrs', matching anything but ]
+        + r"\]"  # matches the closing ] of the opening tag
+        + r"(?P<content>.*?)"  # non-greedily captures 'content' between the tags
+        + r"\[\/"  # matches the  [/ of the closing tag
+        + shortcode_name
+        + r"\]"  # matches the closing ]
+    )
+
 
 def register():
     """Register the decorated class as a shortcode handler.
@@ -19,6 +39,9 @@ def register():
 
     def _wrapper(cls):
         SHORTCODE_HANDLERS.append(cls)
+        if isinstance(getattr(cls, "shortcode_name", None), str):
+            # compile the pattern once, when the handler is registered
+            block_shortcode_pattern(cls.shortcode_name)
         return cls
 
     return _wrapper
@@ -54,19 +77,11 @@ class BlockShortcodeHandler:
         the regex will match the string between the two "foo" tags, inclusively. The
         capture group "attrs" will match " bar=1", and capture group "content" will
         match "some text".
+
+        The regex is compiled once for each shortcode name.
         """
 
-        return re.compile(
-            r"\["  # matches the opening [
-            + self.shortcode_name
-            + r"\b"  # matches a word boundary
-            + r"(?P<attrs>[^\]]*)"  # capture 'attrs', matching anything but ]
-            + r"\]"  # matches the closing ] of the opening tag
-            + r"(?P<content>.*?)"  # non-greedily captures 'content' between the tags
-            + r"\[\/"  # matches the  [/ of the closing tag
-            + self.shortcode_name
-            + r"\]"  # matches the closing ]
-        )
+        return block_shortcode_pattern(self.shortcode_name)
 
     def pre_filter(self, string):
         """Replace all occurrences of the tag with a HTML tag for later parsing.
@@ -175,11 +190,86 @@ class CaptionHandler(BlockShortcodeHandler):
         }
 
 
+class ShortcodeScanner:
+    """
+    Find the registered shortcodes used in a body with a single scan, so only
+    the handlers of those shortcodes run their patterns over the body.
+
+    The handlers still run one after the other in the order they were
+    registered, so the output is the same as running every handler.
+    """
+
+    def __init__(self, handlers):
+        self.handlers = [handler() for handler in handlers]
+
+        # a name that isn't plain text is part of the handler regex, and a
+        # handler with its own pre_filter or _pattern could match anything
+        self.always_run = {
+            handler
+            for handler in self.handlers
+            if REGEX_SPECIAL_CHARACTERS.intersection(handler.shortcode_name)
+            or type(handler).pre_filter is not BlockShortcodeHandler.pre_filter
+            or type(handler)._pattern is not BlockShortcodeHandler._pattern
+        }
+        names = sorted(
+            {
+                handler.shortcode_name
+                for handler in self.handlers
+                if handler not in self.always_run
+            },
+            key=len,
+            reverse=True,
+        )
+        # the longest name is tried first, see also_found
+        self.pattern = re.compile(r"\[(" + "|".join(names) + r")\b") if names else None
+        # the shorter names that also match where a name is found,
+        # e.g. foo where foo-bar is found
+        self.also_found = {
+            name: {
+                other
+                for other in names
+                if len(other) < len(name)
+                and name.startswith(other)
+                and WORD_BOUNDARY.match(name, len(other))
+            }
+            for name in names
+        }
+
+    def find_used_names(self, html):
+        used = set()
+        if self.pattern:
+            for match in self.pattern.finditer(html):
+                used.add(match.group(1))
+                used.update(self.also_found[match.group(1)])
+        return used
+
+    def transform(self, html):
+        used = self.find_used_names(html) if "[" in html else set()
+        for handler in self.handlers:
+            if handler.shortcode_name in used or handler in self.always_run:
+                html = handler.pre_filter(html)
+        return html
+
+
+@lru_cache(maxsize=8)
+def get_shortcode_scanner(handlers):
+    return ShortcodeScanner(handlers)
+
+
+def needs_shortcodes(html, options=None):
+    """
+    Content without a [ has no shortcodes, only the handlers that are always
+    run by the scanner need it.
+    """
+    return "[" in html or bool(
+        get_shortcode_scanner(tuple(SHORTCODE_HANDLERS)).always_run
+    )
+
+
+@triggered_by(needs_shortcodes)
 def filter_transform_shortcodes(html, options=None):
     """
     html: is the body content from one Wordpress item
     options: not implemented
     """
-    for handler in SHORTCODE_HANDLERS:
-        html = handler().pre_filter(html)
-    return html
+    return get_shortcode_scanner(tuple(SHORTCODE_HANDLERS)).transform(html)
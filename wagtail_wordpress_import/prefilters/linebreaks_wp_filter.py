@@ -1,8 +1,52 @@
 import re
+from operator import itemgetter
 
 from django.utils.html import escape
 from django.utils.text import normalize_newlines
 
+# The block tags of wpautop, factored by their first letters so the regex engine
+# tries fewer alternatives at each tag:
+# table thead tfoot tbody tr td th caption col colgroup div dl dd dt details ul ol
+# li p pre select style section summary option form fieldset footer figure
+# figcaption map math area address article aside blockquote input h1-h6 hr hgroup
+# header legend nav menu
+ALLBLOCKS = (
+    r"(?:t(?:able|head|foot|body|[rdh])|c(?:aption|ol(?:group)?)|d(?:iv|[ldt]|etails)"
+    r"|[uo]l|li|p(?:re)?|s(?:elect|tyle|ection|ummary)|option"
+    r"|f(?:orm|ieldset|ooter|ig(?:ure|caption))|ma(?:p|th)|a(?:rea|ddress|rticle|side)"
+    r"|blockquote|input|h(?:[1-6r]|group|eader)|legend|nav|menu)"
+)
+
+# The patterns are compiled once, in the order filter_linebreaks_wp() uses them
+DOUBLE_BR = re.compile(r"<br />\s*<br />")
+BLOCK_OPENING_TAG = re.compile(r"(<" + ALLBLOCKS + "[^>]*>)")
+BLOCK_CLOSING_TAG = re.compile(r"(</" + ALLBLOCKS + ">)")
+OBJECT_PARAM = re.compile(r"\s*<param([^>]*)>\s*")
+OBJECT_EMBED = re.compile(r"\s*</embed>\s*")
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+EMPTY_PARAGRAPH = re.compile(r"<p>\s*</p>")
+UNCLOSED_PARAGRAPH = re.compile(r"<p>([^<]+)</(div|address|form)>")
+PARAGRAPH_AROUND_BLOCK_TAG = re.compile(r"<p>\s*(</?" + ALLBLOCKS + r"[^>]*>)\s*</p>")
+PARAGRAPH_AROUND_LIST_ITEM = re.compile(r"<p>(<li.+?)</p>")
+PARAGRAPH_BEFORE_BLOCKQUOTE = re.compile(r"<p><blockquote([^>]*)>", re.IGNORECASE)
+PARAGRAPH_BEFORE_BLOCK_TAG = re.compile(r"<p>\s*(</?" + ALLBLOCKS + r"[^>]*>)")
+PARAGRAPH_AFTER_BLOCK_TAG = re.compile(r"(</?" + ALLBLOCKS + r"[^>]*>)\s*</p>")
+SCRIPT_OR_STYLE = re.compile(r"<(script|style).*?</\1>", re.DOTALL)
+# The same matches as (?<!<br />)\s*\n, starting with a whitespace character so
+# the regex engine only tries the positions of whitespace
+LINE_BREAK = re.compile(r"\s(?<!<br />\s)\s*(?<=\n)")
+BR_AFTER_BLOCK_TAG = re.compile(r"(</?" + ALLBLOCKS + r"[^>]*>)\s*<br />")
+BR_BEFORE_BLOCK_TAG = re.compile(
+    r"<br />(\s*</?(?:p|li|div|dl|dd|dt|th|pre|td|ul|ol)[^>]*>)"
+)
+PRE = re.compile("(?is)(<pre[^>]*>)(.*?)</pre>")
+LAST_PARAGRAPH_NEWLINE = re.compile(r"\n</p>$")
+
+# Content without any of these is a single paragraph, see filter_linebreaks_wp()
+NEEDS_AUTOP = re.compile(
+    r"\n|<br|<object|<WPPreserveNewline|(?i:<blockquote)|</?" + ALLBLOCKS
+)
+
 
 def filter_linebreaks_wp(pee, options=None):
     """
@@ -11,120 +55,90 @@ def filter_linebreaks_wp(pee, options=None):
 
     param: `options` NOT IMPLEMENTED
     """
-    # print(pee)
-    # seeing an error here when the first charcter is a int
-    # if (pee.strip() == ""):
-    #     return ""
     pee = normalize_newlines(pee)
+
+    if not NEEDS_AUTOP.search(pee) and pee.strip():
+        # without line breaks or block tags none of the passes below apply,
+        # the content is wrapped in a single paragraph
+        return "<p>%s</p>\n" % pee
+
     pee = pee + "\n"
-    pee = re.sub(r"<br />\s*<br />", "\n\n", pee)
-    allblocks = r"(?:table|thead|tfoot|caption|col|colgroup|tbody|tr|td|th|div|dl|dd|dt|ul|ol|li|pre|select|option|form|map|area|blockquote|address|math|style|input|p|h[1-6]|hr|fieldset|legend|section|article|aside|hgroup|header|footer|nav|figure|figcaption|details|menu|summary)"
-    pee = re.sub(
-        r"(<" + allblocks + "[^>]*>)",
-        lambda m: "\n" + m.group(1) if m.group(1) else "\n",
-        pee,
-    )
-    pee = re.sub(
-        r"(</" + allblocks + ">)",
-        lambda m: m.group(1) + "\n\n" if m.group(1) else "\n\n",
-        pee,
-    )
-    # pee = pee.replace("\r\n", "\n")
-    # pee = pee.replace("\r", "\n") #these taken care of by normalize_newlines
+    if "<br" in pee:
+        pee = DOUBLE_BR.sub("\n\n", pee)
+    pee = BLOCK_OPENING_TAG.sub(_newline_before, pee)
+    pee = BLOCK_CLOSING_TAG.sub(_newlines_after, pee)
     if pee.find("<object") != -1:
-        pee = re.sub(
-            r"\s*<param([^>]*)>\s*",
-            lambda m: "<param%s>" % (m.group(1) if m.group(1) else "",),
-            pee,
-        )  # no pee inside object/embed
-        pee = re.sub(r"\s*</embed>\s*", "</embed>", pee)
-    pee = re.sub(r"\n\n+", "\n\n", pee)  # take care of duplicates
-    pees = re.split(
-        r"\n\s*\n", pee
-    )  # since PHP has a PREG_SPLIT_NO_EMPTY, may need to go through and drop any empty strings
-    # pees = [p for p in pees if p]
+        pee = OBJECT_PARAM.sub(_param_tag, pee)  # no pee inside object/embed
+        pee = OBJECT_EMBED.sub("</embed>", pee)
+    # duplicate line breaks are removed by the split, which consumes each run of
+    # whitespace from its first to its last line break
+    pees = PARAGRAPH_BREAK.split(pee)
     pee = "".join(["<p>%s</p>\n" % tinkle.strip("\n") for tinkle in pees])
-    pee = re.sub(
-        r"<p>\s*</p>", "", pee
-    )  # under certain strange conditions it could create a P of entirely whitespace
-    pee = re.sub(
-        r"<p>([^<]+)</(div|address|form)>",
-        lambda m: "<p>%s</p></%s>"
-        % (
-            (lambda x: x.group(1) if x.group(1) else "")(m),
-            (lambda x: x.group(2) if x.group(2) else "")(m),
-        ),
-        pee,
-    )
-    pee = re.sub(
-        r"<p>\s*(</?" + allblocks + r"[^>]*>)\s*</p>",
-        lambda m: m.group(1) if m.group(1) else "",
-        pee,
-    )  # don't pee all over a tag
-    pee = re.sub(
-        r"<p>(<li.+?)</p>", lambda m: m.group(1) if m.group(1) else "", pee
-    )  # problem with nested lists
-    pee = re.sub(
-        r"<p><blockquote([^>]*)>",
-        # lambda m: "<blockquote%s><p>" % (m.group(1) if m.group(1) else "",),
-        # found this not to our liking as it puts a p tag around the blockquote content
-        lambda m: "<blockquote%s>" % (m.group(1) if m.group(1) else "",),
-        pee,
-        flags=re.IGNORECASE,
-    )
-    # pee = pee.replace("</blockquote></p>", "</p></blockquote>")
-    # found this not to our liking as it puts a p tag around the blockquote content
+    # under certain strange conditions it could create a P of entirely whitespace
+    pee = EMPTY_PARAGRAPH.sub("", pee)
+    pee = UNCLOSED_PARAGRAPH.sub(_close_paragraph, pee)
+    pee = PARAGRAPH_AROUND_BLOCK_TAG.sub(_group_1, pee)  # don't pee all over a tag
+    pee = PARAGRAPH_AROUND_LIST_ITEM.sub(_group_1, pee)  # problem with nested lists
+    # wpautop moves the paragraph inside the blockquote, this removes it
+    pee = PARAGRAPH_BEFORE_BLOCKQUOTE.sub(_blockquote_tag, pee)
     pee = pee.replace("</blockquote></p>", "</blockquote>")
-    pee = re.sub(
-        r"<p>\s*(</?" + allblocks + r"[^>]*>)",
-        lambda m: m.group(1) if m.group(1) else "",
-        pee,
-    )
-    pee = re.sub(
-        r"(</?" + allblocks + r"[^>]*>)\s*</p>",
-        lambda m: m.group(1) if m.group(1) else "",
-        pee,
-    )
-
-    def _autop_newline_preservation_helper(matches):
-        return matches.group(0).replace("\n", "<WPPreserveNewline />")
-
-    pee = re.sub(
-        r"<(script|style).*?</\1>",
-        _autop_newline_preservation_helper,
-        pee,
-        flags=re.DOTALL,
-    )
-    pee = re.sub(r"(?<!<br />)\s*\n", "<br />\n", pee)  # make line breaks
+    pee = PARAGRAPH_BEFORE_BLOCK_TAG.sub(_group_1, pee)
+    pee = PARAGRAPH_AFTER_BLOCK_TAG.sub(_group_1, pee)
+
+    if "<script" in pee or "<style" in pee:
+        pee = SCRIPT_OR_STYLE.sub(_autop_newline_preservation_helper, pee)
+    pee = LINE_BREAK.sub("<br />\n", pee)  # make line breaks
     pee = pee.replace("<WPPreserveNewline />", "\n")
 
-    pee = re.sub(
-        r"(</?" + allblocks + r"[^>]*>)\s*<br />",
-        lambda m: m.group(1) if m.group(1) else "",
-        pee,
-    )
-    pee = re.sub(
-        r"<br />(\s*</?(?:p|li|div|dl|dd|dt|th|pre|td|ul|ol)[^>]*>)",
-        lambda m: m.group(1) if m.group(1) else "",
-        pee,
-    )
+    pee = BR_AFTER_BLOCK_TAG.sub(_group_1, pee)
+    pee = BR_BEFORE_BLOCK_TAG.sub(_group_1, pee)
     if pee.find("<pre") != -1:
-
-        def clean_pre(m):
-            if m.group(1) and m.group(2):
-                text = m.group(2)
-                text = text.replace("<br />", "")
-                text = text.replace("<p>", "\n")
-                text = text.replace("</p>", "")
-                text = m.group(1) + escape(text) + "</pre>"
-            else:
-                text = m.group(0)
-                text = text.replace("<br />", "")
-                text = text.replace("<p>", "\n")
-                text = text.replace("</p>", "")
-
-            return text
-
-        pee = re.sub("(?is)(<pre[^>]*>)(.*?)</pre>", clean_pre, pee)
-    pee = re.sub(r"\n</p>$", "</p>", pee)
+        pee = PRE.sub(_clean_pre, pee)
+    pee = LAST_PARAGRAPH_NEWLINE.sub("</p>", pee)
     return pee
+
+
+# Replacement functions rather than templates like "\\1", which re expands in
+# Python for each match on older versions
+
+_group_1 = itemgetter(1)
+
+
+def _newline_before(m):
+    return "\n" + m[1]
+
+
+def _newlines_after(m):
+    return m[1] + "\n\n"
+
+
+def _param_tag(m):
+    return "<param%s>" % m[1]
+
+
+def _close_paragraph(m):
+    return "<p>%s</p></%s>" % (m[1], m[2])
+
+
+def _blockquote_tag(m):
+    return "<blockquote%s>" % m[1]
+
+
+def _autop_newline_preservation_helper(matches):
+    return matches.group(0).replace("\n", "<WPPreserveNewline />")
+
+
+def _clean_pre(m):
+    if m.group(1) and m.group(2):
+        text = m.group(2)
+        text = text.replace("<br />", "")
+        text = text.replace("<p>", "\n")
+        text = text.replace("</p>", "")
+        text = m.group(1) + escape(text) + "</pre>"
+    else:
+        text = m.group(0)
+        text = text.replace("<br />", "")
+        text = text.replace("<p>", "\n")
+        text = text.replace("</p>", "")
+
+    return text
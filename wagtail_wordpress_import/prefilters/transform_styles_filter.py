@@ -1,8 +1,9 @@
 import re
+from collections import defaultdict
 
-from bs4 import BeautifulSoup
 from django.utils.module_loading import import_string
 
+from wagtail_wordpress_import.dom import dom_filter
 from wagtail_wordpress_import.prefilters.transform_styles_defaults import (
     HTML_TAGS,
     conf_transform_html_tags_enabled,
@@ -38,6 +39,27 @@ CONF_STYLES_MAPPING = [
 ]
 
 
+# The transforms that only add a class to the tag, so the elements the later
+# rules match are the same after they're applied
+CLASS_TRANSFORMS = {
+    transform_style_center,
+    transform_style_left,
+    transform_style_right,
+    transform_float_left,
+    transform_float_right,
+}
+
+
+def normalize_style(style):
+    """See normalize_style_attrs()"""
+    styles_list = [
+        style.strip().lower().replace(" ", "") + ";"
+        for style in style.split(";")
+        if style != ""
+    ]
+    return "".join(sorted(styles_list))
+
+
 def normalize_style_attrs(soup):
     """
     Normalize the style attrs on tags so we have a predictable format for parsing.
@@ -57,29 +79,23 @@ def normalize_style_attrs(soup):
 
     for el in elements:
         if el.attrs and el.attrs.get("style"):
-            styles_list = [
-                style.strip().lower().replace(" ", "") + ";"
-                for style in el.attrs["style"].split(";")
-                if style != ""
-            ]
-            el.attrs["style"] = "".join(sorted(styles_list))
+            el.attrs["style"] = normalize_style(el.attrs["style"])
 
     return soup
 
 
-def filter_transform_inline_styles(html, options=None):
+@dom_filter
+def filter_transform_inline_styles(soup, options=None):
     """
     Use the default or provided CONFIG to loop through each filter
     and apply the transform_* method
 
     params
-        html: raw html input, the input needs to be valid html
+        soup: the parsed html, or raw html input that needs to be valid html
         options: allows a developer to override the default config
         and pass in HTML_TAGS and TRANSFORM_STYLES_MAPPING
     """
 
-    soup = normalize_style_attrs(BeautifulSoup(html, "html.parser"))
-
     CONF_HTML_TAGS = HTML_TAGS
     if options and options.get("HTML_TAGS"):
         html_tags = import_string(options["HTML_TAGS"])
@@ -88,31 +104,107 @@ def filter_transform_inline_styles(html, options=None):
         else:
             CONF_HTML_TAGS = html_tags
 
-    styles_mapping = CONF_STYLES_MAPPING
-
     if options and "TRANSFORM_STYLES_MAPPING" in options:
-        styles_mapping = options["TRANSFORM_STYLES_MAPPING"]
-        for filter in styles_mapping:
-            filter_transform_styles(
-                soup.findAll(style=filter[0]),
-                soup,
-                import_string(filter[1]),
-                CONF_HTML_TAGS,
-            )
+        styles_mapping = [
+            (filter[0], import_string(filter[1]))
+            for filter in options["TRANSFORM_STYLES_MAPPING"]
+        ]
     else:
-        for filter in styles_mapping:
-            filter_transform_styles(
-                soup.findAll(style=filter[0]), soup, filter[1], CONF_HTML_TAGS
-            )
+        styles_mapping = CONF_STYLES_MAPPING
 
+    rules = [("style", filter[0], filter[1]) for filter in styles_mapping]
     if conf_transform_html_tags_enabled():
-        for filter in conf_transform_html_tags_mapping():
-            tags = soup.findAll(filter[0])
+        rules += [
+            ("name", filter[0], filter[1])
+            for filter in conf_transform_html_tags_mapping()
+        ]
+
+    apply_transform_rules(soup, rules, CONF_HTML_TAGS)
 
+    return soup
+
+
+def is_matched_on_the_way(kind, value):
+    if kind == "style":
+        return isinstance(value, (str, re.Pattern))
+    return isinstance(value, str)
+
+
+def find_rule_elements(soup, rules, normalize=False):
+    """
+    Walk the tree once and return the elements each rule matches, in document
+    order: the same as soup.findAll(style=pattern) for a ("style", pattern,
+    function) rule and soup.findAll(name) for a ("name", name, function) rule.
+
+    Only string and regex patterns and string names are matched on the way,
+    the elements of the other rules are None. With normalize the style attrs
+    are also normalized, see normalize_style_attrs().
+    """
+    elements = [
+        [] if is_matched_on_the_way(kind, value) else None
+        for kind, value, function in rules
+    ]
+    style_rules = []
+    name_rules = defaultdict(list)
+    for index, (kind, value, function) in enumerate(rules):
+        if elements[index] is None:
+            continue
+        if kind == "style":
+            style_rules.append((index, value))
+        else:
+            name_rules[value].append(index)
+
+    for el in soup.find_all(True):
+        style = el.attrs.get("style")
+        if style is not None:
+            if normalize and style:
+                style = el.attrs["style"] = normalize_style(style)
+            for index, pattern in style_rules:
+                if isinstance(pattern, str):
+                    matched = style == pattern
+                else:
+                    matched = pattern.search(style)
+                if matched:
+                    elements[index].append(el)
+        for index in name_rules.get(el.name, ()):
+            elements[index].append(el)
+
+    return elements
+
+
+def apply_transform_rules(soup, rules, conf_html_tags):
+    """
+    Apply the transform function of each rule to the elements it matches, in
+    the order of the rules.
+
+    The elements of all the rules are found in one walk of the tree, rather
+    than a walk for each rule. A transform can replace, rename or add
+    elements, so after a transform other than those in CLASS_TRANSFORMS the
+    elements of the remaining rules are found again. Each rule gets the same
+    elements as a soup.findAll() just before it's applied.
+    """
+    elements = find_rule_elements(soup, rules, normalize=True)
+    start = 0
+
+    for index, (kind, value, function) in enumerate(rules):
+        if elements is None:
+            elements = find_rule_elements(soup, rules[index:])
+            start = index
+
+        tags = elements[index - start]
+        if tags is None:
+            tags = soup.findAll(**{kind: value})
+        if not tags:
+            continue
+
+        if kind == "style":
+            filter_transform_styles(tags, soup, function, conf_html_tags)
+        else:
             for tag in tags:
-                filter[1](soup, tag)
+                function(soup, tag)
 
-    return str(soup)
+        if function not in CLASS_TRANSFORMS:
+            elements = None
 
 
 def filter_transform_styles(tags, soup, filter_method, conf_html_tags):
@@ -0,0 +1,44 @@
+import re
+from functools import wraps
+
+
+def triggered_by(trigger):
+    """
+    Declare what a prefilter looks for, so it's skipped for content without it.
+
+    The trigger is a substring, a compiled regex, or a function called with
+    (html, options) that returns whether the prefilter is needed.
+    """
+
+    def decorator(function):
+        function.trigger = trigger
+        return function
+
+    return decorator
+
+
+def with_trigger(function, trigger):
+    """A copy of the prefilter with another trigger, or None to always run it"""
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        return function(*args, **kwargs)
+
+    wrapper.trigger = trigger
+    return wrapper
+
+
+def is_triggered(function, content, options=None):
+    """
+    Whether the prefilter needs to run on the content. Prefilters without a
+    trigger always run, and so does every prefilter when the content is a
+    parsed tree, as checking it would mean serialising the tree.
+    """
+    trigger = getattr(function, "trigger", None)
+    if trigger is None or not isinstance(content, str):
+        return True
+    if isinstance(trigger, str):
+        return trigger in content
+    if isinstance(trigger, re.Pattern):
+        return trigger.search(content) is not None
+    return bool(trigger(content, options))
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-18 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wagtail_wordpress_import_test", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="testpage",
+            name="wp_post_id",
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
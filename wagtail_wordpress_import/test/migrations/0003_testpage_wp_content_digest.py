@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-18 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wagtail_wordpress_import_test", "0002_alter_testpage_wp_post_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="testpage",
+            name="wp_content_digest",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
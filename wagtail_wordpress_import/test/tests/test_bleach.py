@@ -2,7 +2,14 @@ import os
 
 from django.test import TestCase
 
-from wagtail_wordpress_import.prefilters.bleach_filter import filter_bleach_clean
+from wagtail_wordpress_import.prefilters.bleach_filter import (
+    ALLOWED_ATTRIBUTES,
+    ALLOWED_STYLES,
+    ALLOWED_TAGS,
+    filter_bleach_clean,
+    get_cleaner,
+    get_handler_tags,
+)
 
 BASE_PATH = os.path.dirname(os.path.dirname(__file__))
 FIXTURES_PATH = BASE_PATH + "/fixtures"
@@ -17,3 +24,59 @@ class TestBleach(TestCase):
         bc = filter_bleach_clean(self.stream)
         self.assertNotIn('style=" float: left;"', bc)
         self.assertNotIn('onmouseover=alert("Boo!")', bc)
+
+    def test_bleach_clean_does_not_change_the_allowed_lists(self):
+        allowed_tags = list(ALLOWED_TAGS)
+        allowed_attributes = dict(ALLOWED_ATTRIBUTES)
+        allowed_styles = list(ALLOWED_STYLES)
+        options = {
+            "ADDITIONAL_ALLOWED_TAGS": ["my-custom-tag"],
+            "ADDITIONAL_ALLOWED_ATTRIBUTES": {"my-custom-tag": ["foo"]},
+            "ADDITIONAL_ALLOWED_STYLES": ["color"],
+        }
+        filter_bleach_clean(self.stream)
+        filter_bleach_clean(self.stream, options)
+        filter_bleach_clean(self.stream, options)
+        self.assertEqual(ALLOWED_TAGS, allowed_tags)
+        self.assertEqual(ALLOWED_ATTRIBUTES, allowed_attributes)
+        self.assertEqual(ALLOWED_STYLES, allowed_styles)
+
+    def test_cleaner_is_reused_for_the_same_options(self):
+        options = {"ADDITIONAL_ALLOWED_TAGS": ["my-custom-tag"]}
+        self.assertIs(get_cleaner(), get_cleaner())
+        self.assertIs(get_cleaner(options), get_cleaner(dict(options)))
+        self.assertIsNot(get_cleaner(), get_cleaner(options))
+
+    def test_handler_tags_are_found_once_for_the_handlers(self):
+        instances = []
+
+        class Handler:
+            element_name = "my-handler-tag"
+            is_top_level_html_tag = True
+
+            def __init__(self):
+                instances.append(self)
+
+        class InlineHandler(Handler):
+            element_name = "my-inline-tag"
+            is_top_level_html_tag = False
+
+        self.assertEqual(get_handler_tags((Handler,)), {"my-handler-tag"})
+        self.assertEqual(get_handler_tags((Handler,)), {"my-handler-tag"})
+        self.assertEqual(len(instances), 1)
+        self.assertEqual(get_handler_tags((Handler, InlineHandler)), {"my-handler-tag"})
+
+    def test_bleach_clean_with_options(self):
+        options = {
+            "ADDITIONAL_ALLOWED_TAGS": ["my-custom-tag"],
+            "ADDITIONAL_ALLOWED_ATTRIBUTES": {"my-custom-tag": ["foo"]},
+        }
+        html = '<my-custom-tag foo="1" bar="2">baz</my-custom-tag>'
+        self.assertEqual(
+            filter_bleach_clean(html, options),
+            '<my-custom-tag foo="1">baz</my-custom-tag>',
+        )
+        self.assertEqual(
+            filter_bleach_clean(html),
+            '&lt;my-custom-tag foo="1" bar="2"&gt;baz&lt;/my-custom-tag&gt;',
+        )
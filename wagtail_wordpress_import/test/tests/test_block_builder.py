@@ -6,6 +6,7 @@ import responses
 from bs4 import BeautifulSoup
 from django.test import TestCase, override_settings
 from wagtail.images import get_image_model
+from wagtail.images.tests.utils import get_test_image_file
 
 from wagtail_wordpress_import.block_builder import BlockBuilder, conf_promote_child_tags
 from wagtail_wordpress_import.block_builder_defaults import (
@@ -15,12 +16,18 @@ from wagtail_wordpress_import.block_builder_defaults import (
     build_iframe_block,
     build_image_block,
     build_table_block,
+    document_exists,
     fetch_url,
     get_absolute_src,
     get_alignment_class,
     get_image_alt,
     get_image_file_name,
+    get_or_save_image,
+    get_requests_session,
+    image_exists,
     image_linker,
+    media_savepoint,
+    media_title_index,
 )
 from wagtail_wordpress_import.test.tests.utility_functions import (
     get_soup,
@@ -364,6 +371,25 @@ class TestBlockBuilderUtilityMethods(TestCase):
         self.assertEqual(get_alignment_class(soup), "fullwidth")
 
 
+class TestRequestsSession(TestCase):
+    def get_adapter(self, session):
+        return session.get_adapter("https://www.example.com/")
+
+    def test_session_is_shared(self):
+        self.assertIs(get_requests_session(), get_requests_session())
+
+    def test_retry_settings_are_read_for_each_session(self):
+        with override_settings(WAGTAIL_WORDPRESS_IMPORTER_REQUESTS_RETRIES=5):
+            self.assertEqual(
+                self.get_adapter(get_requests_session()).max_retries.total, 5
+            )
+        self.assertEqual(self.get_adapter(get_requests_session()).max_retries.total, 3)
+
+    def test_pool_size(self):
+        adapter = self.get_adapter(get_requests_session(pool_maxsize=20))
+        self.assertEqual(adapter.poolmanager.connection_pool_kw["maxsize"], 20)
+
+
 class TestBlockBuilderFetchUrlRequests(TestCase):
     def setUp(self):
         self.image_url = "http://example.com/no-image.jpg"
@@ -454,3 +480,63 @@ class TestBlockBuilderFetchUrlRequests(TestCase):
             fetch_url(self.page_url),
             (None, True, None),
         )
+
+
+class TestMediaTitleIndex(TestCase):
+    def setUp(self):
+        self.first_image = get_image_model().objects.create(
+            title="duplicate.jpg", file=get_test_image_file()
+        )
+        self.second_image = get_image_model().objects.create(
+            title="duplicate.jpg", file=get_test_image_file()
+        )
+
+    def test_duplicate_titles_resolve_to_the_first_image(self):
+        self.assertEqual(image_exists("duplicate.jpg"), self.first_image)
+        with media_title_index():
+            self.assertEqual(image_exists("duplicate.jpg"), self.first_image)
+
+    def test_lookups_are_in_memory(self):
+        with media_title_index():
+            with self.assertNumQueries(0):
+                self.assertEqual(image_exists("duplicate.jpg").id, self.first_image.id)
+                self.assertIsNone(image_exists("missing.jpg"))
+                self.assertIsNone(document_exists("missing.pdf"))
+
+    @responses.activate
+    def test_saved_media_is_added_to_the_index(self):
+        responses.add(
+            responses.GET,
+            "https://www.example.com/images/new.jpg",
+            body=mock_image().read(),
+            status=200,
+            content_type="image/jpeg",
+        )
+        with media_title_index():
+            self.assertIsNone(image_exists("new.jpg"))
+            image = get_or_save_image("https://www.example.com/images/new.jpg")
+            with self.assertNumQueries(0):
+                self.assertEqual(image_exists("new.jpg"), image)
+
+    @responses.activate
+    def test_media_saved_in_a_failed_savepoint_is_removed(self):
+        responses.add(
+            responses.GET,
+            "https://www.example.com/images/new.jpg",
+            body=mock_image().read(),
+            status=200,
+            content_type="image/jpeg",
+        )
+        with media_title_index():
+            with self.assertRaises(ValueError):
+                with media_savepoint():
+                    image = get_or_save_image("https://www.example.com/images/new.jpg")
+                    storage, file_name = image.file.storage, image.file.name
+                    raise ValueError("Failed")
+            self.assertIsNone(image_exists("new.jpg"))
+            self.assertFalse(storage.exists(file_name))
+
+            with media_savepoint():
+                image = get_or_save_image("https://www.example.com/images/new.jpg")
+            self.assertEqual(image_exists("new.jpg"), image)
+            self.assertTrue(image.file.storage.exists(image.file.name))
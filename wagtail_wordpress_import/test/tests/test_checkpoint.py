@@ -0,0 +1,182 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from wagtail_wordpress_import.importers.checkpoint import (
+    Checkpoint,
+    find_item_offsets,
+    resumed_xml_stream,
+    selected_items_xml_stream,
+)
+from wagtail_wordpress_import.importers.readers import LxmlReader
+from wagtail_wordpress_import.importers.wordpress import WordpressImporter
+from wagtail_wordpress_import.test.tests.test_wordpress_importer import ImporterTestCase
+from wagtail_wordpress_import.test.tests.xml_boilerplate import (
+    build_xml_stream,
+    generate_temporay_file,
+)
+
+
+def build_item(post_id):
+    return f"""
+<item>
+    <title>Page {post_id}</title>
+    <link>https://www.example.com/page-{post_id}/</link>
+    <content:encoded><![CDATA[<p>Not an <item> tag</p>]]></content:encoded>
+    <!-- <item> in a comment -->
+    <wp:post_id>{post_id}</wp:post_id>
+    <wp:post_date_gmt>2010-07-13 16:16:46</wp:post_date_gmt>
+    <wp:post_name>page-{post_id}</wp:post_name>
+    <wp:status>publish</wp:status>
+    <wp:post_type>post</wp:post_type>
+</item>"""
+
+
+cached_post_ids = []
+
+
+def collect_cached_posts(imported_pages, data_tag, items):
+    cached_post_ids.extend(item["wp:post_id"] for item in items)
+
+
+class TestResumedXmlStream(TestCase):
+    def setUp(self):
+        self.xml_file = generate_temporay_file(
+            build_xml_stream(
+                xml_items_fragment="".join(build_item(i) for i in range(1, 5))
+            ).read()
+        )
+        self.addCleanup(os.remove, self.xml_file)
+
+    def test_item_offsets_skip_cdata_and_comments(self):
+        offsets = find_item_offsets(self.xml_file, 0, 2, 10)
+        with open(self.xml_file, "rb") as xml_file:
+            data = xml_file.read()
+        self.assertEqual(data.count(b"<item>"), 12)
+        self.assertTrue(data[offsets[0] :].startswith(b"<item>\n    <title>Page 1"))
+        self.assertTrue(data[offsets[2] :].startswith(b"<item>\n    <title>Page 3"))
+        # past the last item is the end of the last item
+        self.assertTrue(data[: offsets[10]].endswith(b"</item>"))
+        self.assertNotIn(b"<item>", data[offsets[10] :])
+
+    def test_resumed_stream_skips_items(self):
+        with resumed_xml_stream(self.xml_file, 2) as source:
+            items = [
+                item["wp:post_id"]
+                for name, item in LxmlReader(source).iter_tags({"item"})
+                if name == "item"
+            ]
+        self.assertEqual(items, [3, 4])
+
+    def test_resumed_stream_after_the_last_item(self):
+        with resumed_xml_stream(self.xml_file, 4) as source:
+            names = [name for name, item in LxmlReader(source).iter_tags({"item"})]
+        self.assertNotIn("item", names)
+
+    def test_selected_items_stream(self):
+        with selected_items_xml_stream(self.xml_file, [0, 2]) as source:
+            items = [
+                item["wp:post_id"]
+                for name, item in LxmlReader(source).iter_tags({"item"})
+                if name == "item"
+            ]
+        self.assertEqual(items, [1, 3])
+
+
+@override_settings(WAGTAIL_WORDPRESS_IMPORTER_SOURCE_DOMAIN="http://www.example.com")
+class TestResumeImport(ImporterTestCase):
+    def setUp(self):
+        self.xml_file = self.build_xml_file("".join(build_item(i) for i in range(1, 5)))
+        self.log_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.log_dir.cleanup)
+        self.checkpoint_path = os.path.join(self.log_dir.name, "checkpoint.json")
+
+    def run_import(self, **kwargs):
+        return super().run_import(
+            xml_file=self.xml_file,
+            chunk_size=2,
+            checkpoint=Checkpoint(self.checkpoint_path, self.xml_file),
+            **kwargs,
+        )
+
+    def test_resume_after_a_failure(self):
+        import_item = WordpressImporter.import_item
+
+        def fail_on_post_4(importer, item, prefiltered=None):
+            if item["wp:post_id"] == 4:
+                raise ValueError("Failed")
+            return import_item(importer, item, prefiltered)
+
+        with mock.patch.object(WordpressImporter, "import_item", fail_on_post_4):
+            with self.assertRaises(ValueError):
+                self.run_import()
+
+        with open(self.checkpoint_path) as checkpoint_file:
+            items_done = json.load(checkpoint_file)["items_done"]
+        self.assertIn(items_done, [2, 3])
+
+        with mock.patch.object(
+            WordpressImporter, "import_item", autospec=True, side_effect=import_item
+        ) as mock_import_item:
+            self.run_import(resume=True)
+
+        self.assertEqual(
+            [call.args[1]["wp:post_id"] for call in mock_import_item.call_args_list],
+            list(range(items_done + 1, 5)),
+        )
+        self.assertEqual(self.logger.processed, 4)
+        self.assertEqual(self.logger.imported, 4)
+        self.assertEqual(len(self.importer.imported_page_ids), 4)
+        self.assertEqual(self.get_children().count(), 4)
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    @override_settings(
+        WORDPRESS_IMPORT_HOOKS_ITEMS_TO_CACHE={
+            "post": {
+                "DATA_TAG": "post",
+                "FUNCTION": "wagtail_wordpress_import.test.tests.test_checkpoint.collect_cached_posts",
+            }
+        }
+    )
+    def test_cached_items_are_journaled_by_index(self):
+        import_item = WordpressImporter.import_item
+
+        def fail_on_post_4(importer, item, prefiltered=None):
+            if item["wp:post_id"] == 4:
+                raise ValueError("Failed")
+            return import_item(importer, item, prefiltered)
+
+        with mock.patch.object(WordpressImporter, "import_item", fail_on_post_4):
+            with self.assertRaises(ValueError):
+                self.run_import()
+
+        with open(f"{self.checkpoint_path}.journal") as journal_file:
+            records = [json.loads(line) for line in journal_file]
+        with open(self.checkpoint_path) as checkpoint_file:
+            items_done = json.load(checkpoint_file)["items_done"]
+        self.assertEqual(
+            [index for record in records for index in record["cached_item_indexes"]],
+            list(range(items_done)),
+        )
+        self.assertNotIn("Not an", json.dumps(records))
+
+        cached_post_ids.clear()
+        self.addCleanup(cached_post_ids.clear)
+        self.run_import(resume=True)
+        self.assertEqual(sorted(cached_post_ids), [1, 2, 3, 4])
+
+    def test_checkpoint_directory_is_created(self):
+        self.checkpoint_path = os.path.join(
+            self.log_dir.name, "missing", "checkpoint.json"
+        )
+        self.run_import()
+        self.assertEqual(self.logger.imported, 4)
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    def test_resume_without_a_checkpoint_starts_from_the_beginning(self):
+        self.run_import(resume=True)
+        self.assertEqual(self.logger.imported, 4)
+        self.assertFalse(os.path.exists(self.checkpoint_path))
@@ -1,4 +1,5 @@
 import os
+from unittest import mock
 
 from django.core.management import CommandError, call_command
 from django.test import TestCase, override_settings
@@ -8,6 +9,8 @@ try:
 except ImportError:
     from wagtail.core.models import Page
 
+from wagtail_wordpress_import.importers.checkpoint import Checkpoint
+from wagtail_wordpress_import.importers.wordpress import WordpressImporter
 from wagtail_wordpress_import.management.commands.reduce_xml import Command as ReduceCmd
 from wagtail_wordpress_import.management.commands.reduce_xml import generate_stats_file
 from wagtail_wordpress_import.xml_boilerplate import (
@@ -140,6 +143,33 @@ class TestImportXmlCommandCompletes(TestCase):
         self.assertEqual(imported_pages[0].title, "A title")
 
 
+@override_settings(
+    WAGTAIL_WORDPRESS_IMPORTER_SOURCE_DOMAIN="http://www.example.com",
+)
+class TestImportXmlCommandCheckpoint(TestCase):
+    def setUp(self):
+        self.built_file = generate_temporary_file(
+            build_xml_stream(xml_tags_fragment="").read()
+        )
+        self.addCleanup(os.remove, self.built_file)
+
+    def run_command(self, *args):
+        with mock.patch.object(WordpressImporter, "run") as mock_run, mock.patch(
+            "wagtail_wordpress_import.management.commands.import_xml.Logger"
+        ):
+            call_command("import_xml", self.built_file, "2", *args)
+        return mock_run.call_args.kwargs["checkpoint"]
+
+    def test_checkpoint_is_opt_in(self):
+        self.assertIsNone(self.run_command())
+
+    def test_checkpoint(self):
+        self.assertIsInstance(self.run_command("--checkpoint"), Checkpoint)
+
+    def test_resume_uses_the_checkpoint(self):
+        self.assertIsInstance(self.run_command("--resume"), Checkpoint)
+
+
 class TestReduceCommand(TestCase):
     def test_without_arguments(self):
         with self.assertRaises(CommandError) as ctx:
@@ -1,6 +1,15 @@
+import hashlib
+from unittest import mock
+
 from django.test import TestCase
 
-from wagtail_wordpress_import.functions import get_attr_as_list, snakecase_key
+from wagtail_wordpress_import.functions import (
+    get_attr_as_list,
+    item_content_digest,
+    normalize_wp_link,
+    snakecase_key,
+)
+from wagtail_wordpress_import.importers.import_hooks import cacheable_item
 
 
 class TestSnakeCaseKey(TestCase):
@@ -39,3 +48,103 @@ class TestDictToList(TestCase):
     def test_with_expected_list(self):
         node = {"foo": [{"bar": "baz", "baz": "bar"}]}
         self.assertEqual(get_attr_as_list(node, "foo"), [{"bar": "baz", "baz": "bar"}])
+
+
+class TestNormalizeWpLink(TestCase):
+    def test_same_page_links_match(self):
+        links = [
+            "https://www.example.com/foo/bar/",
+            "http://www.example.com/foo/bar",
+            "https://example.com/foo/bar/?utm_source=baz",
+            "https://WWW.EXAMPLE.COM/foo/bar/#top",
+            "/foo/bar/",
+            "foo/bar",
+        ]
+        self.assertEqual(
+            {normalize_wp_link(link, "http://www.example.com") for link in links},
+            {"example.com/foo/bar"},
+        )
+
+    def test_other_domain_does_not_match(self):
+        self.assertNotEqual(
+            normalize_wp_link("https://www.other.com/foo/", "http://www.example.com"),
+            normalize_wp_link("/foo/", "http://www.example.com"),
+        )
+
+    def test_links_that_are_not_pages(self):
+        self.assertIsNone(normalize_wp_link(None))
+        self.assertIsNone(normalize_wp_link(""))
+        self.assertIsNone(normalize_wp_link("#section"))
+        self.assertIsNone(normalize_wp_link("mailto:foo@example.com"))
+
+    def test_plain_permalinks_keep_the_page_query_parameters(self):
+        domain = "http://www.example.com"
+        self.assertEqual(
+            normalize_wp_link("http://example.com/?p=12", domain), "example.com/?p=12"
+        )
+        self.assertEqual(
+            normalize_wp_link("/?p=12&utm_source=foo", domain), "example.com/?p=12"
+        )
+        self.assertEqual(
+            normalize_wp_link("https://www.example.com/?page_id=4#top", domain),
+            "example.com/?page_id=4",
+        )
+        keys = {
+            normalize_wp_link(link, domain)
+            for link in ["/?p=12", "/?p=13", "/?page_id=4", "/", "/?utm_source=foo"]
+        }
+        self.assertEqual(
+            keys,
+            {
+                "example.com/?p=12",
+                "example.com/?p=13",
+                "example.com/?page_id=4",
+                "example.com/",
+            },
+        )
+
+    def test_relative_links_are_resolved_against_the_page(self):
+        domain = "http://www.example.com"
+        base = "http://www.example.com/foo/bar/"
+        self.assertEqual(
+            normalize_wp_link("sub/page", domain, base), "example.com/foo/bar/sub/page"
+        )
+        self.assertEqual(
+            normalize_wp_link("../baz/", domain, base), "example.com/foo/baz"
+        )
+        self.assertEqual(
+            normalize_wp_link("/sub/page", domain, base), "example.com/sub/page"
+        )
+        self.assertIsNone(normalize_wp_link("#section", domain, base))
+
+
+class TestItemContentDigest(TestCase):
+    def setUp(self):
+        self.item = {
+            "content:encoded": "<p>foo</p>",
+            "wp:post_modified_gmt": "2010-07-13 16:16:46",
+            "wp:postmeta": {"wp:meta_key": "foo", "wp:meta_value": 1},
+        }
+
+    def test_digest_is_computed_once(self):
+        with mock.patch(
+            "wagtail_wordpress_import.functions.hashlib.sha256", wraps=hashlib.sha256
+        ) as mock_sha256:
+            digest = item_content_digest(self.item)
+            self.assertEqual(item_content_digest(self.item), digest)
+        self.assertEqual(mock_sha256.call_count, 1)
+
+    def test_digest_changes_with_the_content(self):
+        digest = item_content_digest(dict(self.item))
+        self.item["content:encoded"] = "<p>bar</p>"
+        self.assertNotEqual(item_content_digest(self.item), digest)
+
+    def test_digest_is_not_cached_for_the_hooks(self):
+        item_content_digest(self.item)
+        self.assertEqual(
+            cacheable_item(self.item),
+            {
+                "content:encoded": "<p>foo</p>",
+                "wp:post_modified_gmt": "2010-07-13 16:16:46",
+            },
+        )
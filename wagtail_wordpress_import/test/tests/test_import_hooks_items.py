@@ -13,6 +13,12 @@ else:
     from wagtail.core.models import Page
 
 from wagtail_wordpress_import.functions import node_to_dict
+from wagtail_wordpress_import.importers.import_hooks import (
+    CacheStore,
+    IndexedCacheStore,
+    ItemsCache,
+    SqliteCacheStore,
+)
 from wagtail_wordpress_import.importers.wordpress import WordpressImporter
 from wagtail_wordpress_import.logger import Logger
 from wagtail_wordpress_import.test.tests.xml_boilerplate import (
@@ -366,3 +372,151 @@ class WordpressImporterTestsCheckXmlItemsCached(TestCase):
             "datatagname",
             getattr(self.importer.items_cache, "bar"),
         )
+
+
+class TestCacheStore(TestCase):
+    def test_duplicates_are_found_regardless_of_key_order(self):
+        store = CacheStore()
+        store.add({"title": "foo", "wp:post_id": 100})
+        store.add({"wp:post_id": 100, "title": "foo"})
+        store.add({"wp:post_id": 100, "title": "bar"})
+        self.assertEqual(
+            store,
+            [{"title": "foo", "wp:post_id": 100}, {"wp:post_id": 100, "title": "bar"}],
+        )
+
+    def test_postmeta_is_not_cached(self):
+        store = CacheStore()
+        store.add({"title": "foo", "wp:postmeta": [{"wp:meta_key": "a"}]})
+        store.add({"title": "foo", "wp:postmeta": [{"wp:meta_key": "b"}]})
+        self.assertEqual(store, [{"title": "foo"}])
+
+    def test_items_are_keyed_by_the_cache_key(self):
+        store = CacheStore(key="wp:post_id")
+        store.add({"title": "foo", "wp:post_id": 100})
+        store.add({"title": "bar", "wp:post_id": 100})
+        store.add({"title": "baz"})
+        store.add({"title": "baz"})
+        self.assertEqual(store, [{"title": "foo", "wp:post_id": 100}, {"title": "baz"}])
+
+    @override_settings(
+        WORDPRESS_IMPORT_HOOKS_ITEMS_TO_CACHE={
+            "attachment": {
+                "DATA_TAG": "thumbnail_id",
+                "FUNCTION": "path.to.function",
+                "CACHE_KEY": "wp:post_id",
+            },
+        },
+    )
+    def test_items_cache_uses_the_cache_key_config(self):
+        cache = ItemsCache()
+        cache.add_item_to_cache("attachment", {"wp:post_id": 1, "title": "foo"})
+        cache.add_item_to_cache("attachment", {"wp:post_id": 1, "title": "bar"})
+        self.assertEqual(cache.attachment, [{"wp:post_id": 1, "title": "foo"}])
+
+
+class TestSqliteCacheStore(TestCase):
+    def setUp(self):
+        self.store = SqliteCacheStore(indexes=["wp:post_id", "wp:post_parent"])
+        self.addCleanup(self.store.close)
+        self.store.add({"title": "foo", "wp:post_id": 100, "wp:post_parent": 1})
+        self.store.add({"title": "foo", "wp:post_id": 100, "wp:post_parent": 1})
+        self.store.add({"title": "bar", "wp:post_id": 200, "wp:post_parent": 1})
+        self.store.add({"title": "baz", "wp:post_id": 300, "wp:postmeta": []})
+
+    def test_items_are_iterated_in_order_without_duplicates(self):
+        self.assertEqual(len(self.store), 3)
+        self.assertEqual([item["title"] for item in self.store], ["foo", "bar", "baz"])
+        self.assertNotIn("wp:postmeta", list(self.store)[2])
+
+    def test_get(self):
+        self.assertEqual(self.store.get("wp:post_id", 200)["title"], "bar")
+        self.assertEqual(self.store.get("wp:post_id", "200")["title"], "bar")
+        self.assertIsNone(self.store.get("wp:post_id", 400))
+
+    def test_filter(self):
+        self.assertEqual(
+            [item["title"] for item in self.store.filter("wp:post_parent", 1)],
+            ["foo", "bar"],
+        )
+        self.assertEqual(self.store.filter("wp:post_parent", 2), [])
+
+    def test_close_removes_the_file(self):
+        self.assertTrue(os.path.exists(self.store.path))
+        self.store.close()
+        self.assertFalse(os.path.exists(self.store.path))
+
+    @override_settings(
+        WORDPRESS_IMPORT_HOOKS_ITEMS_TO_CACHE={
+            "attachment": {
+                "DATA_TAG": "thumbnail_id",
+                "FUNCTION": "path.to.function",
+                "CACHE_BACKEND": "wagtail_wordpress_import.importers.import_hooks.SqliteCacheStore",
+                "CACHE_INDEXES": ["wp:post_id"],
+            },
+        },
+    )
+    def test_items_cache_uses_the_cache_backend_config(self):
+        cache = ItemsCache()
+        self.addCleanup(cache.close)
+        cache.add_item_to_cache("attachment", {"wp:post_id": 1, "title": "foo"})
+        self.assertIsInstance(cache.attachment, SqliteCacheStore)
+        self.assertEqual(cache.attachment.get("wp:post_id", 1)["title"], "foo")
+
+
+class TestIndexedCacheStore(TestCase):
+    def setUp(self):
+        self.store = IndexedCacheStore(
+            indexes=["guid"], meta_keys=["_wp_attached_file"]
+        )
+        self.foo = {
+            "title": "foo",
+            "guid": "https://www.example.com/foo.jpg",
+            "wp:post_id": 100,
+            "wp:post_parent": 1,
+            "wp:postmeta": [
+                {"wp:meta_key": "_wp_attached_file", "wp:meta_value": "foo.jpg"},
+                {"wp:meta_key": "_edit_lock", "wp:meta_value": "123"},
+            ],
+        }
+        self.bar = {
+            "title": "bar",
+            "wp:post_id": 200,
+            "wp:post_parent": 1,
+            "wp:postmeta": {
+                "wp:meta_key": "_wp_attached_file",
+                "wp:meta_value": "bar.jpg",
+            },
+        }
+        self.store.add(self.foo)
+        self.store.add(self.foo)
+        self.store.add(self.bar)
+
+    def test_store_is_a_list_of_items(self):
+        self.assertIsInstance(self.store, list)
+        self.assertEqual([item["title"] for item in self.store], ["foo", "bar"])
+
+    def test_by_post_id(self):
+        self.assertEqual(self.store.by_post_id["200"]["title"], "bar")
+        self.assertEqual(self.store.get("wp:post_id", 100)["title"], "foo")
+
+    def test_by_post_parent(self):
+        self.assertEqual(
+            [item["title"] for item in self.store.by_post_parent["1"]], ["foo", "bar"]
+        )
+        self.assertEqual(self.store.filter("wp:post_parent", 2), [])
+
+    def test_by_meta(self):
+        self.assertEqual(
+            self.store.by_meta["_wp_attached_file"]["bar.jpg"][0]["title"], "bar"
+        )
+        self.assertNotIn("_edit_lock", self.store.by_meta)
+        self.assertNotIn(
+            "wp:postmeta", self.store.by_meta["_wp_attached_file"]["foo.jpg"][0]
+        )
+
+    def test_indexed_fields(self):
+        self.assertEqual(
+            self.store.get("guid", "https://www.example.com/foo.jpg")["title"], "foo"
+        )
+        self.assertIsNone(self.store.get("guid", "https://www.example.com/baz.jpg"))
@@ -1,3 +1,4 @@
+import json
 import os
 
 from bs4 import BeautifulSoup
@@ -33,3 +34,25 @@ class TestLinebreaks(TestCase):
         self.assertEqual(len(paragraphs), 3)
         for i in range(len(paragraphs)):
             self.assertEqual(paragraphs[i].text.strip()[-1], str(i + 1))
+
+
+class TestLinebreaksGolden(TestCase):
+    """
+    The output of the original port of wpautop for a corpus of post bodies,
+    filter_linebreaks_wp() must return exactly the same HTML.
+    """
+
+    def setUp(self):
+        with open(f"{FIXTURES_PATH}/linebreaks_wp_golden.json") as golden_file:
+            self.golden = json.load(golden_file)
+
+    def test_output_is_unchanged(self):
+        for case in self.golden:
+            with self.subTest(input=case["input"][:40]):
+                self.assertEqual(filter_linebreaks_wp(case["input"]), case["output"])
+
+    def test_content_without_block_tags_is_a_paragraph(self):
+        self.assertEqual(
+            filter_linebreaks_wp('A <a href="/x">link</a>'),
+            '<p>A <a href="/x">link</a></p>\n',
+        )
@@ -0,0 +1,115 @@
+import csv
+import glob
+import os
+import tempfile
+
+from django.test import TestCase
+
+from wagtail_wordpress_import.importers.wordpress import WordpressImporter
+from wagtail_wordpress_import.logger import Logger
+from wagtail_wordpress_import.test.tests.test_wordpress_importer import (
+    IMPORTER_RUN_PARAMS_TEST,
+)
+
+BASE_PATH = os.path.dirname(os.path.dirname(__file__))
+FIXTURES_PATH = BASE_PATH + "/fixtures"
+
+
+def build_row(row_id, result="created"):
+    return {
+        "id": row_id,
+        "title": f"Item {row_id}",
+        "link": f"https://www.example.com/item-{row_id}/",
+        "wp_guid": "",
+        "result": result,
+        "reason": "existed",
+        "datecheck": "",
+        "slugcheck": "",
+    }
+
+
+class TestLoggerReports(TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.log_dir.cleanup)
+
+    def read_report(self, name):
+        (file_name,) = glob.glob(f"{self.log_dir.name}/{name}-report-*.csv")
+        with open(file_name, newline="") as csvfile:
+            return list(csv.reader(csvfile))
+
+    def test_rows_are_written_as_they_are_logged(self):
+        logger = Logger(self.log_dir.name)
+        logger.start_reports()
+        logger.log_item(build_row(3))
+        logger.log_item(build_row(4, result="updated"))
+
+        self.assertEqual(logger.items, [])
+        self.assertEqual(logger.results, {"created": 1, "updated": 1})
+        self.assertEqual(logger.last_item["id"], 4)
+
+        logger.save_csv_import_report()
+        rows = self.read_report("import")
+        self.assertEqual(rows[0][0], "Page ID")
+        self.assertEqual(
+            [(row[0], row[4]) for row in rows[1:]], [("3", "created"), ("4", "updated")]
+        )
+
+    def test_rows_are_kept_without_streaming(self):
+        logger = Logger(self.log_dir.name)
+        logger.log_item(build_row(3))
+
+        self.assertEqual([item["id"] for item in logger.items], [3])
+        logger.save_csv_import_report()
+        self.assertEqual(len(self.read_report("import")), 2)
+
+    def test_empty_reports_are_saved(self):
+        logger = Logger(self.log_dir.name)
+        logger.start_reports()
+        logger.save_csv_images_report()
+        self.assertEqual(
+            self.read_report("images"),
+            [["Page ID", "Page Title", "Wordpress Link", "Reason"]],
+        )
+
+    def test_pagelink_errors_report(self):
+        logger = Logger(self.log_dir.name)
+        logger.log_page_link_error("https://www.example.com/missing/", None)
+        logger.save_csv_pagelink_errors_report()
+        self.assertEqual(
+            self.read_report("pagelink_errors")[1],
+            ["", "", "https://www.example.com/missing/"],
+        )
+
+    def test_reports_are_not_streamed_without_a_log_directory(self):
+        logger = Logger(os.path.join(self.log_dir.name, "missing"))
+        logger.start_reports()
+        logger.log_item(build_row(3))
+        self.assertEqual(len(logger.items), 1)
+
+
+class TestLoggerVerbosity(TestCase):
+    fixtures = [
+        f"{FIXTURES_PATH}/dump.json",
+    ]
+
+    def run_import(self, logger):
+        WordpressImporter(f"{FIXTURES_PATH}/raw_xml.xml").run(
+            logger=logger,
+            app_for_pages=IMPORTER_RUN_PARAMS_TEST["app_for_pages"],
+            model_for_pages=IMPORTER_RUN_PARAMS_TEST["model_for_pages"],
+            parent_id=IMPORTER_RUN_PARAMS_TEST["parent_id"],
+            page_types=IMPORTER_RUN_PARAMS_TEST["page_types"],
+            page_statuses=IMPORTER_RUN_PARAMS_TEST["page_statuses"],
+        )
+
+    def test_only_the_items_are_logged(self):
+        logger = Logger("fakedir")
+        self.run_import(logger)
+        self.assertNotIn("not a item", [item["reason"] for item in logger.items])
+        self.assertEqual(len(logger.items), logger.processed)
+
+    def test_verbose_logs_every_entry(self):
+        logger = Logger("fakedir", verbose=True)
+        self.run_import(logger)
+        self.assertIn("not a item", [item["reason"] for item in logger.items])
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import tempfile
+import time
+
+import responses
+from django.test import TestCase, override_settings
+
+from wagtail_wordpress_import.block_builder_defaults import fetch_url
+from wagtail_wordpress_import.media_cache import MediaCache
+from wagtail_wordpress_import.test.tests.utility_functions import mock_image
+
+IMAGE_URL = "https://www.example.com/images/bruno-4-runner.jpg"
+
+
+class TestFetchUrlMediaCache(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        settings_override = override_settings(
+            WAGTAIL_WORDPRESS_IMPORTER_MEDIA_CACHE_DIR=self.cache_dir.name
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.image = mock_image().read()
+
+    @responses.activate
+    def test_cached_response_without_validators_is_not_requested_again(self):
+        responses.add(
+            responses.GET, IMAGE_URL, body=self.image, content_type="image/jpeg"
+        )
+        fetch_url(IMAGE_URL)
+        response, status, content_type = fetch_url(IMAGE_URL)
+        self.assertEqual(len(responses.calls), 1)
+        self.assertTrue(status)
+        self.assertEqual(content_type, "image/jpeg")
+        self.assertEqual(response.content, self.image)
+
+    @responses.activate
+    def test_cached_response_is_revalidated_with_its_validators(self):
+        responses.add(
+            responses.GET,
+            IMAGE_URL,
+            body=self.image,
+            content_type="image/jpeg",
+            headers={"ETag": '"abc"', "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"},
+        )
+        responses.add(responses.GET, IMAGE_URL, status=304)
+        fetch_url(IMAGE_URL)
+        response, status, content_type = fetch_url(IMAGE_URL)
+
+        request_headers = responses.calls[1].request.headers
+        self.assertEqual(request_headers["If-None-Match"], '"abc"')
+        self.assertEqual(
+            request_headers["If-Modified-Since"], "Wed, 21 Oct 2015 07:28:00 GMT"
+        )
+        self.assertTrue(status)
+        self.assertEqual(content_type, "image/jpeg")
+        self.assertEqual(response.content, self.image)
+
+    @responses.activate
+    def test_invalid_responses_are_not_cached(self):
+        responses.add(responses.GET, IMAGE_URL, status=404)
+        fetch_url(IMAGE_URL)
+        fetch_url(IMAGE_URL)
+        self.assertEqual(len(responses.calls), 2)
+
+
+class TestMediaCache(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+
+    def make_response(self, content, content_type="image/jpeg"):
+        return MediaCache.response(
+            {"url": "", "content": content, "content_type": content_type}
+        )
+
+    def test_same_content_is_stored_once(self):
+        cache = MediaCache(self.cache_dir.name, 1024)
+        cache.set("https://www.example.com/a.jpg", self.make_response(b"image"))
+        cache.set("https://www.example.com/b.jpg", self.make_response(b"image"))
+        self.assertEqual(len(os.listdir(cache.blobs_dir)), 1)
+        self.assertEqual(
+            cache.get("https://www.example.com/b.jpg")["content"], b"image"
+        )
+
+    def test_least_recently_used_content_is_evicted(self):
+        cache = MediaCache(self.cache_dir.name, 10)
+        cache.set("https://www.example.com/a.jpg", self.make_response(b"aaaa"))
+        cache.set("https://www.example.com/b.jpg", self.make_response(b"bbbb"))
+        # make b.jpg the least recently used
+        an_hour_ago = time.time() - 3600
+        blob_b = cache.blob_path(hashlib.sha256(b"bbbb").hexdigest())
+        os.utime(blob_b, (an_hour_ago, an_hour_ago))
+        cache.set("https://www.example.com/c.jpg", self.make_response(b"cccc"))
+
+        self.assertIsNotNone(cache.get("https://www.example.com/a.jpg"))
+        self.assertIsNone(cache.get("https://www.example.com/b.jpg"))
+        self.assertIsNotNone(cache.get("https://www.example.com/c.jpg"))
+        self.assertEqual(cache.size, 8)
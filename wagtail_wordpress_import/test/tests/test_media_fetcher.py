@@ -0,0 +1,140 @@
+import threading
+import time
+
+import responses
+from django.test import TestCase, override_settings
+from wagtail.documents import get_document_model
+from wagtail.images import get_image_model
+
+from wagtail_wordpress_import.block_builder_defaults import (
+    get_or_save_document,
+    get_or_save_image,
+)
+from wagtail_wordpress_import.media_fetcher import MediaFetcher
+from wagtail_wordpress_import.test.tests.utility_functions import mock_image, mock_pdf
+
+CONTENT = """
+<p><img class="size-full" src="https://www.example.com/images/bruno-4-runner.jpg" alt="bruno" /></p>
+<p><img src="/images/relative.jpg" /></p>
+<p><a href="https://www.example.com/files/assignment.pdf">A document</a></p>
+<p><a href="https://www.example.com/a-page/">A page</a></p>
+<p><img src="https://www.example.com/other/bruno-4-runner.jpg" /></p>
+"""
+
+
+@override_settings(WAGTAIL_WORDPRESS_IMPORTER_SOURCE_DOMAIN="https://www.example.com")
+class TestMediaFetcher(TestCase):
+    def setUp(self):
+        self.fetcher = MediaFetcher(max_workers=4, max_per_host=2)
+        self.fetcher.scan(CONTENT)
+
+    def add_responses(self):
+        responses.add(
+            responses.GET,
+            "https://www.example.com/images/bruno-4-runner.jpg",
+            body=mock_image().read(),
+            status=200,
+            content_type="image/jpeg",
+        )
+        responses.add(
+            responses.GET,
+            "https://www.example.com/images/relative.jpg",
+            body=mock_image().read(),
+            status=200,
+            content_type="image/jpeg",
+        )
+        responses.add(
+            responses.GET,
+            "https://www.example.com/files/assignment.pdf",
+            body=mock_pdf().read(),
+            status=200,
+            content_type="application/pdf",
+        )
+
+    def test_session_has_a_connection_for_each_worker(self):
+        adapter = MediaFetcher(max_workers=16).session.get_adapter(
+            "https://www.example.com/"
+        )
+        self.assertEqual(adapter.poolmanager.connection_pool_kw["maxsize"], 16)
+
+    def test_scan_collects_media_urls_by_file_name(self):
+        self.assertEqual(
+            self.fetcher.image_urls,
+            {
+                "bruno-4-runner.jpg": "https://www.example.com/images/bruno-4-runner.jpg",
+                "relative.jpg": "https://www.example.com/images/relative.jpg",
+            },
+        )
+        self.assertEqual(
+            self.fetcher.document_urls,
+            {"assignment.pdf": "https://www.example.com/files/assignment.pdf"},
+        )
+
+    @responses.activate
+    def test_fetch_saves_media(self):
+        self.add_responses()
+        self.fetcher.fetch()
+        self.assertEqual(len(responses.calls), 3)
+        self.assertEqual(
+            set(get_image_model().objects.values_list("title", flat=True)),
+            {"bruno-4-runner.jpg", "relative.jpg"},
+        )
+        self.assertEqual(
+            list(get_document_model().objects.values_list("title", flat=True)),
+            ["assignment.pdf"],
+        )
+
+    @responses.activate
+    def test_fetched_media_is_not_downloaded_again(self):
+        self.add_responses()
+        self.fetcher.fetch()
+        image = get_or_save_image("https://www.example.com/images/relative.jpg")
+        document = get_or_save_document("https://www.example.com/files/assignment.pdf")
+        self.assertEqual(image.title, "relative.jpg")
+        self.assertEqual(document.title, "assignment.pdf")
+        self.assertEqual(len(responses.calls), 3)
+
+    @responses.activate
+    def test_existing_media_is_not_fetched(self):
+        self.add_responses()
+        self.fetcher.fetch()
+        fetcher = MediaFetcher()
+        fetcher.scan(CONTENT)
+        fetcher.fetch()
+        self.assertEqual(len(responses.calls), 3)
+        self.assertEqual(get_image_model().objects.count(), 2)
+
+    @responses.activate
+    def test_invalid_responses_are_not_saved(self):
+        responses.add(
+            responses.GET,
+            "https://www.example.com/images/bruno-4-runner.jpg",
+            status=404,
+        )
+        fetcher = MediaFetcher()
+        fetcher.scan(CONTENT.splitlines()[1])
+        fetcher.fetch()
+        self.assertFalse(get_image_model().objects.exists())
+
+    def test_downloads_per_host_are_limited(self):
+        running = []
+        max_running = []
+        lock = threading.Lock()
+
+        def fake_download(url):
+            with self.fetcher.get_host_semaphore(url):
+                with lock:
+                    running.append(url)
+                    max_running.append(len(running))
+                time.sleep(0.01)
+                with lock:
+                    running.remove(url)
+            return None, False, None
+
+        self.fetcher.download = fake_download
+        self.fetcher.fetch_all(
+            [f"https://www.example.com/{i}.jpg" for i in range(10)],
+            lambda url, *result: None,
+        )
+        self.assertEqual(len(max_running), 10)
+        self.assertLessEqual(max(max_running), 2)
@@ -0,0 +1,82 @@
+import os
+from io import StringIO
+
+from django.test import TestCase
+
+from wagtail_wordpress_import.importers.readers import LxmlReader, PulldomReader
+from wagtail_wordpress_import.test.tests.xml_boilerplate import build_xml_stream
+
+BASE_PATH = os.path.dirname(os.path.dirname(__file__))
+FIXTURES_PATH = BASE_PATH + "/fixtures"
+
+
+class TestLxmlReader(TestCase):
+    def read_tags(self, reader_class, source, tag_names):
+        return [
+            (tag_name, item)
+            for tag_name, item in reader_class(source).iter_tags(tag_names)
+            if tag_name
+        ]
+
+    def test_same_items_as_pulldom_reader(self):
+        for fixture in ["raw_xml.xml", "post_meta.xml"]:
+            source = f"{FIXTURES_PATH}/{fixture}"
+            lxml_items = self.read_tags(LxmlReader, source, {"item", "wp:author"})
+            pulldom_items = self.read_tags(PulldomReader, source, {"item", "wp:author"})
+            self.assertTrue(lxml_items)
+            self.assertEqual(lxml_items, pulldom_items)
+
+    def test_item_dict_shape(self):
+        fragment = """
+        <item>
+            <title>foo</title>
+            <description></description>
+            <content:encoded><![CDATA[]]></content:encoded>
+            <wp:post_id>100</wp:post_id>
+            <wp:is_sticky>false</wp:is_sticky>
+            <category>one</category>
+            <category>two</category>
+            <wp:postmeta>
+                <wp:meta_key>_thumbnail_id</wp:meta_key>
+                <wp:meta_value><![CDATA[43120]]></wp:meta_value>
+            </wp:postmeta>
+            <wp:post-parent><nil>true</nil></wp:post-parent>
+        </item>
+        """
+        built = build_xml_stream(xml_items_fragment=fragment).read()
+        [(tag_name, item)] = self.read_tags(LxmlReader, StringIO(built), {"item"})
+
+        self.assertEqual(tag_name, "item")
+        self.assertEqual(
+            item,
+            {
+                "title": "foo",
+                "description": None,
+                "content:encoded": None,
+                "wp:post_id": 100,
+                "wp:is_sticky": False,
+                "category": ["one", "two"],
+                "wp:postmeta": {
+                    "wp:meta_key": "_thumbnail_id",
+                    "wp:meta_value": 43120,
+                },
+                "wp:post_parent": None,
+            },
+        )
+
+    def test_comments_are_not_child_elements(self):
+        fragment = "<item><link>x<!-- c --></link><title>a<!-- c -->b</title></item>"
+        built = build_xml_stream(xml_items_fragment=fragment).read()
+        lxml_items = self.read_tags(LxmlReader, StringIO(built), {"item"})
+        pulldom_items = self.read_tags(PulldomReader, StringIO(built), {"item"})
+
+        self.assertEqual(lxml_items, [("item", {"link": "x", "title": "ab"})])
+        self.assertEqual(lxml_items, pulldom_items)
+
+    def test_other_elements_are_not_converted(self):
+        built = build_xml_stream(xml_items_fragment="<item><title>foo</title></item>")
+        tags = list(LxmlReader(built).iter_tags({"item"}))
+
+        self.assertIn(("item", {"title": "foo"}), tags)
+        self.assertIn((None, None), tags)
+        self.assertEqual(len([tag for tag in tags if tag[0]]), 1)
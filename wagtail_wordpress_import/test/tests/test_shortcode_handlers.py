@@ -1,3 +1,5 @@
+from unittest import mock
+
 import responses
 from bs4 import BeautifulSoup
 from django.test import TestCase
@@ -7,6 +9,8 @@ from wagtail_wordpress_import.prefilters.handle_shortcodes import (
     SHORTCODE_HANDLERS,
     BlockShortcodeHandler,
     CaptionHandler,
+    ShortcodeScanner,
+    needs_shortcodes,
     register,
 )
 from wagtail_wordpress_import.test.tests.utility_functions import mock_image
@@ -460,3 +464,72 @@ class TestCaptionHandler(TestCase):
         )
         self.assertEqual(output["value"]["alignment"], "center")
         self.assertEqual(output["value"]["link"], "")
+
+
+class FooHandler(BlockShortcodeHandler):
+    shortcode_name = "foo"
+
+
+class FooBarHandler(BlockShortcodeHandler):
+    shortcode_name = "foo-bar"
+
+
+class QuuxHandler(BlockShortcodeHandler):
+    shortcode_name = "quux"
+
+    def pre_filter(self, string):
+        return string.replace("quux", "QUUX")
+
+
+class TestShortcodeScanner(TestCase):
+    def setUp(self):
+        self.handlers = (CaptionHandler, FooHandler, FooBarHandler, QuuxHandler)
+        self.scanner = ShortcodeScanner(self.handlers)
+
+    def run_every_handler(self, html):
+        for handler in self.handlers:
+            html = handler().pre_filter(html)
+        return html
+
+    def test_pattern_is_compiled_once(self):
+        self.assertIs(FooHandler()._pattern, FooHandler()._pattern)
+
+    def test_used_names(self):
+        self.assertEqual(
+            self.scanner.find_used_names("[foo]a[/foo] [caption id=1]b[/caption]"),
+            {"foo", "caption"},
+        )
+        # foo also matches [foo-bar ...], the word boundary is before the -
+        self.assertEqual(
+            self.scanner.find_used_names("[foo-bar]a[/foo-bar]"), {"foo", "foo-bar"}
+        )
+        self.assertEqual(self.scanner.find_used_names("[food]a[/food]"), set())
+
+    def test_output_is_the_same_as_every_handler(self):
+        for html in [
+            "no shortcodes",
+            "[foo]a[/foo] quux",
+            "[foo-bar]a[/foo-bar][foo x=1]b[/foo]",
+            "[foo-bar]a[/foo]",
+            '[caption id="1"][foo]a[/foo][/caption]',
+            "[foo][caption]a[/foo][/caption]",
+            "[food]a[/food] [foo]\nb[/foo]",
+        ]:
+            with self.subTest(html=html):
+                self.assertEqual(
+                    self.scanner.transform(html), self.run_every_handler(html)
+                )
+
+    def test_handler_with_its_own_pre_filter_always_runs(self):
+        self.assertEqual(self.scanner.transform("quux"), "QUUX")
+
+    def test_needs_shortcodes(self):
+        handlers = (
+            "wagtail_wordpress_import.prefilters.handle_shortcodes.SHORTCODE_HANDLERS"
+        )
+        with mock.patch(handlers, [CaptionHandler, FooHandler]):
+            self.assertTrue(needs_shortcodes("[foo]a[/foo]"))
+            self.assertFalse(needs_shortcodes("<p>quux</p>"))
+        # QuuxHandler has its own pre_filter, which doesn't need a [
+        with mock.patch(handlers, [FooHandler, QuuxHandler]):
+            self.assertTrue(needs_shortcodes("<p>quux</p>"))
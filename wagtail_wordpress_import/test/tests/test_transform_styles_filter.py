@@ -1,4 +1,6 @@
 import os
+import re
+from unittest import mock
 
 from bs4 import BeautifulSoup
 from django.test import TestCase, override_settings
@@ -15,7 +17,9 @@ from wagtail_wordpress_import.prefilters.transform_styles_defaults import (
     transform_style_right,
 )
 from wagtail_wordpress_import.prefilters.transform_styles_filter import (
+    CONF_STYLES_MAPPING,
     filter_transform_inline_styles,
+    find_rule_elements,
     normalize_style_attrs,
 )
 
@@ -213,3 +217,80 @@ class TestTransformStylesFilterHtmlTagsDeveloperOverrides(TestCase):
         self.assertTrue(italic)
         self.assertTrue(bold)
         self.assertTrue(div)
+
+
+def testing_transform_style_strong(soup, tag):
+    new_tag = soup.new_tag("strong")
+    new_tag.string = tag.text
+    tag.replace_with(new_tag)
+
+
+class TestTransformRules(TestCase):
+    def test_rule_elements_are_the_same_as_find_all(self):
+        soup = normalize_style_attrs(
+            BeautifulSoup(open(f"{FIXTURES_PATH}/raw_html.txt", "r"), "html.parser")
+        )
+        rules = [
+            ("style", pattern, function) for pattern, function in CONF_STYLES_MAPPING
+        ]
+        rules += [("name", "strong", None), ("name", "h2", None)]
+        elements = find_rule_elements(soup, rules)
+        for (kind, value, function), rule_elements in zip(rules, elements):
+            self.assertEqual(rule_elements, soup.findAll(**{kind: value}))
+
+    def test_styles_are_normalized_on_the_way(self):
+        soup = BeautifulSoup('<p style="FONT-WEIGHT: Bold">foo</p>', "html.parser")
+        rules = [("style", re.compile("font-weight:bold;"), None)]
+        self.assertEqual(find_rule_elements(soup, rules, normalize=True), [[soup.p]])
+        self.assertEqual(soup.p["style"], "font-weight:bold;")
+
+    def test_other_patterns_are_found_when_the_rule_is_applied(self):
+        soup = BeautifulSoup("<p>foo</p>", "html.parser")
+        self.assertEqual(find_rule_elements(soup, [("name", ["p"], None)]), [None])
+
+    def test_class_transforms_walk_the_tree_once(self):
+        input = '<p style="text-align: center">foo</p><p style="float: left">bar</p>'
+        with mock.patch(
+            "wagtail_wordpress_import.prefilters.transform_styles_filter.find_rule_elements",
+            wraps=find_rule_elements,
+        ) as mock_find_rule_elements:
+            output = filter_transform_inline_styles(input)
+        self.assertEqual(mock_find_rule_elements.call_count, 1)
+        self.assertEqual(
+            output,
+            '<p class="align-center" style="text-align:center;">foo</p>'
+            '<p class="float-left" style="float:left;">bar</p>',
+        )
+
+    def test_replaced_elements_are_not_transformed(self):
+        input = (
+            '<span style="font-weight: bold">foo '
+            '<span style="text-align: center">bar</span></span>'
+        )
+        output = filter_transform_inline_styles(input)
+        self.assertEqual(output, "<b>foo bar</b>")
+
+    def test_added_elements_are_transformed_by_the_later_rules(self):
+        input = '<span style="color: red">foo</span>'
+        output = filter_transform_inline_styles(
+            input,
+            {
+                "TRANSFORM_STYLES_MAPPING": [
+                    (
+                        re.compile("color:red;"),
+                        "wagtail_wordpress_import.test.tests.test_transform_styles_filter.testing_transform_style_strong",
+                    )
+                ]
+            },
+        )
+        self.assertEqual(output, "<b>foo</b>")
+
+    def test_elements_are_found_again_after_a_transform(self):
+        input = '<span style="font-weight: bold">foo</span><em>bar</em>'
+        with mock.patch(
+            "wagtail_wordpress_import.prefilters.transform_styles_filter.find_rule_elements",
+            wraps=find_rule_elements,
+        ) as mock_find_rule_elements:
+            output = filter_transform_inline_styles(input)
+        self.assertEqual(mock_find_rule_elements.call_count, 2)
+        self.assertEqual(output, "<b>foo</b><i>bar</i>")
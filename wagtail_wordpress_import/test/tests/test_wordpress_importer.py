@@ -1,15 +1,29 @@
 import os
+from unittest import mock, skipIf
 
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
 from django.test import TestCase, override_settings
 from wagtail import VERSION as WAGTAIL_VERSION
+from wagtail.search.backends import get_search_backend
+from wagtail.search.models import IndexEntry
 
 if WAGTAIL_VERSION >= (3, 0):
     from wagtail.models import Page
 else:
     from wagtail.core.models import Page
 
+from wagtail_wordpress_import.importers.import_mode import (
+    ReferenceIndex,
+    find_duplicate_slugs,
+)
 from wagtail_wordpress_import.importers.wordpress import WordpressImporter
 from wagtail_wordpress_import.logger import Logger
+from wagtail_wordpress_import.test.models import TestPage
+from wagtail_wordpress_import.test.tests.xml_boilerplate import (
+    build_xml_stream,
+    generate_temporay_file,
+)
 
 BASE_PATH = os.path.dirname(os.path.dirname(__file__))
 FIXTURES_PATH = BASE_PATH + "/fixtures"
@@ -23,6 +37,40 @@ IMPORTER_RUN_PARAMS_TEST = {
 }
 
 
+class ImporterTestCase(TestCase):
+    """Run the importer with the test page model and the shared run parameters"""
+
+    fixtures = [
+        f"{FIXTURES_PATH}/dump.json",
+    ]
+
+    def run_import(
+        self, xml_file=f"{FIXTURES_PATH}/raw_xml.xml", verbose=False, **kwargs
+    ):
+        self.logger = Logger(LOG_DIR, verbose=verbose)
+        self.importer = WordpressImporter(xml_file)
+        self.importer.run(logger=self.logger, **{**IMPORTER_RUN_PARAMS_TEST, **kwargs})
+        return self.logger
+
+    def build_xml_file(self, xml_items_fragment):
+        xml_file = generate_temporay_file(
+            build_xml_stream(xml_items_fragment=xml_items_fragment).read()
+        )
+        self.addCleanup(os.remove, xml_file)
+        return xml_file
+
+    def get_results(self):
+        """The result logged for each item that was imported or failed"""
+        return [item["result"] for item in self.logger.items if item["id"]]
+
+    def get_children(self):
+        return (
+            Page.objects.get(id=IMPORTER_RUN_PARAMS_TEST["parent_id"])
+            .get_children()
+            .specific()
+        )
+
+
 @override_settings(WAGTAIL_WORDPRESS_IMPORTER_SOURCE_DOMAIN="http://www.example.com")
 class WordpressImporterTests(TestCase):
     fixtures = [
@@ -314,3 +362,538 @@ class WordpressImporterTestsYoastEnabledChangedKey(TestCase):
             self.published_pages.first().search_description,
             "a search description from yoast using a different key",
         )
+
+
+@override_settings(WAGTAIL_WORDPRESS_IMPORTER_SOURCE_DOMAIN="http://www.example.com")
+class WordpressImporterWorkersTests(ImporterTestCase):
+    """
+    Running the prefilters in worker processes should give the same pages,
+    in the same order, as running them in the import process.
+    """
+
+    def get_content(self):
+        return {
+            page.wp_post_id: (page.wp_block_json, page.wp_processed_content)
+            for page in self.get_children()
+        }
+
+    def test_workers_match_serial_import(self):
+        serial_logger = self.run_import()
+        serial_content = self.get_content()
+        workers_logger = self.run_import(workers=2)
+        workers_content = self.get_content()
+
+        self.assertEqual(serial_content, workers_content)
+        self.assertEqual(workers_logger.imported, serial_logger.imported)
+        self.assertEqual(
+            [(item["id"], item["title"]) for item in workers_logger.items],
+            [(item["id"], item["title"]) for item in serial_logger.items],
+        )
+
+    @override_settings(
+        WAGTAIL_WORDPRESS_IMPORT_PREFILTERS=[
+            {
+                "FUNCTION": "wagtail_wordpress_import.test.tests.test_wordpress_importer.failing_prefilter"
+            }
+        ]
+    )
+    def test_failed_prefilters_fail_the_item(self):
+        xml_file = self.build_xml_file(
+            INCREMENTAL_ITEM_FRAGMENT.format(
+                content="Fail", modified="2010-07-13 16:16:46", meta=1
+            ).replace("<wp:post_id>500", "<wp:post_id>499")
+            + LINKED_ITEMS_FRAGMENT
+        )
+        self.run_import(xml_file=xml_file, workers=2, batch_size=10)
+
+        items = [item for item in self.logger.items if item["link"]]
+        self.assertEqual(
+            [item["result"] for item in items], ["failed", "created", "created"]
+        )
+        self.assertIn("boom", items[0]["reason"])
+        self.assertEqual(
+            sorted(page.wp_post_id for page in self.get_children()),
+            [500, 501],
+        )
+
+
+def failing_prefilter(html, options=None):
+    if "Fail" in html:
+        raise ValueError("boom")
+    return html
+
+
+@override_settings(WAGTAIL_WORDPRESS_IMPORTER_SOURCE_DOMAIN="http://www.example.com")
+class WordpressImporterReimportTests(ImporterTestCase):
+    def test_reimport_updates_existing_pages(self):
+        self.run_import()
+        self.assertEqual(self.get_results(), ["created", "created"])
+        self.run_import(chunk_size=1)
+        self.assertEqual(self.get_results(), ["updated", "updated"])
+        self.assertEqual(self.get_children().count(), 2)
+
+    def test_incremental_reimport_skips_unchanged_pages(self):
+        self.run_import()
+        with mock.patch(
+            "wagtail_wordpress_import.importers.wordpress.WordpressItem"
+        ) as mock_item:
+            self.run_import(incremental=True)
+
+        mock_item.assert_not_called()
+        self.assertEqual(self.get_results(), ["skipped", "skipped"])
+        self.assertEqual(self.logger.imported, 0)
+        self.assertEqual(self.logger.skipped, self.logger.processed)
+
+
+class WordpressImporterBatchTests(ImporterTestCase):
+    def test_batches_are_logged(self):
+        # log a row for every entry of the XML
+        self.run_import(verbose=True, batch_size=5)
+        self.assertEqual(self.logger.imported, 2)
+        self.assertTrue(self.logger.batches)
+        self.assertEqual(
+            sum(batch["items"] for batch in self.logger.batches),
+            len(self.logger.items),
+        )
+
+    def test_failed_item_is_rolled_back_without_the_batch(self):
+        add_to_link_index = WordpressImporter.add_to_link_index
+        calls = []
+
+        def fail_on_first_page(importer, page):
+            calls.append(page)
+            if len(calls) == 1:
+                raise ValueError("Failed")
+            add_to_link_index(importer, page)
+
+        with mock.patch.object(
+            WordpressImporter, "add_to_link_index", fail_on_first_page
+        ):
+            self.run_import(batch_size=100)
+
+        failed_page, imported_page = calls
+        self.assertEqual(
+            [item["result"] for item in self.logger.items if item["link"]],
+            ["failed", "created"],
+        )
+        self.assertEqual(
+            list(self.get_children().values_list("title", flat=True)),
+            [imported_page.title],
+        )
+        self.assertEqual(self.logger.imported, 1)
+
+    @override_settings(
+        WAGTAIL_WORDPRESS_IMPORTER_SOURCE_DOMAIN="http://www.example.com"
+    )
+    def test_failed_item_is_removed_from_the_importer_state(self):
+        page_imported = WordpressImporter.page_imported
+        calls = []
+
+        def fail_after_first_page(importer, page, *args):
+            page_imported(importer, page, *args)
+            calls.append(page)
+            if len(calls) == 1:
+                raise ValueError("Failed")
+
+        with mock.patch.object(
+            WordpressImporter, "page_imported", fail_after_first_page
+        ):
+            self.run_import(batch_size=100)
+
+        failed_page, imported_page = calls
+        self.assertEqual(self.importer.imported_page_ids, [imported_page.id])
+        self.assertEqual(
+            self.importer.get_page_id(imported_page.wp_link, None), imported_page.id
+        )
+        self.assertIsNone(self.importer.get_page_id(failed_page.wp_link, None))
+
+    def test_pending_bulk_pages_are_kept_when_an_item_fails(self):
+        xml_file = self.build_xml_file(
+            INCREMENTAL_ITEM_FRAGMENT.format(
+                content="Page A", modified="2010-07-13 16:16:46", meta=1
+            )
+            * 2
+        )
+        check_stream_field_block_types = (
+            WordpressImporter.check_stream_field_block_types
+        )
+        calls = []
+
+        def fail_on_second_item(page, body):
+            calls.append(page)
+            if len(calls) == 2:
+                raise ValueError("Failed")
+            check_stream_field_block_types(page, body)
+
+        with mock.patch.object(
+            WordpressImporter,
+            "check_stream_field_block_types",
+            staticmethod(fail_on_second_item),
+        ):
+            self.run_import(xml_file=xml_file, batch_size=100, bulk_create=True)
+
+        self.assertEqual(
+            [item["result"] for item in self.logger.items if item["link"]],
+            ["created", "failed"],
+        )
+        page = TestPage.objects.get(wp_post_id=500)
+        self.assertEqual(self.importer.imported_page_ids, [page.id])
+        self.assertFalse(any(Page.find_problems()))
+
+
+@override_settings(
+    WAGTAIL_WORDPRESS_IMPORTER_SOURCE_DOMAIN="http://www.example.com",
+    WAGTAIL_WORDPRESS_IMPORT_CATEGORY_PLUGIN_ENABLED=True,
+    WAGTAIL_WORDPRESS_IMPORT_CATEGORY_PLUGIN_MODEL="wagtail_wordpress_import.test.models.Category",
+)
+class WordpressImporterBulkCreateTests(ImporterTestCase):
+    def test_bulk_created_pages_match_add_child(self):
+        self.run_import()
+        pages = [
+            (
+                page.title,
+                page.slug,
+                page.url_path,
+                page.depth,
+                page.draft_title,
+                page.locale_id,
+                page.live,
+                page.wp_post_id,
+                [(block["type"], block["value"]) for block in page.body.raw_data],
+                sorted(page.categories.values_list("name", flat=True)),
+            )
+            for page in self.get_children()
+        ]
+        Page.objects.filter(id__in=[page.id for page in self.get_children()]).delete()
+        self.run_import(bulk_create=True)
+        self.assertEqual(self.get_results(), ["created", "created"])
+        self.assertEqual(
+            [
+                (
+                    page.title,
+                    page.slug,
+                    page.url_path,
+                    page.depth,
+                    page.draft_title,
+                    page.locale_id,
+                    page.live,
+                    page.wp_post_id,
+                    [(block["type"], block["value"]) for block in page.body.raw_data],
+                    sorted(page.categories.values_list("name", flat=True)),
+                )
+                for page in self.get_children()
+            ],
+            pages,
+        )
+        self.assertFalse(any(Page.find_problems()))
+        parent = Page.objects.get(id=IMPORTER_RUN_PARAMS_TEST["parent_id"])
+        self.assertEqual(parent.numchild, 2)
+
+    def test_pages_are_added_after_the_existing_children(self):
+        self.run_import(xml_file=self.build_xml_file(LINKED_ITEMS_FRAGMENT))
+        self.run_import(bulk_create=True, batch_size=1)
+        self.assertEqual(self.get_children().count(), 4)
+        self.assertFalse(any(Page.find_problems()))
+
+    def test_existing_pages_are_updated(self):
+        self.run_import(bulk_create=True)
+        self.run_import(bulk_create=True)
+        self.assertEqual(self.get_results(), ["updated", "updated"])
+        self.assertEqual(self.get_children().count(), 2)
+
+    def test_links_between_bulk_created_pages(self):
+        self.run_import(
+            xml_file=self.build_xml_file(LINKED_ITEMS_FRAGMENT), bulk_create=True
+        )
+        page_a = TestPage.objects.get(wp_post_id=500)
+        page_b = TestPage.objects.get(wp_post_id=501)
+        self.assertIn(
+            f'<a id="{page_b.id}" linktype="page">', page_a.body.raw_data[0]["value"]
+        )
+        self.assertIn(
+            f'<a id="{page_a.id}" linktype="page">', page_b.body.raw_data[0]["value"]
+        )
+
+    def test_duplicate_slug_is_not_bulk_created(self):
+        self.run_import()
+        TestPage.objects.update(wp_post_id=None)
+        with self.assertRaises(ValidationError):
+            self.run_import(bulk_create=True)
+
+    def test_bulk_created_pages_are_indexed(self):
+        self.run_import(bulk_create=True)
+        self.assertEqual(
+            sorted(
+                int(id)
+                for id in IndexEntry.objects.filter(
+                    content_type=ContentType.objects.get_for_model(TestPage)
+                ).values_list("object_id", flat=True)
+            ),
+            sorted(self.importer.imported_page_ids),
+        )
+        self.assertEqual(len(self.importer.imported_page_ids), 2)
+
+    @skipIf(ReferenceIndex is None, "The reference index was added in Wagtail 4.1")
+    def test_bulk_created_pages_are_added_to_the_reference_index(self):
+        with mock.patch.object(
+            ReferenceIndex, "create_or_update_for_object"
+        ) as mock_update:
+            self.run_import(bulk_create=True)
+        self.assertEqual(
+            sorted(call.args[0].id for call in mock_update.call_args_list),
+            sorted(self.importer.imported_page_ids),
+        )
+
+
+class WordpressImporterIndexingTests(ImporterTestCase):
+    def get_index_entries(self):
+        return IndexEntry.objects.filter(
+            content_type=ContentType.objects.get_for_model(TestPage)
+        )
+
+    def test_pages_are_indexed_at_the_end_of_the_import(self):
+        with mock.patch(
+            "wagtail_wordpress_import.importers.wordpress.update_search_index"
+        ):
+            self.run_import(lightweight_save=True)
+        self.assertFalse(self.get_index_entries().exists())
+
+        self.run_import(lightweight_save=True)
+        self.assertEqual(
+            sorted(
+                int(id)
+                for id in self.get_index_entries().values_list("object_id", flat=True)
+            ),
+            sorted(self.importer.imported_page_ids),
+        )
+
+    def test_deferred_search_index_in_chunks(self):
+        backend_class = type(get_search_backend())
+        with mock.patch(
+            "wagtail_wordpress_import.importers.wordpress.update_search_index"
+        ):
+            self.run_import(defer_search_index=True)
+        self.assertFalse(self.get_index_entries().exists())
+
+        with mock.patch.object(
+            backend_class,
+            "add_bulk",
+            autospec=True,
+            side_effect=backend_class.add_bulk,
+        ) as mock_add_bulk:
+            self.run_import(defer_search_index=True, search_index_chunk_size=1)
+
+        self.assertEqual(
+            [len(call.args[2]) for call in mock_add_bulk.call_args_list], [1, 1]
+        )
+        self.assertEqual(self.logger.search_indexed, 2)
+        self.assertEqual(
+            sorted(
+                int(id)
+                for id in self.get_index_entries().values_list("object_id", flat=True)
+            ),
+            sorted(self.importer.imported_page_ids),
+        )
+
+    def test_search_signal_handler_is_reconnected(self):
+        self.run_import(lightweight_save=True)
+        TestPage.objects.update(title="Changed")
+        page = TestPage.objects.first()
+        page.save()
+        self.assertEqual(
+            self.get_index_entries().get(object_id=page.id).title, "Changed"
+        )
+
+    @skipIf(ReferenceIndex is None, "The reference index was added in Wagtail 4.1")
+    def test_reference_index_is_updated_once_for_each_page(self):
+        with mock.patch.object(
+            ReferenceIndex, "create_or_update_for_object"
+        ) as mock_update:
+            self.run_import(lightweight_save=True)
+        self.assertEqual(
+            sorted(call.args[0].id for call in mock_update.call_args_list),
+            sorted(self.importer.imported_page_ids),
+        )
+
+    def test_find_duplicate_slugs(self):
+        self.run_import(lightweight_save=True)
+        page_one, page_two = TestPage.objects.order_by("pk")
+        self.assertEqual(find_duplicate_slugs([page_one.id, page_two.id]), [])
+        Page.objects.filter(id=page_two.id).update(slug=page_one.slug)
+        self.assertEqual(
+            find_duplicate_slugs([page_one.id, page_two.id]),
+            [(page_one.id, page_one.slug), (page_two.id, page_one.slug)],
+        )
+
+    def test_duplicate_slugs_are_logged(self):
+        self.run_import()
+        page = TestPage.objects.order_by("pk").first()
+        slug = page.slug
+        Page.objects.filter(id=page.id).update(slug="renamed")
+        Page.objects.get(id=2).add_child(instance=Page(title="Other", slug=slug))
+
+        self.run_import(lightweight_save=True)
+        self.assertEqual(self.get_results(), ["updated", "updated", "warning"])
+        self.assertEqual(self.logger.results["warning"], 1)
+        row = self.logger.items[-1]
+        self.assertEqual(row["id"], page.id)
+        self.assertEqual(row["link"], page.wp_link)
+        self.assertEqual(
+            row["reason"], f"the slug {slug} is already in use by a sibling"
+        )
+
+
+INCREMENTAL_ITEM_FRAGMENT = """
+<item>
+    <title>Page A</title>
+    <link>https://www.example.com/page-a/</link>
+    <content:encoded><![CDATA[<p>{content}</p>]]></content:encoded>
+    <wp:post_id>500</wp:post_id>
+    <wp:post_date_gmt>2010-07-13 16:16:46</wp:post_date_gmt>
+    <wp:post_modified_gmt>{modified}</wp:post_modified_gmt>
+    <wp:post_name>page-a</wp:post_name>
+    <wp:status>publish</wp:status>
+    <wp:post_type>post</wp:post_type>
+    <wp:postmeta>
+        <wp:meta_key>header_image</wp:meta_key>
+        <wp:meta_value>{meta}</wp:meta_value>
+    </wp:postmeta>
+</item>
+"""
+
+
+class WordpressImporterIncrementalTests(ImporterTestCase):
+    def import_changes(self, **changes):
+        values = {"content": "Page A", "modified": "2010-07-13 16:16:46", "meta": 1}
+        values.update(changes)
+        self.run_import(
+            xml_file=self.build_xml_file(INCREMENTAL_ITEM_FRAGMENT.format(**values)),
+            incremental=True,
+        )
+        return self.get_results()
+
+    def test_changed_items_are_imported_again(self):
+        self.assertEqual(self.import_changes(), ["created"])
+        self.assertEqual(self.import_changes(), ["skipped"])
+        self.assertEqual(self.import_changes(content="Edited"), ["updated"])
+        self.assertEqual(
+            self.import_changes(content="Edited", modified="2011-01-01 00:00:00"),
+            ["updated"],
+        )
+        self.assertEqual(
+            self.import_changes(
+                content="Edited", modified="2011-01-01 00:00:00", meta=2
+            ),
+            ["updated"],
+        )
+        self.assertEqual(
+            self.import_changes(
+                content="Edited", modified="2011-01-01 00:00:00", meta=2
+            ),
+            ["skipped"],
+        )
+
+    def test_content_digest_is_not_post_meta(self):
+        self.import_changes()
+        with mock.patch.object(
+            TestPage,
+            "import_wordpress_data",
+            autospec=True,
+            side_effect=TestPage.import_wordpress_data,
+        ) as mock_import_data:
+            self.assertEqual(self.import_changes(content="Edited"), ["updated"])
+        post_meta = mock_import_data.call_args.args[1]["wp_post_meta"]
+        self.assertNotIn("content_digest", post_meta)
+        self.assertEqual(post_meta["header_image"], 1)
+
+
+LINKED_ITEMS_FRAGMENT = """
+<item>
+    <title>Page A</title>
+    <link>https://www.example.com/page-a/</link>
+    <content:encoded><![CDATA[<p>Page A links <a href="/page-b/">forward</a></p>]]></content:encoded>
+    <wp:post_id>500</wp:post_id>
+    <wp:post_date_gmt>2010-07-13 16:16:46</wp:post_date_gmt>
+    <wp:post_name>page-a</wp:post_name>
+    <wp:status>publish</wp:status>
+    <wp:post_type>post</wp:post_type>
+</item>
+<item>
+    <title>Page B</title>
+    <link>https://www.example.com/page-b/</link>
+    <content:encoded><![CDATA[<p>Links to <a href="/page-a">page a</a>,
+<a href="http://example.com/page-a/?utm_source=foo">page a again</a>
+and <a href="https://www.other.com/page-a/">another site</a></p>]]></content:encoded>
+    <wp:post_id>501</wp:post_id>
+    <wp:post_date_gmt>2010-07-13 16:16:46</wp:post_date_gmt>
+    <wp:post_name>page-b</wp:post_name>
+    <wp:status>publish</wp:status>
+    <wp:post_type>post</wp:post_type>
+</item>
+"""
+
+
+@override_settings(WAGTAIL_WORDPRESS_IMPORTER_SOURCE_DOMAIN="http://www.example.com")
+class WordpressImporterPageLinksTests(ImporterTestCase):
+    def setUp(self):
+        self.run_import(xml_file=self.build_xml_file(LINKED_ITEMS_FRAGMENT))
+        self.page_a = self.importer.page_model_class.objects.get(wp_post_id=500)
+        self.page_b = self.importer.page_model_class.objects.get(wp_post_id=501)
+
+    def test_links_to_imported_pages_are_page_links(self):
+        rich_text = self.page_b.body.raw_data[0]["value"]
+        self.assertEqual(
+            rich_text.count(f'<a id="{self.page_a.id}" linktype="page">'), 2
+        )
+        self.assertIn('href="https://www.other.com/page-a/"', rich_text)
+
+    def test_link_index(self):
+        self.assertEqual(
+            self.importer.get_page_id("https://www.example.com/page-b", None),
+            self.page_b.id,
+        )
+        self.assertIsNone(self.importer.get_page_id("/not-imported/", None))
+
+    def test_links_to_later_pages_are_page_links(self):
+        rich_text = self.page_a.body.raw_data[0]["value"]
+        self.assertIn(
+            f'<a id="{self.page_b.id}" linktype="page">forward</a>', rich_text
+        )
+
+    def test_only_pages_with_links_to_later_pages_are_updated(self):
+        self.assertEqual(self.importer.deferred_link_page_ids, [self.page_a.id])
+
+    def test_plain_permalinks_link_to_their_own_pages(self):
+        self.page_a.wp_link = "http://www.example.com/?p=500"
+        self.page_a.save()
+        self.page_b.wp_link = "http://www.example.com/?page_id=501"
+        self.page_b.save()
+        self.importer.link_index = None
+        self.assertEqual(self.importer.get_page_id("/?p=500", None), self.page_a.id)
+        self.assertEqual(
+            self.importer.get_page_id("http://example.com/?page_id=501", None),
+            self.page_b.id,
+        )
+        self.assertIsNone(self.importer.get_page_id("/?p=502", None))
+        self.assertIsNone(self.importer.get_page_id("/", None))
+
+    def test_relative_links_are_resolved_against_the_page(self):
+        self.assertEqual(
+            self.importer.get_page_id("../page-b/", self.page_a), self.page_b.id
+        )
+
+    def test_relative_links_on_a_new_page(self):
+        Page.objects.filter(id__in=[self.page_a.id, self.page_b.id]).delete()
+        self.run_import(
+            xml_file=self.build_xml_file(
+                LINKED_ITEMS_FRAGMENT.replace('href="/page-a"', 'href="../page-a/"')
+            )
+        )
+        page_a = TestPage.objects.get(wp_post_id=500)
+        page_b = TestPage.objects.get(wp_post_id=501)
+        self.assertIn(
+            f'<a id="{page_a.id}" linktype="page">page a</a>',
+            page_b.body.raw_data[0]["value"],
+        )
+        # only page a links to a later page, page b was linked when first saved
+        self.assertEqual(self.importer.deferred_link_page_ids, [page_a.id])
@@ -3,8 +3,10 @@ import os
 import re
 from collections import Counter
 from datetime import datetime
+from unittest import mock
 from xml.dom import pulldom
 
+from bs4 import BeautifulSoup
 from django.test import TestCase, override_settings
 
 try:
@@ -12,13 +14,18 @@ try:
 except ImportError:
     from wagtail.core.models import Page
 
-from wagtail_wordpress_import.functions import node_to_dict
+from wagtail_wordpress_import.block_builder_defaults import build_heading_block
+from wagtail_wordpress_import.dom import dom_filter, parse_html
+from wagtail_wordpress_import.functions import item_content_digest, node_to_dict
+from wagtail_wordpress_import.importers.pipeline import ImportPipeline
 from wagtail_wordpress_import.importers.wordpress import (
     DEFAULT_PREFILTERS,
     WordpressImporter,
     WordpressItem,
 )
 from wagtail_wordpress_import.logger import Logger
+from wagtail_wordpress_import.prefilters.handle_shortcodes import CaptionHandler
+from wagtail_wordpress_import.prefilters.triggers import with_trigger
 from wagtail_wordpress_import.test.models import Category
 
 BASE_PATH = os.path.dirname(os.path.dirname(__file__))
@@ -382,6 +389,13 @@ class WordpressImporterTestsCleanWpPostMeta(TestCase):
         self.assertTrue("pinterest_shares" in cleaned_postmeta)
         self.assertTrue("twitter_shares" in cleaned_postmeta)
 
+    def test_content_digest_is_not_post_meta(self):
+        item_content_digest(self.items_dict[1])
+        wordpress_item = WordpressItem(self.items_dict[1], self.logger)
+        cleaned_postmeta = wordpress_item.clean_wp_post_meta()
+        self.assertNotIn("content_digest", cleaned_postmeta)
+        self.assertEqual(cleaned_postmeta["facebook_shares"], 100)
+
 
 class TestWordpressItemPrefilterConfig(TestCase):
     def test_prefilter_content_default(self):
@@ -419,6 +433,29 @@ def foo_filter(content, options):
     return content, options
 
 
+@dom_filter
+def noop_dom_filter(soup, options):
+    return soup
+
+
+@dom_filter
+def bold_dom_filter(soup, options):
+    for tag in soup.find_all("p"):
+        tag.name = "b"
+    return soup
+
+
+@dom_filter
+def italic_dom_filter(soup, options):
+    for tag in soup.find_all("b"):
+        tag.wrap(soup.new_tag("i"))
+    return soup
+
+
+def upper_filter(content, options):
+    return content.upper()
+
+
 def transform_foo(soup, tag):
     new_tag = soup.new_tag("foo")
     new_tag.string = tag.string
@@ -505,3 +542,185 @@ class TestWordpressItemPrefilterOverride(TestCase):
         wordpress_item = WordpressItem(node, "")
         output = wordpress_item.prefilter_content(wordpress_item.raw_body)
         self.assertEqual(output.strip(), "<foo>foo bar baz</foo>")
+
+
+class TestImportPipeline(TestCase):
+    @override_settings(
+        WAGTAIL_WORDPRESS_IMPORT_PREFILTERS=[
+            {
+                "FUNCTION": "wagtail_wordpress_import.test.tests.test_wordpress_item.foo_filter",
+                "OPTIONS": {"foo": "bar"},
+            }
+        ]
+    )
+    def test_prefilters_are_resolved(self):
+        self.assertEqual(ImportPipeline().prefilters, [(foo_filter, {"foo": "bar"})])
+
+    def test_builder_functions_include_shortcode_handlers(self):
+        builder_functions = ImportPipeline().builder_functions
+        self.assertEqual(builder_functions["h1"], build_heading_block)
+        self.assertEqual(
+            builder_functions["wagtail_block_caption"].__func__,
+            CaptionHandler.construct_block,
+        )
+
+    def test_items_share_the_pipeline(self):
+        pipeline = ImportPipeline()
+        pipeline.prefilters = [(foo_filter, {"foo": "bar"})]
+        for content in ["foo", "bar"]:
+            wordpress_item = WordpressItem(
+                {"content:encoded": content}, "", pipeline=pipeline
+            )
+            output = wordpress_item.prefilter_content(wordpress_item.raw_body)
+            self.assertEqual(output, (content, {"foo": "bar"}))
+
+
+class TestDomPrefilters(TestCase):
+    def build_item(self, *prefilters):
+        pipeline = ImportPipeline()
+        pipeline.prefilters = [(prefilter, None) for prefilter in prefilters]
+        return WordpressItem({"content:encoded": "<p>foo</p>"}, "", pipeline=pipeline)
+
+    def test_dom_filters_share_a_tree(self):
+        wordpress_item = self.build_item(bold_dom_filter, italic_dom_filter)
+        with mock.patch(
+            "wagtail_wordpress_import.dom.parse_html", wraps=parse_html
+        ) as mock_parse_html:
+            output = wordpress_item.run_prefilters(wordpress_item.raw_body)
+        self.assertEqual(mock_parse_html.call_count, 1)
+        self.assertIsInstance(output, BeautifulSoup)
+        self.assertEqual(str(output), "<i><b>foo</b></i>")
+        self.assertEqual(wordpress_item.debug_content["bold_dom_filter"], "<b>foo</b>")
+
+    def test_string_filters_receive_a_string(self):
+        wordpress_item = self.build_item(bold_dom_filter, upper_filter)
+        output = wordpress_item.prefilter_content(wordpress_item.raw_body)
+        self.assertEqual(output, "<B>FOO</B>")
+
+    def test_prefilter_content_returns_a_string(self):
+        wordpress_item = self.build_item(upper_filter, bold_dom_filter)
+        output = wordpress_item.prefilter_content(wordpress_item.raw_body)
+        self.assertEqual(output, "<b>FOO</b>")
+
+    def test_dom_filter_called_with_a_string(self):
+        self.assertEqual(bold_dom_filter("<p>foo</p>", None), "<b>foo</b>")
+
+    def test_body_is_built_from_the_tree(self):
+        wordpress_item = self.build_item(bold_dom_filter)
+        body = json.loads(
+            wordpress_item.body_stream_field(wordpress_item.prefiltered_body())
+        )
+        self.assertEqual(body, [{"type": "rich_text", "value": "<b>foo</b>"}])
+
+    def test_body_of_malformed_html_does_not_depend_on_the_last_filter(self):
+        for content in ["<p>a<div>b</div></p>", "<p>one<p>two"]:
+            pipeline = ImportPipeline()
+            pipeline.prefilters = []
+            wordpress_item = WordpressItem(
+                {"content:encoded": content}, "", pipeline=pipeline
+            )
+            expected = wordpress_item.body_stream_field(
+                wordpress_item.prefiltered_body()
+            )
+            pipeline.prefilters = [(noop_dom_filter, None)]
+            wordpress_item = WordpressItem(
+                {"content:encoded": content}, "", pipeline=pipeline
+            )
+            body = wordpress_item.body_stream_field(wordpress_item.prefiltered_body())
+            self.assertEqual(body, expected)
+
+
+class TestPrefilterTriggers(TestCase):
+    def build_item(self, content, *prefilters):
+        pipeline = ImportPipeline()
+        pipeline.prefilters = [(prefilter, None) for prefilter in prefilters]
+        return WordpressItem({"content:encoded": content}, "", pipeline=pipeline)
+
+    def test_substring_trigger(self):
+        prefilter = with_trigger(upper_filter, "foo")
+        for content, expected in [("<p>foo</p>", "<P>FOO</P>"), ("<p>bar</p>", None)]:
+            wordpress_item = self.build_item(content, prefilter)
+            output = wordpress_item.prefilter_content(wordpress_item.raw_body)
+            self.assertEqual(output, expected or content)
+
+    def test_regex_trigger(self):
+        prefilter = with_trigger(upper_filter, re.compile(r"fo+\b"))
+        wordpress_item = self.build_item("<p>fooo</p>", prefilter)
+        output = wordpress_item.prefilter_content(wordpress_item.raw_body)
+        self.assertEqual(output, "<P>FOOO</P>")
+        wordpress_item = self.build_item("<p>food</p>", prefilter)
+        output = wordpress_item.prefilter_content(wordpress_item.raw_body)
+        self.assertEqual(output, "<p>food</p>")
+
+    def test_dom_filter_is_not_parsed_when_skipped(self):
+        wordpress_item = self.build_item(
+            "<p>foo</p>", with_trigger(bold_dom_filter, "style")
+        )
+        with mock.patch(
+            "wagtail_wordpress_import.dom.parse_html", wraps=parse_html
+        ) as mock_parse_html:
+            output = wordpress_item.run_prefilters(wordpress_item.raw_body)
+        self.assertEqual(mock_parse_html.call_count, 0)
+        self.assertEqual(output, "<p>foo</p>")
+
+    def test_trigger_is_not_checked_on_a_tree(self):
+        wordpress_item = self.build_item(
+            "<p>foo</p>", bold_dom_filter, with_trigger(italic_dom_filter, "<b>")
+        )
+        output = wordpress_item.prefilter_content(wordpress_item.raw_body)
+        self.assertEqual(output, "<i><b>foo</b></i>")
+
+    @override_settings(
+        WAGTAIL_WORDPRESS_IMPORT_PREFILTERS=[
+            {
+                "FUNCTION": "wagtail_wordpress_import.test.tests.test_wordpress_item.upper_filter",
+                "TRIGGER": "baz",
+            }
+        ]
+    )
+    def test_trigger_setting(self):
+        for content, expected in [("foo bar", "foo bar"), ("bar baz", "BAR BAZ")]:
+            wordpress_item = WordpressItem({"content:encoded": content}, "")
+            output = wordpress_item.prefilter_content(wordpress_item.raw_body)
+            self.assertEqual(output, expected)
+
+    @override_settings(
+        WAGTAIL_WORDPRESS_IMPORT_PREFILTERS=[
+            {
+                "FUNCTION": "wagtail_wordpress_import.prefilters.transform_inline_styles",
+                "TRIGGER": "style",
+            }
+        ]
+    )
+    def test_trigger_setting_adds_a_trigger(self):
+        wordpress_item = WordpressItem({"content:encoded": "<p>a<br>b</p>"}, "")
+        output = wordpress_item.prefilter_content(wordpress_item.raw_body)
+        self.assertEqual(output, "<p>a<br>b</p>")
+
+    def test_default_prefilters_output_is_unchanged(self):
+        """
+        The default triggers only skip prefilters that wouldn't change the
+        content, e.g. transform_inline_styles has no trigger as its parser
+        also tidies the HTML for bleach_clean
+        """
+        untriggered = ImportPipeline()
+        untriggered.prefilters = [
+            (with_trigger(function, None), options)
+            for function, options in ImportPipeline().prefilters
+        ]
+        for content in [
+            "Some text</font> and more",
+            "x</pre> y",
+            "It&#8217;s&nbsp;&copy; 2010 &ndash; 2022",
+            "<p>a<br>b</p>",
+            "plain text\n\nwithout shortcodes",
+        ]:
+            with self.subTest(content=content):
+                wordpress_item = WordpressItem({"content:encoded": content}, "")
+                untriggered_item = WordpressItem(
+                    {"content:encoded": content}, "", pipeline=untriggered
+                )
+                self.assertEqual(
+                    wordpress_item.prefilter_content(content),
+                    untriggered_item.prefilter_content(content),
+                )